@@ -0,0 +1,146 @@
+"""
+Startup benchmark for the headless entry points.
+
+Every case runs in a fresh interpreter and reports how long it took and
+which heavy dependencies (pygame, scipy, hydra, omegaconf) it loaded:
+
+    import      importing a module, e.g. what a bot pays to unpickle snapshots
+    managers    importing and building a PlayerManager and FoodCellManager
+    trainer     loading neat-ai.py, which headless training must do without pygame
+    workers     spinning up a spawn process pool whose workers import a module
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --output startup.jsonl
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from benchmarks.harness import ROOT, write_results
+
+HEAVY_MODULES = ["pygame", "scipy", "hydra", "omegaconf", "numpy"]
+IMPORT_TARGETS = [
+    "common.protocol",
+    "client.client",
+    "common.player",
+    "common.food",
+    "common.chunks",
+]
+
+IMPORT_CASE = """
+import time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+"""
+
+MANAGERS_CASE = """
+import time
+from benchmarks.harness import load_config
+cfg = load_config()
+start = time.perf_counter()
+from common.food import FoodCellManager
+from common.player import PlayerManager
+p_manager = PlayerManager(cfg)
+f_manager = FoodCellManager(cfg, p_manager)
+elapsed = time.perf_counter() - start
+"""
+
+# neat-ai.py is not a valid module name, so it is loaded from its path
+TRAINER_CASE = """
+import importlib.util
+import time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("neat_ai", "neat-ai.py")
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+elapsed = time.perf_counter() - start
+"""
+
+# Workers run exec, a builtin, because functions defined in a -c script cannot be pickled
+WORKERS_CASE = """
+import concurrent.futures
+import multiprocessing
+import time
+
+start = time.perf_counter()
+context = multiprocessing.get_context("spawn")
+with concurrent.futures.ProcessPoolExecutor({workers}, mp_context=context) as pool:
+    list(pool.map(exec, ["import {module}"] * {workers}))
+elapsed = time.perf_counter() - start
+"""
+
+REPORT = """
+import json, sys
+print(json.dumps({{
+    "elapsed_ms": elapsed * 1000,
+    "loaded": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_case(source):
+    """Runs a case in a fresh interpreter and returns its report."""
+    output = subprocess.run(
+        [sys.executable, "-c", source],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_case(case, target, source, repeat):
+    """Runs a case repeat times and keeps the best and median startup time."""
+    reports = [run_case(source) for _ in range(repeat)]
+    timings = sorted(report["elapsed_ms"] for report in reports)
+    return {
+        "case": case,
+        "target": target,
+        "best_ms": round(timings[0], 2),
+        "median_ms": round(timings[len(timings) // 2], 2),
+        "loaded": reports[0]["loaded"],
+    }
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", nargs="+", default=IMPORT_TARGETS)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON lines file to write results to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    report = REPORT.format(heavy=HEAVY_MODULES)
+
+    cases = [
+        ("import", module, IMPORT_CASE.format(module=module)) for module in args.modules
+    ]
+    cases.append(("managers", "common", MANAGERS_CASE))
+    cases.append(("trainer", "neat-ai.py", TRAINER_CASE))
+    cases.append(
+        (
+            "workers",
+            f"client.client x{args.workers}",
+            WORKERS_CASE.format(workers=args.workers, module="client.client"),
+        )
+    )
+
+    results = []
+    for case, target, source in cases:
+        row = measure_case(case, target, source + report, args.repeat)
+        results.append(row)
+        print(
+            f"[BENCH]\t{case:<9} {target:<22}\t{row['best_ms']:>9} ms"
+            f"\tloaded: {', '.join(row['loaded']) or '-'}",
+            file=sys.stderr,
+        )
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
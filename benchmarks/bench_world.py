@@ -0,0 +1,201 @@
+"""
+Headless microbenchmarks for the server world update paths.
+
+Sweeps player counts, food counts and world sizes over:
+
+    ServerLogic.player_food_collision
+    ServerLogic.player_collisions
+    ServerLogic.create_food
+    PlayerManager.get_start_location
+
+and writes one JSON object per measured point so runs can be diffed.
+
+    python -m benchmarks.bench_world --quick
+    python -m benchmarks.bench_world --output after.jsonl --compare before.jsonl
+"""
+import argparse
+import dataclasses
+import itertools
+import sys
+
+from benchmarks.harness import (
+    compare_results,
+    load_config,
+    load_server_module,
+    measure,
+    populate_food,
+    populate_players,
+    read_results,
+    scaling_exponents,
+    seeded_rng,
+    write_results,
+)
+
+PLAYER_COUNTS = [1, 10, 100, 1000]
+FOOD_COUNTS = [100, 1000, 10000, 100000]
+WORLD_SIZES = [(800, 600), (1600, 1200), (3200, 2400)]
+QUICK_PLAYER_COUNTS = [1, 10, 100]
+QUICK_FOOD_COUNTS = [100, 1000, 10000]
+QUICK_WORLD_SIZES = [(800, 600)]
+START_LOCATION_CALLS = 100
+CASES = ["food_collision", "player_collision", "create_food", "start_location"]
+
+
+class WorldBenchmark:
+    """
+    Builds fresh headless worlds and runs a single benchmark case against them.
+    """
+
+    def __init__(self, base_cfg, server_module, seed, max_score):
+        self.base_cfg = base_cfg
+        self.server = server_module
+        self.seed = seed
+        self.max_score = max_score
+
+    def make_cfg(self, width, height, food_quantity):
+        return dataclasses.replace(
+            self.base_cfg,
+            width=width,
+            height=height,
+            server=dataclasses.replace(self.base_cfg.server, w=width, h=height),
+            food_quantity=max(food_quantity, 1),
+        )
+
+    def make_world(self, players, food, width, height, food_quantity=None):
+        """Returns a ServerLogic over a freshly populated world."""
+        from common.food import FoodCellManager
+        from common.player import PlayerManager
+
+        quantity = food if food_quantity is None else food_quantity
+        cfg = self.make_cfg(width, height, quantity)
+        rng = seeded_rng(self.seed)
+        p_manager = PlayerManager(cfg)
+        f_manager = FoodCellManager(cfg, p_manager)
+        populate_players(p_manager, players, self.max_score, rng)
+        populate_food(f_manager, food, rng)
+        return self.server.ServerLogic(cfg, p_manager, f_manager)
+
+    def run_case(self, case, players, food, width, height, repeat, track_memory):
+        if case == "food_collision":
+            entities = players + food
+            setup = lambda: self.make_world(players, food, width, height)
+            run = lambda logic: logic.player_food_collision()
+        elif case == "player_collision":
+            entities = players
+            setup = lambda: self.make_world(players, 0, width, height)
+            run = lambda logic: logic.player_collisions()
+        elif case == "create_food":
+            entities = food
+            setup = lambda: self.make_world(players, 0, width, height, food)
+            run = lambda logic: logic.create_food(food)
+        elif case == "start_location":
+            entities = max(players, 1) * START_LOCATION_CALLS
+            setup = lambda: self.make_world(players, 0, width, height)
+
+            def run(logic):
+                for _ in range(START_LOCATION_CALLS):
+                    logic.p_manager.get_start_location()
+
+        else:
+            raise ValueError(f"Unknown benchmark case {case}")
+
+        timing = measure(setup, run, repeat, track_memory)
+        return {
+            "case": case,
+            "players": players,
+            "food": food,
+            "width": width,
+            "height": height,
+            "entities": entities,
+            "repeat": repeat,
+            **timing,
+            "ns_per_entity": round(timing["best_ns"] / max(entities, 1), 2),
+            "entities_per_sec": round(entities / max(timing["best_ns"], 1) * 1e9, 1),
+        }
+
+
+def sweep_points(case, player_counts, food_counts, world_sizes):
+    """Yields the (players, food, width, height) points that are relevant to a case."""
+    if case == "food_collision":
+        grid = itertools.product(player_counts, food_counts, world_sizes)
+    elif case == "create_food":
+        grid = itertools.product([0], food_counts, world_sizes)
+    else:
+        grid = itertools.product(player_counts, [0], world_sizes)
+    for players, food, (width, height) in grid:
+        yield players, food, width, height
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=CASES)
+    parser.add_argument("--players", nargs="+", type=int)
+    parser.add_argument("--food", nargs="+", type=int)
+    parser.add_argument(
+        "--world",
+        nargs="+",
+        metavar="WxH",
+        help="world sizes to sweep, e.g. 800x600 1600x1200",
+    )
+    parser.add_argument("--quick", action="store_true", help="use a small sweep")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-score", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", help="JSON lines file to write results to")
+    parser.add_argument("--compare", help="previous JSON lines results to compare")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    player_counts = args.players or (
+        QUICK_PLAYER_COUNTS if args.quick else PLAYER_COUNTS
+    )
+    food_counts = args.food or (QUICK_FOOD_COUNTS if args.quick else FOOD_COUNTS)
+    if args.world:
+        world_sizes = [tuple(int(v) for v in size.split("x")) for size in args.world]
+    else:
+        world_sizes = QUICK_WORLD_SIZES if args.quick else WORLD_SIZES
+
+    bench = WorldBenchmark(
+        load_config(), load_server_module(), args.seed, args.max_score
+    )
+    results = []
+    for case in args.cases:
+        for players, food, width, height in sweep_points(
+            case, player_counts, food_counts, world_sizes
+        ):
+            row = bench.run_case(
+                case, players, food, width, height, args.repeat, not args.no_memory
+            )
+            print(
+                f"[BENCH]\t{case:<16} players={players:<5} food={food:<6} "
+                f"world={width}x{height}\t{row['ns_per_entity']:>10} ns/entity",
+                file=sys.stderr,
+            )
+            results.append(row)
+
+    curves = []
+    for case in args.cases:
+        for axis in ("players", "food", "width"):
+            curves.extend(scaling_exponents(results, case, axis))
+    for curve in curves:
+        if curve["exponent"] > 1.2:
+            print(
+                f"[BENCH]\t{curve['case']} is super-linear in {curve['axis']} "
+                f"({curve['from']} -> {curve['to']}): exponent {curve['exponent']}",
+                file=sys.stderr,
+            )
+
+    rows = results + [{"scaling": curve} for curve in curves]
+    if args.compare:
+        rows += [
+            {"comparison": entry}
+            for entry in compare_results(read_results(args.compare), results)
+        ]
+    write_results(rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
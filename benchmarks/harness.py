@@ -0,0 +1,197 @@
+""" Shared helpers for the headless benchmark scripts. """
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def load_config(overrides=None):
+    """
+    Resolves the game settings from the config directory.
+
+    Parameters:
+        overrides (list): Dotted overrides such as ["width=1600"].
+    """
+    from common.settings import load_settings
+
+    return load_settings(overrides or ())
+
+
+def load_server_module():
+    """
+    Imports the top level server.py script as a module.
+
+    The ``server`` package shadows the script, so it is loaded by path.
+    """
+    spec = importlib.util.spec_from_file_location(
+        "evolario_server", os.path.join(ROOT, "server.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def populate_players(p_manager, n, max_score, rng):
+    """
+    Adds n players at uniformly random positions with random scores.
+
+    Positions are drawn directly so the setup does not depend on
+    get_start_location, which is itself one of the benchmarked paths.
+    """
+    from common.player import Player
+    from common.utilities import Position
+
+    width, height = p_manager.cfg.width, p_manager.cfg.height
+    for player_id in range(n):
+        player = Player(
+            p_manager.cfg,
+            player_id,
+            f"bench_{player_id}",
+            Position(rng.randrange(0, width), rng.randrange(0, height)),
+        )
+        player.score = rng.randint(0, max_score)
+        p_manager.players[player_id] = player
+        p_manager.leaderboard.update(player_id, player.name, player.score)
+
+
+def populate_food(f_manager, n, rng):
+    """Adds n food cells at uniformly random positions."""
+    from common.utilities import Position
+
+    width, height = f_manager.cfg.width, f_manager.cfg.height
+    for _ in range(n):
+        f_manager.add(Position(rng.randint(0, width), rng.randint(0, height)))
+
+
+def measure(setup, run, repeat, track_memory=True):
+    """
+    Times ``run(state)`` against a fresh ``state = setup()`` for each repetition.
+
+    Returns:
+        dict: best and median wall time in ns and the peak traced memory in bytes.
+    """
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter_ns()
+            run(state)
+            timings.append(time.perf_counter_ns() - start)
+
+    peak = 0
+    if track_memory:
+        # Memory is traced in a separate pass because tracemalloc skews timings
+        state = setup()
+        tracemalloc.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "best_ns": timings[0],
+        "median_ns": timings[len(timings) // 2],
+        "peak_bytes": peak,
+    }
+
+
+def scaling_exponents(results, case, axis):
+    """
+    Computes the local scaling exponent of a case along one sweep axis.
+
+    For consecutive points the exponent is log(t2 / t1) / log(n2 / n1), so
+    1.0 is linear and anything noticeably above it is super-linear.
+    """
+    fixed_keys = [key for key in ("players", "food", "width", "height") if key != axis]
+    groups = {}
+    for row in results:
+        if row["case"] != case:
+            continue
+        groups.setdefault(tuple(row[key] for key in fixed_keys), []).append(row)
+
+    curves = []
+    for fixed, rows in groups.items():
+        rows.sort(key=lambda row: row[axis])
+        for prev, cur in zip(rows, rows[1:]):
+            if prev[axis] <= 0 or prev["best_ns"] <= 0 or cur[axis] == prev[axis]:
+                continue
+            exponent = math.log(cur["best_ns"] / prev["best_ns"]) / math.log(
+                cur[axis] / prev[axis]
+            )
+            curves.append(
+                {
+                    "case": case,
+                    "axis": axis,
+                    "from": prev[axis],
+                    "to": cur[axis],
+                    "fixed": dict(zip(fixed_keys, fixed)),
+                    "exponent": round(exponent, 3),
+                }
+            )
+    return curves
+
+
+def write_results(rows, path=None):
+    """Writes one JSON object per line to path, or stdout if no path is given."""
+    lines = "\n".join(json.dumps(row, sort_keys=True) for row in rows) + "\n"
+    if path is None:
+        sys.stdout.write(lines)
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(lines)
+
+
+def read_results(path):
+    """Reads a JSON lines results file written by write_results."""
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def result_key(row):
+    """Identifies a benchmark point independently of its measurements."""
+    return (row["case"], row["players"], row["food"], row["width"], row["height"])
+
+
+def compare_results(baseline, current):
+    """
+    Pairs up matching benchmark points from two runs.
+
+    Returns:
+        list: one dict per shared point with the current/baseline time ratio.
+    """
+    previous = {result_key(row): row for row in baseline if "case" in row}
+    comparison = []
+    for row in current:
+        if "case" not in row or result_key(row) not in previous:
+            continue
+        old = previous[result_key(row)]
+        comparison.append(
+            {
+                "case": row["case"],
+                "players": row["players"],
+                "food": row["food"],
+                "width": row["width"],
+                "height": row["height"],
+                "baseline_ns": old["best_ns"],
+                "current_ns": row["best_ns"],
+                "ratio": round(row["best_ns"] / max(old["best_ns"], 1), 3),
+            }
+        )
+    return comparison
+
+
+def seeded_rng(seed):
+    """Seeds the global and a private random generator for reproducible worlds."""
+    random.seed(seed)
+    return random.Random(seed)
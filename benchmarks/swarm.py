@@ -0,0 +1,346 @@
+"""
+Synthetic bot swarm for end-to-end server load testing.
+
+Opens many connections through the normal name/id handshake and drives
+scripted movement at a fixed rate per bot, spread over worker processes
+that each run one thread per bot:
+
+    python -m benchmarks.swarm --bots 500 --processes 8 --rate 30 --duration 60
+
+With --mode batch every worker process instead drives all of its bots over
+a single batch session, sending one inputs message per tick.
+
+--unix connects over a Unix domain socket instead of TCP, and --udp sends
+the movement as datagrams and then fetches the world with "get".
+--encoding asks for compact snapshots, e.g. "zlib" or "auto 2000", and
+--interest for level of detail updates around each bot.
+
+Reports server ticks/sec (queried with the "stats" command), client observed
+round trip latency percentiles, bytes/sec in both directions and disconnects.
+"""
+import argparse
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+
+import _pickle as pickle
+
+from benchmarks.harness import ROOT
+from client.client import CountingSocketReader
+from common.codec import decode_snapshot
+from common.metrics import percentile
+from common.interest import InterestMerger
+from common.protocol import frame, is_interest, is_packed
+from common.transport import UdpChannel, open_stream
+
+NAME_SIZE = 16
+ID_BUFFER = 200000
+
+
+class SwarmBot:
+    """
+    A single scripted bot that walks in straight lines and bounces off the world edges.
+    """
+
+    def __init__(self, name, args, rng):
+        self.name = name
+        self.args = args
+        self.rng = rng
+        self.latencies = []
+        self.bytes_out = 0
+        self.messages = 0
+        self.disconnected = False
+        self.error = None
+        self.reader = None
+        self.udp = None
+        self.merger = None
+
+    def connect(self):
+        address = self.args.unix or (self.args.host, self.args.port)
+        self.sock = open_stream(address, timeout=self.args.timeout)
+        self.sock.send(self.name.encode("utf-8")[:NAME_SIZE])
+        self.player_id = int(self.sock.recv(ID_BUFFER).decode())
+        self.reader = CountingSocketReader(self.sock)
+        self.stream = io.BufferedReader(self.reader, 65536)
+        if self.args.udp:
+            _, host, port, token = self.request("udp")
+            if port is None:
+                raise ValueError("the server does not receive datagrams")
+            self.udp = UdpChannel((host, port), token)
+        if self.args.encoding:
+            _, codec = self.request(f"encoding {self.args.encoding}")
+            if codec is None:
+                raise ValueError(f"unknown encoding {self.args.encoding!r}")
+        if self.args.interest:
+            _, food_radius = self.request("interest")
+            self.merger = InterestMerger(food_radius)
+
+    def send_input(self, command):
+        """Sends a movement command and fetches the world it led to."""
+        if self.udp is None:
+            return self.request(command)
+        self.bytes_out += self.udp.send(command)
+        return self.request("get")
+
+    def request(self, command):
+        """Sends one command and blocks until the full reply has been decoded."""
+        payload = frame(command)
+        start = time.perf_counter()
+        self.sock.sendall(payload)
+        reply = pickle.load(self.stream)
+        if is_packed(reply):
+            reply = decode_snapshot(reply)
+        elif self.merger is not None and is_interest(reply):
+            reply = self.merger.apply(reply)
+        self.latencies.append(time.perf_counter() - start)
+        self.bytes_out += len(payload)
+        self.messages += 1
+        return reply
+
+    def run(self, deadline):
+        try:
+            self.connect()
+            _, players = self.request("get")[:2]
+            player = players[self.player_id]
+            x, y = player.position.x, player.position.y
+            angle = self.rng.uniform(0, 2 * math.pi)
+            interval = 1 / self.args.rate
+            next_send = time.perf_counter()
+            while time.time() < deadline:
+                if self.rng.random() < 0.02:
+                    angle = self.rng.uniform(0, 2 * math.pi)
+                if self.args.mode == "dir":
+                    # The server integrates the movement and keeps it in bounds
+                    self.send_input(f"dir {math.cos(angle):.3f} {math.sin(angle):.3f}")
+                else:
+                    x += math.cos(angle) * self.args.speed
+                    y += math.sin(angle) * self.args.speed
+                    if not 0 <= x <= self.args.width or not 0 <= y <= self.args.height:
+                        angle += math.pi
+                        x = min(max(x, 0), self.args.width)
+                        y = min(max(y, 0), self.args.height)
+                    self.send_input(f"move {round(x)} {round(y)}")
+
+                next_send += interval
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_send = time.perf_counter()
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, ValueError) as e:
+            self.disconnected = True
+            self.error = repr(e)
+        finally:
+            if self.reader is not None:
+                self.sock.close()
+            if self.udp is not None:
+                self.udp.close()
+
+    def report(self):
+        return {
+            "bots": 1,
+            "latencies": self.latencies,
+            "bytes_in": self.reader.bytes_read if self.reader else 0,
+            "bytes_out": self.bytes_out,
+            "messages": self.messages,
+            "disconnected": self.disconnected,
+            "error": self.error,
+        }
+
+
+class SwarmBatch(SwarmBot):
+    """
+    A batch session that drives many scripted bots over one connection.
+
+    Each bot keeps a heading that changes at random; the server integrates
+    the movement and keeps the bots in bounds.
+    """
+
+    def __init__(self, name, args, rng, bot_count):
+        super().__init__("batch", args, rng)
+        self.prefix = name
+        self.bot_count = bot_count
+
+    def run(self, deadline):
+        try:
+            self.connect()
+            _, ids = self.request(f"register {self.bot_count} {self.prefix}")
+            angles = {i: self.rng.uniform(0, 2 * math.pi) for i in ids}
+            interval = 1 / self.args.rate
+            next_send = time.perf_counter()
+            while time.time() < deadline:
+                for i in angles:
+                    if self.rng.random() < 0.02:
+                        angles[i] = self.rng.uniform(0, 2 * math.pi)
+                inputs = " ".join(
+                    f"{i} {math.cos(angle):.3f} {math.sin(angle):.3f}"
+                    for i, angle in angles.items()
+                )
+                self.send_input(f"inputs {inputs}")
+
+                next_send += interval
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_send = time.perf_counter()
+        except (OSError, EOFError, pickle.UnpicklingError, KeyError, ValueError) as e:
+            self.disconnected = True
+            self.error = repr(e)
+        finally:
+            if self.reader is not None:
+                self.sock.close()
+            if self.udp is not None:
+                self.udp.close()
+
+    def report(self):
+        report = super().report()
+        report["bots"] = self.bot_count
+        return report
+
+
+def run_worker(worker_index, bot_count, args, deadline):
+    """Runs bot_count bots on threads inside one worker process."""
+    rng = random.Random(args.seed + worker_index)
+    if args.mode == "batch":
+        batch = SwarmBatch(f"swarm_{worker_index}", args, rng, bot_count)
+        batch.run(deadline)
+        return [batch.report()]
+    bots = [
+        SwarmBot(f"swarm_{worker_index}_{i}", args, random.Random(rng.random()))
+        for i in range(bot_count)
+    ]
+    threads = []
+    for bot in bots:
+        thread = threading.Thread(target=bot.run, args=(deadline,), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp / max(args.bots, 1))
+    for thread in threads:
+        thread.join(max(deadline - time.time(), 0) + args.timeout)
+    return [bot.report() for bot in bots]
+
+
+def query_stats(args):
+    """Connects as a stats probe, which adds no player, and fetches the server metrics."""
+    args = argparse.Namespace(
+        **{**vars(args), "udp": False, "encoding": None, "interest": False}
+    )
+    probe = SwarmBot("stats", args, random.Random(args.seed))
+    probe.connect()
+    try:
+        return probe.request("stats")
+    finally:
+        probe.sock.close()
+
+
+def summarise(reports, elapsed, stats_before, stats_after):
+    latencies = sorted(lat for report in reports for lat in report["latencies"])
+    bytes_in = sum(report["bytes_in"] for report in reports)
+    bytes_out = sum(report["bytes_out"] for report in reports)
+    errors = {}
+    for report in reports:
+        if report["error"]:
+            errors[report["error"]] = errors.get(report["error"], 0) + 1
+
+    summary = {
+        "bots": sum(report["bots"] for report in reports),
+        "connections": len(reports),
+        "elapsed": elapsed,
+        "messages": len(latencies),
+        "messages_per_sec": len(latencies) / elapsed,
+        "latency_ms_p50": percentile(latencies, 50) * 1000,
+        "latency_ms_p90": percentile(latencies, 90) * 1000,
+        "latency_ms_p99": percentile(latencies, 99) * 1000,
+        "latency_ms_max": latencies[-1] * 1000 if latencies else 0.0,
+        "bytes_in_per_sec": bytes_in / elapsed,
+        "bytes_out_per_sec": bytes_out / elapsed,
+        "disconnects": sum(report["disconnected"] for report in reports),
+        "errors": errors,
+    }
+    if stats_before and stats_after:
+        uptime = stats_after["uptime"] - stats_before["uptime"]
+        summary["server_ticks_per_sec"] = (
+            (stats_after["ticks"] - stats_before["ticks"]) / uptime if uptime else 0.0
+        )
+        summary["server_tick_ms_p99"] = stats_after["tick_ms_p99"]
+        summary["server_disconnects"] = (
+            stats_after["disconnects"] - stats_before["disconnects"]
+        )
+    return summary
+
+
+def read_host():
+    with open(os.path.join(ROOT, "ip.txt"), encoding="utf-8") as ip_file:
+        return ip_file.read().strip()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", help="server host, defaults to the ip in ip.txt")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--unix", help="connect to this Unix domain socket path")
+    parser.add_argument("--udp", action="store_true", help="send movement as datagrams")
+    parser.add_argument(
+        "--interest", action="store_true", help="ask for level of detail updates"
+    )
+    parser.add_argument(
+        "--encoding", help='snapshot encoding, e.g. "zlib" or "auto <kbit/s>"'
+    )
+    parser.add_argument("--bots", type=int, default=100)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--rate", type=float, default=30, help="moves/sec per bot")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds to connect all")
+    parser.add_argument("--speed", type=float, default=2)
+    parser.add_argument(
+        "--mode",
+        choices=("move", "dir", "batch"),
+        default="move",
+        help="send absolute positions, movement intents or one batch per process",
+    )
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to write the JSON summary to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    args.host = args.host or read_host()
+    processes = max(min(args.processes, args.bots), 1)
+    shares = [
+        args.bots // processes + (i < args.bots % processes) for i in range(processes)
+    ]
+
+    stats_before = query_stats(args)
+    print(f"[INFO]\tStarting {args.bots} bots over {processes} processes")
+    start = time.time()
+    deadline = start + args.ramp + args.duration
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(
+            run_worker,
+            [(i, share, args, deadline) for i, share in enumerate(shares)],
+        )
+    elapsed = time.time() - start
+    stats_after = query_stats(args)
+
+    reports = [report for worker in results for report in worker]
+    summary = summarise(reports, elapsed, stats_before, stats_after)
+    output = json.dumps(summary, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
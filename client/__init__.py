@@ -1,3 +1,4 @@
-__all__ = ["client"]
+__all__ = ["client", "batch"]
 
+from client.batch import BatchClient
 from client.client import Client
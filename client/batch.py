@@ -0,0 +1,78 @@
+from client.client import Client
+
+
+def format_inputs(inputs):
+    """
+    builds the "inputs" command for a batch of bot directions
+
+    :param inputs: dict of player id -> (dx, dy) direction
+    :return: str
+    """
+    data = " ".join(f"{i} {dx} {dy}" for i, (dx, dy) in inputs.items())
+    return f"inputs {data}"
+
+
+class BatchClient(Client):
+    """
+    class to control many bots over a single connection to the server
+
+    Bots are registered in bulk, the inputs of every bot are sent in one
+    message per tick and a single shared snapshot comes back, instead of one
+    connection and one copy of the world per bot.
+    """
+
+    def connect(self, name="batch"):
+        """
+        connects to server as a batch session
+        :param name: str, must be "batch" for the server to treat it as one
+        :return: int, -1 as the session has no player of its own
+        """
+        return super().connect(name)
+
+    def register(self, count, prefix="bot"):
+        """
+        adds count bots to the world, controlled by this session
+
+        :param count: int number of bots
+        :param prefix: str bot names are "<prefix>_<id>", without spaces
+        :return: list of the new player ids, fewer than count when the server
+            caps the bots per command (MAX_REGISTER) or per session (MAX_SESSION_BOTS)
+        """
+        _, ids = self.send(f"register {count} {prefix}")
+        return ids
+
+    def unregister(self, ids):
+        """
+        removes bots of this session from the world
+
+        :param ids: iterable of player ids
+        :return: list of the ids that were unregistered
+        """
+        ids = list(ids)
+        if not ids:
+            return []
+        _, ids = self.send("unregister " + " ".join(str(i) for i in ids))
+        return ids
+
+    def step(self, inputs):
+        """
+        sends the direction of every bot and receives the next snapshot
+
+        :param inputs: dict of player id -> (dx, dy) direction
+        :return: (food_cells, players, meta) snapshot shared by all bots
+        """
+        if not inputs:
+            return self.send("get")
+        return self.send(format_inputs(inputs))
+
+    def push(self, inputs):
+        """
+        sends the direction of every bot without waiting for a snapshot,
+        for sessions that read the world through attach_shm; it goes over
+        the unreliable channel once open_udp was called
+
+        :param inputs: dict of player id -> (dx, dy) direction
+        :return: None
+        """
+        if inputs:
+            self.send_unreliable(format_inputs(inputs))
@@ -1,9 +1,67 @@
+import io
 import os
-import socket
+import time
 import traceback
 
 import _pickle as pickle
 
+from common.protocol import frame, is_interest, is_packed
+from common.transport import UdpChannel, open_stream
+
+
+class CountingSocketReader(io.RawIOBase):
+    """
+    Raw stream over a socket that counts every byte received.
+
+    Wrapped in a BufferedReader it lets pickle.load consume exactly one
+    reply at a time, however many recv calls the reply is split across.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        received = self.sock.recv_into(buffer)
+        self.bytes_read += received
+        return received
+
+
+class ClientTelemetry:
+    """
+    Opt-in telemetry hook for the Client that totals traffic per command.
+    """
+
+    def __init__(self, verbose=False):
+        """
+        :param verbose: bool if every request should also be printed
+        """
+        self.verbose = verbose
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.messages = 0
+        self.commands = {}
+
+    def __call__(self, event):
+        """
+        Records a single request made by the client
+
+        :param event: dict with command, bytes_in, bytes_out and elapsed keys
+        :return: None
+        """
+        self.bytes_in += event["bytes_in"]
+        self.bytes_out += event["bytes_out"]
+        self.messages += 1
+        self.commands[event["command"]] = self.commands.get(event["command"], 0) + 1
+        if self.verbose:
+            print(
+                f"[INFO]\t{event['command']} response size: {event['bytes_in']} "
+                f"in {event['elapsed'] * 1000:.2f}ms"
+            )
+
 
 class Client:
     """
@@ -12,15 +70,27 @@ class Client:
     need to hardcode the host attirbute to be the server's ip
     """
 
-    def __init__(self):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    def __init__(self, telemetry=None, address=None):
+        """
+        :param telemetry: optional callable receiving a dict for every request
+        :param address: optional (host, port) to connect to over TCP, or a path
+            to connect to over a Unix domain socket; defaults to ip.txt port 5555
+        """
+        self.sock = None
+        self.telemetry = telemetry
+        self.reader = None
+        self.stream = None
+        self.last_rtt_ms = None
+        self.shm = None
+        self.udp = None
+        self.interest = None
         print("[INFO]\tClient created")
-        # Read IP from file
-        with open("ip.txt") as ip_file:
-            self.host = ip_file.read()
+        if address is None:
+            # Read IP from file
+            with open("ip.txt") as ip_file:
+                address = (ip_file.read(), 5555)
         # self.client.settimeout(10.0)
-        self.port = 5555
-        self.addr = (self.host, self.port)
+        self.addr = address
 
     def connect(self, name):
         """
@@ -28,9 +98,11 @@ class Client:
         :param name: str
         :return: int reprsenting id
         """
-        self.sock.connect(self.addr)
-        self.sock.send(str.encode(name))
+        self.sock = open_stream(self.addr)
+        self.sock.sendall(frame(name))
         val = self.sock.recv(200000)
+        self.reader = CountingSocketReader(self.sock)
+        self.stream = io.BufferedReader(self.reader, 65536)
         return int(val.decode())  # can be int because will be an int id
 
     def disconnect(self):
@@ -38,6 +110,12 @@ class Client:
         disconnects from the server
         :return: None
         """
+        if self.shm is not None:
+            self.shm.close()
+            self.shm = None
+        if self.udp is not None:
+            self.udp.close()
+            self.udp = None
         self.sock.close()
 
     def send(self, data):
@@ -48,15 +126,161 @@ class Client:
         :param pick: boolean if should pickle or not
         :return: str
         """
-        # Send request to server
-        self.sock.send(str.encode(data))
+        # Send request to server as a single newline terminated frame
+        payload = frame(data)
+        start = time.perf_counter()
+        received_before = self.reader.bytes_read
+        self.sock.sendall(payload)
 
-        full_response = self.sock.recv(200000)
-        print(f"[INFO]\tFull response size: {len(full_response)}")
-        reply = pickle.loads(full_response)
+        reply = self.receive()
+        if self.telemetry is not None:
+            self.telemetry(
+                {
+                    "command": data.split(" ")[0],
+                    "bytes_out": len(payload),
+                    "bytes_in": self.reader.bytes_read - received_before,
+                    "elapsed": time.perf_counter() - start,
+                }
+            )
+
+        return reply
 
+    def receive(self):
+        """
+        reads the next reply, or the next snapshot pushed to a spectator
+
+        :return: the unpickled reply, with packed snapshots already decoded
+        """
+        # Read exactly one pickled reply, however it was split on the wire
+        reply = pickle.load(self.stream)
+        if is_packed(reply):
+            from common.codec import decode_snapshot
+
+            reply = decode_snapshot(reply)
+        elif self.interest is not None and is_interest(reply):
+            reply = self.interest.apply(reply)
         return reply
 
+    def enable_interest(self):
+        """
+        asks for level of detail updates around this client's player
+
+        Nearby players are then refreshed every tick, distant ones every few
+        ticks and food only when it changes. Replies are merged into a full
+        world, so they look the same as before.
+
+        :return: None
+        """
+        _, food_radius = self.send("interest")
+        from common.interest import InterestMerger
+
+        self.interest = InterestMerger(food_radius)
+
+    def set_encoding(self, name, link_kbps=None):
+        """
+        asks the server for compact snapshots, for clients on slow links
+
+        :param name: str one of "raw", "packed", "zlib", "lz4" or "auto"
+        :param link_kbps: float speed of the link in kbit/s, used by "auto"
+        :return: str the encoding the server picked, None if it is unknown
+        """
+        data = f"encoding {name}"
+        if link_kbps is not None:
+            data += f" {link_kbps}"
+        _, codec = self.send(data)
+        return codec
+
+    def attach_shm(self):
+        """
+        reads the world from shared memory instead of the socket, if the
+        server runs on this machine and publishes it
+
+        Movement commands are no longer answered once attached; send them
+        with send_input and read the world from the returned reader.
+
+        :return: ShmWorldReader, or None when the server has no shared memory
+        """
+        _, name = self.send("shm")
+        if name is None:
+            return None
+        from common.shm import ShmWorldReader
+
+        self.shm = ShmWorldReader(name)
+        return self.shm
+
+    def send_input(self, data):
+        """
+        sends a command to the server without waiting for a reply
+
+        :param data: str
+        :return: None
+        """
+        payload = frame(data)
+        self.sock.sendall(payload)
+        if self.telemetry is not None:
+            self.telemetry(
+                {
+                    "command": data.split(" ")[0],
+                    "bytes_out": len(payload),
+                    "bytes_in": 0,
+                    "elapsed": 0.0,
+                }
+            )
+
+    def open_udp(self):
+        """
+        opens an unreliable channel for movement commands, if the server has one
+
+        Movement sent with send_unreliable then skips TCP's head-of-line
+        blocking; inputs that arrive after a newer one are dropped.
+
+        :return: UdpChannel, or None when the server does not receive datagrams
+        """
+        _, host, port, token = self.send("udp")
+        if port is None:
+            return None
+        self.udp = UdpChannel((host, port), token)
+        return self.udp
+
+    def send_unreliable(self, data):
+        """
+        sends a movement command over the unreliable channel without waiting
+        for a reply, or over the connection when no channel is open
+
+        :param data: str
+        :return: None
+        """
+        if self.udp is None:
+            self.send_input(data)
+            return
+        sent = self.udp.send(data)
+        if self.telemetry is not None:
+            self.telemetry(
+                {
+                    "command": data.split(" ")[0],
+                    "bytes_out": sent,
+                    "bytes_in": 0,
+                    "elapsed": 0.0,
+                }
+            )
+
+    def ping(self):
+        """
+        measures the round trip time to the server
+
+        The previous measurement is sent along so the server can keep its
+        own estimate of this connection's latency.
+
+        :return: float round trip time in milliseconds
+        """
+        timestamp = time.time()
+        data = f"ping {timestamp!r}"
+        if self.last_rtt_ms is not None:
+            data += f" {self.last_rtt_ms:.3f}"
+        self.send(data)
+        self.last_rtt_ms = (time.time() - timestamp) * 1000
+        return self.last_rtt_ms
+
     def send2(self, data):
         """
         sends information to the server
@@ -66,19 +290,27 @@ class Client:
         :return: str
         """
         # Send request to server
-        self.sock.send(str.encode(data))
+        self.sock.sendall(frame(data))
         full_response = b""
         while True:
             # Receive data from server
             response = self.sock.recv(200000)
             # Append the response to the full_response
             full_response += response
-            # Print full response size
-            print(f"[INFO]\tFull response size: {len(full_response)}")
             # If response is empty, break the loop
             if len(response) == 0:
                 break
 
+        if self.telemetry is not None:
+            self.telemetry(
+                {
+                    "command": data.split(" ")[0],
+                    "bytes_out": len(data),
+                    "bytes_in": len(full_response),
+                    "elapsed": 0.0,
+                }
+            )
+
         # Decode data from server
         reply = pickle.loads(full_response)
 
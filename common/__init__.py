@@ -1,5 +1,17 @@
 __all__ = ["player", "food", "utilities"]
 
-from .food import FoodCellManager
-from .player import PlayerManager
-from .utilities import random_rgb
+# The managers are re-exported lazily so importing a light submodule such as
+# common.protocol does not pull in numpy and the spawning code
+_EXPORTS = {
+    "FoodCellManager": "common.food",
+    "PlayerManager": "common.player",
+    "random_rgb": "common.utilities",
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    return getattr(importlib.import_module(_EXPORTS[name]), name)
@@ -0,0 +1,484 @@
+""" This module contains the bot agents hosted inside the server process and run every tick. """
+import pickle
+import time
+
+import numpy as np
+
+# Nearby food and players an observation holds, as in neat-ai.py
+NEARBY_LIMIT = 10
+# Food and players further away than this are not part of an observation
+VIEW_DISTANCE = 100
+# Length of an observation: the position, then the nearby food and player distances
+FEATURES = 2 + 2 * NEARBY_LIMIT
+# Network outputs map to these (dx, dy) moves, in the order of the directions in neat-ai.py
+DIRECTIONS = np.array(
+    [
+        (0, -1),
+        (0, 1),
+        (-1, 0),
+        (1, 0),
+        (-1, -1),
+        (1, -1),
+        (-1, 1),
+        (1, 1),
+        (0, 0),
+    ],
+    dtype=float,
+)
+
+# Policies the "server.agents" setting can name, see register_policy
+POLICIES = {}
+
+
+def register_policy(name):
+    """
+    Registers a policy class under a name usable in the "server.agents" setting.
+
+    A policy is built as policy_class(cfg, arg), arg being the optional third
+    field of its entry, and must have an act(observations, rows) method.
+    """
+
+    def register(policy_class):
+        POLICIES[name] = policy_class
+        return policy_class
+
+    return register
+
+
+def parse_agents(spec):
+    """
+    Parses the "server.agents" setting.
+
+    Parameters:
+        spec (str): Comma separated "policy:count[:arg]" entries, e.g. "seek:20,wander:10".
+
+    Returns:
+        list: (policy, count, arg) tuples, arg being None when not given.
+
+    Raises:
+        ValueError: If an entry is malformed or names an unknown policy.
+    """
+    entries = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rest = entry.partition(":")
+        count, _, arg = rest.partition(":")
+        if name not in POLICIES:
+            raise ValueError(
+                f"Unknown agent policy {name!r}, expected one of {sorted(POLICIES)}"
+            )
+        try:
+            count = int(count) if count else 1
+        except ValueError:
+            raise ValueError(f"Bad agent count in {entry!r}") from None
+        entries.append((name, count, arg or None))
+    return entries
+
+
+def nearby_distances(tree, xy, limit, own=None):
+    """
+    Fetches the normalized distances to the nearest points around each row of xy.
+
+    Distances are sorted nearest first. Points further than VIEW_DISTANCE and
+    missing neighbours read as 0.
+
+    Parameters:
+        tree (cKDTree): The points to search, or None when there are none.
+        xy (np.ndarray): The (n, 2) positions to search around.
+        limit (int): The number of distances per row.
+        own (np.ndarray): The index of each row in the tree, skipped as its own neighbour.
+
+    Returns:
+        np.ndarray: An (n, limit) array of distances divided by VIEW_DISTANCE.
+    """
+    features = np.zeros((len(xy), limit))
+    if tree is None or not len(xy):
+        return features
+    k = limit + (own is not None)
+    distances, indices = tree.query(xy, k=k, distance_upper_bound=VIEW_DISTANCE)
+    distances = distances.reshape(len(xy), k)
+    if own is not None:
+        distances[indices.reshape(len(xy), k) == own[:, None]] = np.inf
+        distances.sort(axis=1)
+    distances = distances[:, :limit]
+    found = np.isfinite(distances)
+    features[found] = distances[found] / VIEW_DISTANCE
+    return features
+
+
+class Observations:
+    """
+    The Observations class holds what every agent sees on one tick, built in one batch.
+
+    The world is read into arrays once per tick and searched with KD trees
+    that are only built when a policy asks for them, so policies that only
+    need positions cost nothing extra.
+    """
+
+    def __init__(self, agent_ids, players, food_xy):
+        """
+        Initialize a new Observations instance.
+
+        Parameters:
+            agent_ids (list): The ids of the agents in the world, in row order.
+            players (dict): Every player in the world keyed by id.
+            food_xy (np.ndarray): The (m, 2) food positions.
+        """
+        player_ids = list(players)
+        rows = {player_id: row for row, player_id in enumerate(player_ids)}
+        self.player_xy = np.array(
+            [(player.position.x, player.position.y) for player in players.values()],
+            dtype=float,
+        ).reshape(-1, 2)
+        self.players = players
+        self.agent_ids = agent_ids
+        self.agent_rows = np.array([rows[i] for i in agent_ids], dtype=np.int64)
+        self.agent_xy = self.player_xy[self.agent_rows]
+        self.food_xy = food_xy
+        self._food_tree = None
+        self._player_tree = None
+
+    def food_tree(self):
+        """Fetches the KD tree of the food positions, or None when there is no food."""
+        if self._food_tree is None and len(self.food_xy):
+            from scipy.spatial import cKDTree
+
+            self._food_tree = cKDTree(self.food_xy)
+        return self._food_tree
+
+    def player_tree(self):
+        """Fetches the KD tree of the player positions."""
+        if self._player_tree is None:
+            from scipy.spatial import cKDTree
+
+            self._player_tree = cKDTree(self.player_xy)
+        return self._player_tree
+
+    def features(self, rows):
+        """
+        Builds the neural network inputs of some agents.
+
+        neat-ai.py trains on these same features, so genomes it evolves play
+        the same when hosted by the server.
+
+        Parameters:
+            rows (np.ndarray): The agent rows wanted.
+
+        Returns:
+            np.ndarray: One row per agent: its position followed by the nearby
+            food and nearby player distances.
+        """
+        xy = self.agent_xy[rows]
+        return np.hstack(
+            (
+                xy,
+                nearby_distances(self.food_tree(), xy, NEARBY_LIMIT),
+                nearby_distances(
+                    self.player_tree(), xy, NEARBY_LIMIT, self.agent_rows[rows]
+                ),
+            )
+        )
+
+    def raster(self, rows, encoder):
+        """
+        Renders egocentric grids of some agents, see common.observation.
+
+        Parameters:
+            rows (np.ndarray): The agent rows wanted.
+            encoder (RasterEncoder): The resolution and field of view to render with.
+
+        Returns:
+            np.ndarray: One (channels, resolution, resolution) grid per agent.
+        """
+        radii = np.array(
+            [player.get_radius() for player in self.players.values()], dtype=float
+        )
+        own = self.agent_rows[rows]
+        return encoder.encode(
+            self.agent_xy[rows], radii[own], self.food_xy, self.player_xy, radii, own
+        )
+
+    def nearest_food(self, rows):
+        """Fetches the position of the food nearest to some agents, NaN when there is none."""
+        tree = self.food_tree()
+        if tree is None:
+            return np.full((len(rows), 2), np.nan)
+        _, indices = tree.query(self.agent_xy[rows])
+        return self.food_xy[np.atleast_1d(indices)]
+
+
+@register_policy("wander")
+class WanderPolicy:
+    """
+    The WanderPolicy class moves agents in straight lines, turning at random.
+    """
+
+    def __init__(self, cfg, arg=None):
+        """
+        Initialize a new WanderPolicy instance.
+
+        Parameters:
+            cfg (Settings): The game settings.
+            arg (str): The chance per tick of turning, 0.02 by default.
+        """
+        self.turn_chance = float(arg) if arg else 0.02
+        self.rng = np.random.default_rng()
+        self.headings = {}
+
+    def act(self, observations, rows):
+        ids = [observations.agent_ids[row] for row in rows.tolist()]
+        turning = self.rng.random(len(ids)) < self.turn_chance
+        angles = self.rng.uniform(0, 2 * np.pi, len(ids))
+        moves = np.empty((len(ids), 2))
+        for k, agent_id in enumerate(ids):
+            if turning[k] or agent_id not in self.headings:
+                self.headings[agent_id] = (np.cos(angles[k]), np.sin(angles[k]))
+            moves[k] = self.headings[agent_id]
+        return np.zeros(len(ids), dtype=bool), moves
+
+
+@register_policy("seek")
+class SeekFoodPolicy:
+    """
+    The SeekFoodPolicy class heads every agent for the food nearest to it.
+    """
+
+    def __init__(self, cfg, arg=None):
+        self.centre = (cfg.width / 2, cfg.height / 2)
+
+    def act(self, observations, rows):
+        targets = observations.nearest_food(rows)
+        # With no food left, gather in the middle
+        targets[np.isnan(targets[:, 0])] = self.centre
+        return np.ones(len(rows), dtype=bool), targets
+
+
+class BatchNetwork:
+    """
+    The BatchNetwork class evaluates one NEAT feed forward network for many inputs at once.
+
+    It walks the same node evaluations as neat.nn.FeedForwardNetwork, with
+    every value being a column over all agents instead of a single number.
+    Activation and aggregation functions without a vectorized counterpart are
+    applied row by row.
+    """
+
+    def __init__(self, genome, neat_config):
+        """
+        Initialize a new BatchNetwork instance.
+
+        Parameters:
+            genome (neat.DefaultGenome): The genome to evaluate.
+            neat_config (neat.Config): The NEAT config the genome was evolved with.
+        """
+        import neat
+
+        self.net = neat.nn.FeedForwardNetwork.create(genome, neat_config)
+        activations = {
+            neat.activations.sigmoid_activation: lambda z: 1.0
+            / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+            neat.activations.tanh_activation: lambda z: np.tanh(
+                np.clip(2.5 * z, -60.0, 60.0)
+            ),
+            neat.activations.relu_activation: lambda z: np.maximum(z, 0.0),
+            neat.activations.identity_activation: lambda z: z,
+            neat.activations.clamped_activation: lambda z: np.clip(z, -1.0, 1.0),
+            neat.activations.abs_activation: np.abs,
+        }
+        aggregations = {
+            neat.aggregations.sum_aggregation: np.sum,
+            neat.aggregations.product_aggregation: np.prod,
+            neat.aggregations.max_aggregation: np.max,
+            neat.aggregations.min_aggregation: np.min,
+            neat.aggregations.mean_aggregation: np.mean,
+            neat.aggregations.median_aggregation: np.median,
+        }
+        self.node_evals = []
+        for node, act_func, agg_func, bias, response, links in self.net.node_evals:
+            act = activations.get(act_func, np.vectorize(act_func, otypes=[float]))
+            agg = aggregations.get(agg_func)
+            if agg is None:
+                agg = lambda values, func=agg_func: np.array(  # noqa: E731
+                    [func(list(row)) for row in values.T]
+                )
+            else:
+                agg = lambda values, func=agg: func(values, axis=0)  # noqa: E731
+            keys = [i for i, _ in links]
+            weights = np.array([w for _, w in links], dtype=float)
+            self.node_evals.append((node, act, agg, bias, response, keys, weights))
+
+    def activate(self, inputs):
+        """
+        Evaluates the network for every row of inputs.
+
+        Parameters:
+            inputs (np.ndarray): An (n, num_inputs) array.
+
+        Returns:
+            np.ndarray: An (n, num_outputs) array.
+        """
+        if inputs.shape[1] != len(self.net.input_nodes):
+            raise ValueError(
+                f"Expected {len(self.net.input_nodes)} inputs, got {inputs.shape[1]}"
+            )
+        n = len(inputs)
+        values = dict(zip(self.net.input_nodes, inputs.T))
+        for node, act, agg, bias, response, keys, weights in self.node_evals:
+            if keys:
+                stacked = np.stack([values[key] for key in keys]) * weights[:, None]
+                total = agg(stacked)
+            else:
+                total = np.zeros(n)
+            values[node] = act(bias + response * total)
+        zeros = np.zeros(n)
+        return np.stack(
+            [values.get(key, zeros) for key in self.net.output_nodes], axis=1
+        )
+
+
+@register_policy("neat")
+class NeatPolicy:
+    """
+    The NeatPolicy class steers agents with a NEAT genome, such as a winner saved by neat-ai.py.
+
+    Every agent of the policy shares the genome, so the whole group is
+    evaluated in one batch and the strongest output picks its direction.
+    """
+
+    def __init__(self, cfg, arg=None):
+        """
+        Initialize a new NeatPolicy instance.
+
+        Parameters:
+            cfg (Settings): The game settings; neat_ai_config_file is the NEAT config.
+            arg (str): The path of the pickled genome.
+
+        Raises:
+            ValueError: If no genome path is given, or the genome does not fit the observations.
+        """
+        import neat
+
+        if not arg:
+            raise ValueError('The neat policy needs a genome, e.g. "neat:5:winner.pkl"')
+        with open(arg, "rb") as file:
+            genome = pickle.load(file)
+        neat_config = neat.Config(
+            neat.DefaultGenome,
+            neat.DefaultReproduction,
+            neat.DefaultSpeciesSet,
+            neat.DefaultStagnation,
+            cfg.neat_ai_config_file,
+        )
+        self.network = BatchNetwork(genome, neat_config)
+        # A genome built for other features would silently read garbage
+        inputs = len(self.network.net.input_nodes)
+        if inputs != FEATURES:
+            raise ValueError(
+                f"The genome in {arg} has {inputs} inputs, the agents observe {FEATURES}"
+            )
+        outputs = len(self.network.net.output_nodes)
+        if outputs != len(DIRECTIONS):
+            raise ValueError(
+                f"The genome in {arg} has {outputs} outputs, one per direction "
+                f"({len(DIRECTIONS)}) is needed"
+            )
+
+    def act(self, observations, rows):
+        outputs = self.network.activate(observations.features(rows))
+        return np.zeros(len(rows), dtype=bool), DIRECTIONS[outputs.argmax(axis=1)]
+
+
+class AgentManager:
+    """
+    The AgentManager class runs the agents hosted by the server.
+
+    Agents are ordinary players, but instead of a connection and a thread
+    each they are stepped by the simulation thread: every tick one batch of
+    observations is built for all of them, each policy is evaluated once for
+    its whole group and the resulting intents are queued directly. Agents that
+    get eaten respawn on the next tick.
+    """
+
+    def __init__(self, cfg, p_manager):
+        """
+        Initialize a new AgentManager instance.
+
+        Parameters:
+            cfg (Settings): The game settings.
+            p_manager (PlayerManager): The players the agents join.
+        """
+        self.cfg = cfg
+        self.p_manager = p_manager
+        # (policy, [(agent_id, name)]) groups, in spawn order
+        self.groups = []
+        self.respawns = 0
+        self.step_time = 0.0
+
+    def __len__(self):
+        return sum(len(agents) for _, agents in self.groups)
+
+    def spawn(self, spec, player_ids):
+        """
+        Adds the agents described by a "server.agents" setting to the world.
+
+        Parameters:
+            spec (str): Comma separated "policy:count[:arg]" entries.
+            player_ids (callable): Hands out n unused player ids.
+
+        Raises:
+            ValueError: If the setting is malformed or a policy cannot be built.
+        """
+        for name, count, arg in parse_agents(spec):
+            policy = POLICIES[name](self.cfg, arg)
+            first = len(self)
+            agents = [
+                (player_id, f"{name}_{first + k}")
+                for k, player_id in enumerate(player_ids(count))
+            ]
+            self.p_manager.add_many(agents)
+            self.groups.append((policy, agents))
+
+    def step(self, food_xy):
+        """
+        Queues the next intent of every agent.
+
+        Must be called by the simulation thread while holding the world lock,
+        before the queued intents are applied.
+
+        Parameters:
+            food_xy (np.ndarray): The (m, 2) food positions.
+        """
+        start = time.perf_counter()
+        players = self.p_manager.players
+        eaten = [
+            agent
+            for _, agents in self.groups
+            for agent in agents
+            if agent[0] not in players
+        ]
+        if eaten:
+            self.p_manager.add_many(eaten)
+            self.respawns += len(eaten)
+
+        agent_ids = [agent_id for _, agents in self.groups for agent_id, _ in agents]
+        if agent_ids:
+            observations = Observations(agent_ids, players, food_xy)
+            first = 0
+            for policy, agents in self.groups:
+                if not agents:
+                    continue
+                rows = np.arange(first, first + len(agents))
+                first += len(agents)
+                targets, moves = policy.act(observations, rows)
+                for (agent_id, _), is_target, (x, y) in zip(
+                    agents, targets.tolist(), moves.tolist()
+                ):
+                    self.p_manager.queue_intent(agent_id, is_target, x, y)
+        self.step_time = time.perf_counter() - start
+
+    def summary(self):
+        """Fetches the agent counters reported in the server stats."""
+        return {
+            "agents": len(self),
+            "respawns": self.respawns,
+            "step_ms": self.step_time * 1000,
+        }
@@ -0,0 +1,87 @@
+""" This module contains the broad phase used to find player versus player collisions. """
+import numpy as np
+
+
+def overlapping_pairs(xy, radii):
+    """
+    Finds every pair of circles whose bounding boxes overlap, with sweep and prune on x.
+
+    Circles are sorted by their left edge; each one is paired with the circles
+    whose left edge lies before its own right edge, found with a single
+    searchsorted. Pairs are then pruned on y. This stays close to linear for
+    widely varying radii, unlike a fixed query radius.
+
+    Parameters:
+        xy (np.ndarray): The (n, 2) circle centres.
+        radii (np.ndarray): The circle radii.
+
+    Returns:
+        tuple: Two int arrays (i, j) of indices into xy, with i != j.
+    """
+    n = len(radii)
+    if n < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    xy = np.asarray(xy, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    order = np.argsort(xy[:, 0] - radii, kind="stable")
+    min_x = (xy[:, 0] - radii)[order]
+    max_x = (xy[:, 0] + radii)[order]
+    # Circles order[k + 1:end[k]] start before circle order[k] ends
+    end = np.searchsorted(min_x, max_x, side="right")
+    counts = np.maximum(end - np.arange(n) - 1, 0)
+    first = np.repeat(np.arange(n), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    second = first + 1 + offsets
+    i, j = order[first], order[second]
+
+    overlap_y = np.abs(xy[i, 1] - xy[j, 1]) <= radii[i] + radii[j]
+    return i[overlap_y], j[overlap_y]
+
+
+def eat_pairs(xy, radii):
+    """
+    Finds every (eater, victim) pair where the eater's circle covers the victim's centre.
+
+    Only strictly bigger players can eat, so equal sized players bounce off each other.
+
+    Returns:
+        tuple: Two int arrays (eater, victim) of indices into xy.
+    """
+    i, j = overlapping_pairs(xy, radii)
+    xy = np.asarray(xy, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    i_is_bigger = radii[i] > radii[j]
+    eater = np.where(i_is_bigger, i, j)
+    victim = np.where(i_is_bigger, j, i)
+    distance = np.hypot(*(xy[eater] - xy[victim]).T)
+    edible = (radii[eater] != radii[victim]) & (distance < radii[eater])
+    return eater[edible], victim[edible]
+
+
+def resolve_eats(pairs, radius_of):
+    """
+    Resolves eat events in a deterministic, size ordered batch.
+
+    Bigger eaters go first, ties are broken by key. A player can only be eaten
+    once and a player that has been eaten cannot eat anyone in the same batch.
+
+    Parameters:
+        pairs (iterable): (eater, victim) keys, e.g. indices or player ids.
+        radius_of (callable): Fetches the radius of a key at the start of the tick.
+
+    Returns:
+        list: The (eater, victim) pairs that take effect, in order.
+    """
+    ordered = sorted(
+        pairs,
+        key=lambda pair: (-radius_of(pair[0]), pair[0], -radius_of(pair[1]), pair[1]),
+    )
+    eaten = set()
+    accepted = []
+    for eater, victim in ordered:
+        if eater in eaten or victim in eaten:
+            continue
+        eaten.add(victim)
+        accepted.append((eater, victim))
+    return accepted
@@ -0,0 +1,252 @@
+""" This module contains the asynchronous checkpointing of NEAT training runs. """
+import copy
+import os
+import pickle
+import queue
+import random
+import re
+import struct
+import threading
+import zlib
+
+import neat
+from neat.reporting import BaseReporter
+
+# Every checkpoint starts with the magic and the format version
+MAGIC = b"EVOCKPT"
+VERSION = 1
+HEADER = struct.Struct(f"<{len(MAGIC)}sH")
+PREFIX = "neat-checkpoint-"
+SUFFIX = ".ckpt"
+NAME = re.compile(rf"^{PREFIX}(\d+){re.escape(SUFFIX)}$")
+
+
+class CheckpointError(Exception):
+    """Raised when a file is not a checkpoint this version can read."""
+
+
+def checkpoint_path(directory, generation):
+    """Fetches the path of the checkpoint taken before a generation is evaluated."""
+    return os.path.join(directory, f"{PREFIX}{generation:05d}{SUFFIX}")
+
+
+def list_checkpoints(directory):
+    """
+    Fetches the checkpoints in a directory, oldest first.
+
+    Returns:
+        list: (generation, path) pairs.
+    """
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        match = NAME.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def latest_checkpoint(directory):
+    """Fetches the path of the newest checkpoint in a directory, or None if there is none."""
+    found = list_checkpoints(directory)
+    return found[-1][1] if found else None
+
+
+def encode(pickled, level=6):
+    """Packs a pickled checkpoint state into the versioned, compressed file format."""
+    return HEADER.pack(MAGIC, VERSION) + zlib.compress(pickled, level)
+
+
+def decode(data):
+    """
+    Unpacks a checkpoint read from disk.
+
+    Raises:
+        CheckpointError: If the data is not a checkpoint, or from a newer version.
+    """
+    if len(data) < HEADER.size:
+        raise CheckpointError("Checkpoint is truncated")
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CheckpointError("Not a checkpoint file")
+    if version > VERSION:
+        raise CheckpointError(
+            f"Checkpoint format {version} is newer than the supported {VERSION}"
+        )
+    return pickle.loads(zlib.decompress(data[HEADER.size :]))
+
+
+def write_atomic(path, data):
+    """Writes a file so that a crash leaves either the old file or the whole new one."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def snapshot_species(species_set):
+    """
+    Copies a species set deep enough that speciating the next generation leaves the copy alone.
+
+    The reporters are left out, they hold the checkpointer and its thread.
+    """
+    snapshot = copy.copy(species_set)
+    snapshot.reporters = None
+    snapshot.genome_to_species = dict(species_set.genome_to_species)
+    snapshot.species = {}
+    for key, species in species_set.species.items():
+        species = copy.copy(species)
+        species.members = dict(species.members)
+        species.fitness_history = list(species.fitness_history)
+        snapshot.species[key] = species
+    return snapshot
+
+
+class AsyncCheckpointer(BaseReporter):
+    """
+    The AsyncCheckpointer class is a NEAT reporter saving the training state in the background.
+
+    At the end of every interval generations the population, species, random
+    state and the statistics gathered so far are pickled in one go, so the
+    saved state is consistent. Compressing and writing it happens on a
+    background thread while the next generation is already being evaluated.
+    Only the newest keep checkpoints are kept.
+
+    A checkpoint named N holds the population of generation N before it is
+    evaluated, so resuming from it starts with generation N.
+    """
+
+    def __init__(self, directory, interval=1, keep=3, statistics=None):
+        """
+        Initialize a new AsyncCheckpointer instance.
+
+        Parameters:
+            directory (str): Where the checkpoints are written.
+            interval (int): Generations between checkpoints.
+            keep (int): How many of the newest checkpoints to keep; 0 keeps them all.
+            statistics (neat.StatisticsReporter): Statistics saved along with the population.
+        """
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.statistics = statistics
+        self.generation = 0
+        self.last_saved = None
+        self.written = 0
+        self.error = None
+        self.pending = queue.Queue()
+        self.thread = threading.Thread(target=self.write_checkpoints, daemon=True)
+        self.thread.start()
+
+    def start_generation(self, generation):
+        self.generation = generation
+        if self.last_saved is None:
+            self.last_saved = generation
+
+    def end_generation(self, config, population, species_set):
+        # The population handed over here is already the next generation's
+        next_generation = self.generation + 1
+        if next_generation - self.last_saved >= self.interval:
+            self.save(config, population, species_set, next_generation)
+
+    def save(self, config, population, species_set, generation):
+        """
+        Takes a checkpoint of the state of generation before it is evaluated.
+
+        Genomes are never changed once created, apart from their fitness, so
+        the calling thread only copies the containers that training goes on
+        to change. Pickling, compressing and writing happen in the background.
+        """
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        state = {
+            "generation": generation,
+            "population": dict(population),
+            "fitness": {key: genome.fitness for key, genome in population.items()},
+            "species_set": snapshot_species(species_set),
+            "random_state": random.getstate(),
+            "innovation_tracker": copy.deepcopy(
+                getattr(config.genome_config, "innovation_tracker", None)
+            ),
+            "statistics": None,
+        }
+        if self.statistics is not None:
+            state["statistics"] = (
+                list(self.statistics.most_fit_genomes),
+                list(self.statistics.generation_statistics),
+            )
+        self.pending.put((generation, state))
+        self.last_saved = generation
+
+    def write_checkpoints(self):
+        """Writes the queued checkpoints, then drops the oldest ones."""
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                generation, state = item
+                pickled = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+                os.makedirs(self.directory, exist_ok=True)
+                write_atomic(
+                    checkpoint_path(self.directory, generation), encode(pickled)
+                )
+                self.written += 1
+                if self.keep:
+                    for _, path in list_checkpoints(self.directory)[: -self.keep]:
+                        os.remove(path)
+            except Exception as e:
+                print(f"[ERR]\tCould not write checkpoint: {e}")
+                self.error = e
+            finally:
+                self.pending.task_done()
+
+    def flush(self):
+        """Waits until every checkpoint taken so far is on disk."""
+        self.pending.join()
+
+    def close(self):
+        """Writes the remaining checkpoints and stops the background thread."""
+        self.pending.put(None)
+        self.thread.join()
+
+
+def restore_population(path, neat_config, statistics=None):
+    """
+    Resumes training from a checkpoint.
+
+    Parameters:
+        path (str): The checkpoint to resume from.
+        neat_config (neat.Config): The NEAT config to continue with.
+        statistics (neat.StatisticsReporter): Receives the statistics saved with the checkpoint.
+
+    Returns:
+        neat.Population: The population, about to evaluate the checkpoint's generation.
+
+    Raises:
+        CheckpointError: If the file is not a readable checkpoint.
+    """
+    with open(path, "rb") as file:
+        state = decode(file.read())
+    random.setstate(state["random_state"])
+    for key, genome in state["population"].items():
+        genome.fitness = state["fitness"][key]
+    population = neat.Population(
+        neat_config,
+        (state["population"], state["species_set"], state["generation"]),
+    )
+    tracker = state["innovation_tracker"]
+    if tracker is not None:
+        population.reproduction.innovation_tracker = tracker
+        neat_config.genome_config.innovation_tracker = tracker
+    if statistics is not None and state["statistics"] is not None:
+        statistics.most_fit_genomes, statistics.generation_statistics = state[
+            "statistics"
+        ]
+    return population
@@ -0,0 +1,376 @@
+""" This module contains the chunked world simulation that is sharded across worker processes. """
+import multiprocessing
+
+import numpy as np
+
+from common.broadphase import eat_pairs, resolve_eats
+from common.food import FoodCell
+from common.spawning import random_colours, sample_free_positions
+
+# Food ids are unique across workers: the chunk index lives in the high bits
+FOOD_ID_SHIFT = 40
+
+
+class ChunkGrid:
+    """
+    The ChunkGrid class splits the world into equally sized rectangular chunks.
+    Chunks are numbered row by row, starting from the top left corner.
+    """
+
+    def __init__(self, width, height, cols, rows):
+        """
+        Initialize a new ChunkGrid instance.
+
+        Parameters:
+            width (int): The width of the world.
+            height (int): The height of the world.
+            cols (int): The number of chunks along the x axis.
+            rows (int): The number of chunks along the y axis.
+        """
+        self.width = width
+        self.height = height
+        self.cols = cols
+        self.rows = rows
+        self.chunk_w = width / cols
+        self.chunk_h = height / rows
+
+    def __len__(self):
+        return self.cols * self.rows
+
+    def chunk_of(self, x, y):
+        """Fetches the index of the chunk containing the point (x, y)."""
+        col = min(max(int(x // self.chunk_w), 0), self.cols - 1)
+        row = min(max(int(y // self.chunk_h), 0), self.rows - 1)
+        return row * self.cols + col
+
+    def bounds(self, index):
+        """Fetches the (x0, y0, x1, y1) rectangle covered by a chunk."""
+        row, col = divmod(index, self.cols)
+        return (
+            col * self.chunk_w,
+            row * self.chunk_h,
+            (col + 1) * self.chunk_w,
+            (row + 1) * self.chunk_h,
+        )
+
+    def chunks_overlapping(self, x, y, radius):
+        """Fetches the indices of every chunk a circle's bounding box overlaps."""
+        col0 = min(max(int((x - radius) // self.chunk_w), 0), self.cols - 1)
+        col1 = min(max(int((x + radius) // self.chunk_w), 0), self.cols - 1)
+        row0 = min(max(int((y - radius) // self.chunk_h), 0), self.rows - 1)
+        row1 = min(max(int((y + radius) // self.chunk_h), 0), self.rows - 1)
+        return [
+            row * self.cols + col
+            for row in range(row0, row1 + 1)
+            for col in range(col0, col1 + 1)
+        ]
+
+
+class ChunkWorker:
+    """
+    The ChunkWorker class owns the food of a single chunk and runs inside a worker process.
+
+    Every tick it is handed the players whose circle overlaps the chunk: the
+    players owned by the chunk plus ghosts of boundary players owned by its
+    neighbours. It resolves their food collisions, reports which owned players
+    were eaten and by whom, and refills its food up to the chunk's quota.
+    """
+
+    def __init__(self, index, bounds, quota, refill_rate, seed):
+        """
+        Initialize a new ChunkWorker instance.
+
+        Parameters:
+            index (int): The index of the chunk in the ChunkGrid.
+            bounds (tuple): The (x0, y0, x1, y1) rectangle covered by the chunk.
+            quota (int): The amount of food the chunk is kept topped up to.
+            refill_rate (int): The most food cells spawned per tick.
+            seed (int): Seed for the chunk's random generator.
+        """
+        self.index = index
+        self.bounds = bounds
+        self.quota = quota
+        self.refill_rate = refill_rate
+        self.rng = np.random.default_rng(seed)
+        self.next_id = index << FOOD_ID_SHIFT
+        self.reset()
+
+    def reset(self):
+        """Removes all food; the next step refills the chunk from scratch."""
+        self.food_ids = np.empty(0, dtype=np.int64)
+        self.food_xy = np.empty((0, 2), dtype=np.int32)
+        self.food_colours = np.empty((0, 3), dtype=np.uint8)
+        self.filling = True
+
+    def spawn(self, n, player_xy, player_radii):
+        """Spawns up to n food cells inside the chunk away from players and returns them."""
+        x0, y0, x1, y1 = self.bounds
+        bounds = (x0, y0, max(int(x1) - 1, int(x0)), max(int(y1) - 1, int(y0)))
+        xy = sample_free_positions(n, bounds, player_xy, player_radii, self.rng).astype(
+            np.int32
+        )
+        n = len(xy)
+        ids = np.arange(self.next_id, self.next_id + n, dtype=np.int64)
+        self.next_id += n
+        colours = random_colours(n, self.rng)
+        self.food_ids = np.concatenate((self.food_ids, ids))
+        self.food_xy = np.concatenate((self.food_xy, xy))
+        self.food_colours = np.concatenate((self.food_colours, colours))
+        return ids, xy, colours
+
+    def step(self, ids, xy, radii, owned):
+        """
+        Simulates one tick of the chunk.
+
+        Parameters:
+            ids (np.ndarray): The ids of the players present in the chunk.
+            xy (np.ndarray): The (n, 2) player positions.
+            radii (np.ndarray): The player radii.
+            owned (np.ndarray): True for players owned by this chunk, False for ghosts.
+
+        Returns:
+            dict: food credits per player id, eat events, removed and added food.
+        """
+        from scipy.spatial import cKDTree
+
+        credits = {}
+        removed = np.empty(0, dtype=np.int64)
+        # Bigger players are served first so contested food goes to them
+        order = np.lexsort((ids, -radii))
+
+        if len(ids) and len(self.food_ids):
+            hits = cKDTree(self.food_xy).query_ball_point(xy, radii)
+            taken = np.zeros(len(self.food_ids), dtype=bool)
+            for i in order:
+                cells = [j for j in hits[i] if not taken[j]]
+                if cells:
+                    taken[cells] = True
+                    credits[int(ids[i])] = len(cells)
+            if taken.any():
+                removed = self.food_ids[taken]
+                self.food_ids = self.food_ids[~taken]
+                self.food_xy = self.food_xy[~taken]
+                self.food_colours = self.food_colours[~taken]
+
+        # Eat events are reported by the chunk that owns the victim. An eater
+        # reaching the victim's centre always overlaps that chunk, so it is
+        # present here either as an owned player or as a ghost.
+        eaters, victims = eat_pairs(xy, radii)
+        reported = owned[victims]
+        events = list(
+            zip(ids[eaters[reported]].tolist(), ids[victims[reported]].tolist())
+        )
+
+        # The first step after a reset fills the whole quota at once
+        missing = self.quota - len(self.food_ids)
+        if not self.filling:
+            missing = min(missing, self.refill_rate)
+        self.filling = False
+        added = self.spawn(missing, xy, radii) if missing > 0 else None
+        return {
+            "credits": credits,
+            "events": events,
+            "removed": removed,
+            "added": added,
+        }
+
+
+def chunk_specs(cfg, grid, seed=0):
+    """
+    Works out the ChunkWorker arguments of every chunk of a grid.
+
+    The food quantity is shared out by area, and each chunk gets its own seed.
+
+    Returns:
+        list: (index, bounds, quota, refill_rate, seed) per chunk.
+    """
+    area = cfg.width * cfg.height
+    specs = []
+    for index in range(len(grid)):
+        x0, y0, x1, y1 = grid.bounds(index)
+        quota = round(cfg.food_quantity * (x1 - x0) * (y1 - y0) / area)
+        specs.append(
+            (index, (x0, y0, x1, y1), quota, max(1, quota // 100), seed + index)
+        )
+    return specs
+
+
+def run_chunk_worker(connection, index, bounds, quota, refill_rate, seed):
+    """
+    Entry point of a chunk worker process.
+
+    Serves "step", "reset" and "stop" requests from the coordinator until told to stop.
+    """
+    worker = ChunkWorker(index, bounds, quota, refill_rate, seed)
+    while True:
+        command, payload = connection.recv()
+        if command == "step":
+            connection.send(worker.step(*payload))
+        elif command == "reset":
+            worker.reset()
+            connection.send(None)
+        elif command == "stop":
+            break
+    connection.close()
+
+
+class ShardedWorld:
+    """
+    The ShardedWorld class coordinates the chunk workers of a chunked world.
+
+    Players stay authoritative in the PlayerManager of the coordinator. Each
+    tick every player is assigned to the chunk containing its centre, and a
+    ghost copy is sent to every neighbouring chunk its circle reaches. A
+    player crossing a chunk border is handed over by changing its owner. All
+    chunks are stepped in parallel and their results are merged here.
+    """
+
+    def __init__(self, cfg, cols, rows, seed=0):
+        """
+        Initialize a new ShardedWorld instance and start one process per chunk.
+
+        Parameters:
+            cfg (Settings): The game settings.
+            cols (int): The number of chunks along the x axis.
+            rows (int): The number of chunks along the y axis.
+            seed (int): Base seed of the chunk random generators.
+        """
+        self.cfg = cfg
+        self.grid = ChunkGrid(cfg.width, cfg.height, cols, rows)
+        self.owners = {}
+        self.handovers = 0
+        self.food: dict[int, FoodCell] = {}
+        self.connections = []
+        self.processes = []
+
+        for spec in chunk_specs(cfg, self.grid, seed):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_chunk_worker, args=(child, *spec), daemon=True
+            )
+            process.start()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def assign(self, players):
+        """
+        Works out which chunks each player has to be simulated in this tick.
+
+        Returns:
+            list: per chunk, the (id, x, y, radius, owned) rows of its players.
+        """
+        rows = [[] for _ in range(len(self.grid))]
+        for player_id, player in players.items():
+            x, y, radius = player.position.x, player.position.y, player.get_radius()
+            owner = self.grid.chunk_of(x, y)
+            if self.owners.get(player_id, owner) != owner:
+                self.handovers += 1
+            self.owners[player_id] = owner
+            for index in self.grid.chunks_overlapping(x, y, radius):
+                rows[index].append((player_id, x, y, radius, index == owner))
+        for player_id in set(self.owners) - set(players):
+            del self.owners[player_id]
+        return rows
+
+    def step(self, p_manager, f_manager):
+        """
+        Runs one tick across all chunks and merges the results back into the managers.
+
+        Parameters:
+            p_manager (PlayerManager): The authoritative players.
+            f_manager (FoodCellManager): Receives the merged food of all chunks.
+        """
+        players = p_manager.players
+        for connection, rows in zip(self.connections, self.assign(players)):
+            connection.send(("step", self.pack(rows)))
+
+        credits = {}
+        events = []
+        for connection in self.connections:
+            result = connection.recv()
+            for player_id, eaten in result["credits"].items():
+                credits[player_id] = credits.get(player_id, 0) + eaten
+            events.extend(result["events"])
+            self.merge_food(result["removed"], result["added"], f_manager.pool)
+
+        for player_id, eaten in credits.items():
+            if player_id in players:
+                p_manager.add_score(player_id, eaten)
+        self.resolve_events(p_manager, events)
+        f_manager.food_cells = list(self.food.values())
+
+    def pack(self, rows):
+        """Converts a chunk's player rows into the arrays sent to its worker."""
+        if not rows:
+            return (
+                np.empty(0, dtype=np.int64),
+                np.empty((0, 2)),
+                np.empty(0),
+                np.empty(0, dtype=bool),
+            )
+        ids, xs, ys, radii, owned = zip(*rows)
+        return (
+            np.array(ids, dtype=np.int64),
+            np.column_stack((xs, ys)).astype(float),
+            np.array(radii, dtype=float),
+            np.array(owned, dtype=bool),
+        )
+
+    def merge_food(self, removed, added, pool):
+        """Applies one chunk's food changes to the merged food cells, recycling eaten ones."""
+        eaten = [self.food.pop(food_id, None) for food_id in removed.tolist()]
+        pool.release([cell for cell in eaten if cell is not None])
+        if added is None:
+            return
+        for food_id, (x, y), colour in zip(
+            added[0].tolist(), added[1].tolist(), added[2].tolist()
+        ):
+            self.food[food_id] = pool.acquire(x, y, tuple(colour))
+
+    def resolve_events(self, p_manager, events):
+        """
+        Resolves the eat events reported by all chunks in one deterministic batch.
+
+        Bigger eaters go first; a player that has been eaten cannot eat anyone
+        and can only be eaten once.
+        """
+        players = p_manager.players
+        events = [
+            (eater_id, victim_id)
+            for eater_id, victim_id in events
+            if eater_id in players and victim_id in players
+        ]
+        accepted = resolve_eats(events, lambda key: players[key].get_radius())
+        for eater_id, victim_id in accepted:
+            p_manager.add_score(eater_id, players[victim_id].score // 2)
+            print(f"[GAME]\t{players[eater_id].name} ATE {players[victim_id].name}")
+        for _, victim_id in accepted:
+            p_manager.remove(victim_id)
+
+    def reset(self):
+        """Clears the food of every chunk, e.g. when a new round starts."""
+        for connection in self.connections:
+            connection.send(("reset", None))
+        for connection in self.connections:
+            connection.recv()
+        self.food.clear()
+        self.owners.clear()
+
+    def stop(self):
+        """
+        Stops every worker process; safe to call more than once.
+
+        Workers that do not stop in time are terminated.
+        """
+        connections, self.connections = self.connections, []
+        for connection in connections:
+            try:
+                connection.send(("stop", None))
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,218 @@
+""" This module contains the compact snapshot encodings for clients on constrained links. """
+import zlib
+
+import _pickle as pickle
+import numpy as np
+
+from common.protocol import PACKED
+from common.shm import cell_colour, cell_xy, flatten
+from common.utilities import Position
+
+# The encodings a connection can ask for with "encoding <name> [kbit/s]"
+RAW = "raw"
+CODECS = (RAW, "packed", "zlib", "lz4")
+AUTO = "auto"
+# Links at least this fast get uncompressed arrays; slower ones get cheap then strong compression
+FAST_LINK_KBPS = 100_000
+MEDIUM_LINK_KBPS = 10_000
+# Positions are sent as fractions of the world size in this many steps
+QUANTIZATION_STEPS = 65535
+
+
+def choose_codec(name, link_kbps=None):
+    """
+    Resolves the encoding asked for by a connection.
+
+    "auto" picks by the link speed the client reports: fast links skip
+    compression, medium ones get lz4 and slow ones the stronger zlib.
+
+    Parameters:
+        name (str): One of CODECS or "auto".
+        link_kbps (float): The link speed reported with "auto", in kbit/s.
+
+    Raises:
+        ValueError: If the encoding is unknown.
+    """
+    if name == AUTO:
+        if link_kbps is None or link_kbps >= FAST_LINK_KBPS:
+            return "packed"
+        if link_kbps >= MEDIUM_LINK_KBPS:
+            return "lz4"
+        return "zlib"
+    if name not in CODECS:
+        raise ValueError(f"Unknown encoding {name!r}")
+    return name
+
+
+def compress(codec, body):
+    """Compresses the packed arrays; lz4 falls back to fast zlib when it is not installed."""
+    if codec == "zlib":
+        return "zlib", zlib.compress(body, 6)
+    if codec == "lz4":
+        try:
+            import lz4.frame
+        except ImportError:
+            return "zlib", zlib.compress(body, 1)
+        return "lz4", lz4.frame.compress(body)
+    return None, body
+
+
+def decompress(compression, body):
+    """Reverses compress."""
+    if compression == "zlib":
+        return zlib.decompress(body)
+    if compression == "lz4":
+        import lz4.frame
+
+        return lz4.frame.decompress(body)
+    return body
+
+
+def quantize(values, size):
+    """Maps coordinates in [0, size] to 16 bit fixed point."""
+    scaled = np.rint(np.asarray(values, np.float64) * (QUANTIZATION_STEPS / size))
+    return np.clip(scaled, 0, QUANTIZATION_STEPS).astype("<u2")
+
+
+def dequantize(values, size):
+    """Maps 16 bit fixed point back to coordinates in [0, size]."""
+    return values.astype(np.float64) * (size / QUANTIZATION_STEPS)
+
+
+def palette_index(colours):
+    """Maps (R, G, B) rows to a 3-3-2 palette index, 3 bits of red and green and 2 of blue."""
+    colours = np.asarray(colours, np.uint8).reshape(-1, 3)
+    red, green, blue = colours[:, 0] >> 5, colours[:, 1] >> 5, colours[:, 2] >> 6
+    return (red << 5 | green << 2 | blue).astype(np.uint8)
+
+
+def palette_colours(indices):
+    """Maps 3-3-2 palette indices back to (R, G, B) tuples, spread over the full range."""
+    red = (indices >> 5 & 7).astype(np.uint16) * 255 // 7
+    green = (indices >> 2 & 7).astype(np.uint16) * 255 // 7
+    blue = (indices & 3).astype(np.uint16) * 255 // 3
+    return list(zip(red.tolist(), green.tolist(), blue.tolist()))
+
+
+class SnapshotEncoder:
+    """
+    The SnapshotEncoder class packs world snapshots for clients on constrained links.
+
+    Positions are quantized to 16 bit fixed point relative to the world size,
+    colours are mapped to a 256 entry palette and the arrays are optionally
+    compressed. The result is still a single pickled reply, so it travels
+    over the same connection as a plain snapshot.
+    """
+
+    def __init__(self, width, height, food_radius, player_radius):
+        """
+        Initialize a new SnapshotEncoder instance.
+
+        Parameters:
+            width (int): The width of the world.
+            height (int): The height of the world.
+            food_radius (int): The radius every food cell is drawn with.
+            player_radius (int): The radius a player has with no score.
+        """
+        self.width = width
+        self.height = height
+        self.food_radius = food_radius
+        self.player_radius = player_radius
+
+    def encode(self, snapshot, codec):
+        """
+        Encodes a snapshot as a pickled ("packed", header, body) tuple.
+
+        Parameters:
+            snapshot (WorldSnapshot): The snapshot to encode.
+            codec (str): One of CODECS other than "raw".
+
+        Returns:
+            bytes: The payload to send.
+        """
+        food_cells = snapshot.food_cells
+        food_count = len(food_cells)
+        food_xy = flatten(food_cells, cell_xy, np.float64, 2 * food_count)
+        food_colour = flatten(food_cells, cell_colour, np.uint8, 3 * food_count)
+
+        players = list(snapshot.players.values())
+        player_xy = np.array(
+            [(player.position.x, player.position.y) for player in players], np.float64
+        ).reshape(-1, 2)
+        arrays = (
+            quantize(food_xy[0::2], self.width),
+            quantize(food_xy[1::2], self.height),
+            palette_index(food_colour),
+            np.array([player.id for player in players], "<i4"),
+            quantize(player_xy[:, 0], self.width),
+            quantize(player_xy[:, 1], self.height),
+            np.array([player.score for player in players], "<i4"),
+            palette_index([player.colour for player in players]),
+        )
+        compression, body = compress(codec, b"".join(a.tobytes() for a in arrays))
+        header = {
+            "size": (self.width, self.height),
+            "radius": (self.food_radius, self.player_radius),
+            "counts": (food_count, len(players)),
+            "compression": compression,
+            "names": [player.name for player in players],
+            "meta": snapshot.meta,
+        }
+        return pickle.dumps((PACKED, header, body))
+
+
+def decode_snapshot(reply):
+    """
+    Decodes a ("packed", header, body) reply into (food_cells, players, meta).
+
+    The food cells and players are rebuilt as FoodCell and Player objects, so
+    code written against plain snapshots works unchanged.
+    """
+    from common.food import FoodCell
+    from common.player import Player
+
+    _, header, body = reply
+    width, height = header["size"]
+    food_radius, player_radius = header["radius"]
+    food_count, player_count = header["counts"]
+    body = decompress(header["compression"], body)
+
+    offset = 0
+
+    def take(dtype, count):
+        nonlocal offset
+        array = np.frombuffer(body, dtype, count, offset)
+        offset += array.nbytes
+        return array
+
+    food_x = np.rint(dequantize(take("<u2", food_count), width)).astype(int)
+    food_y = np.rint(dequantize(take("<u2", food_count), height)).astype(int)
+    food_colour = palette_colours(take(np.uint8, food_count))
+    player_id = take("<i4", player_count).tolist()
+    player_x = dequantize(take("<u2", player_count), width).tolist()
+    player_y = dequantize(take("<u2", player_count), height).tolist()
+    player_score = take("<i4", player_count).tolist()
+    player_colour = palette_colours(take(np.uint8, player_count))
+
+    food_cells = []
+    for x, y, colour in zip(food_x.tolist(), food_y.tolist(), food_colour):
+        cell = FoodCell.__new__(FoodCell)
+        cell.x, cell.y, cell.colour, cell.radius = x, y, colour, food_radius
+        food_cells.append(cell)
+
+    players = {}
+    for player_id, name, x, y, score, colour in zip(
+        player_id, header["names"], player_x, player_y, player_score, player_colour
+    ):
+        player = Player.__new__(Player)
+        player.id = player_id
+        player.name = name
+        player.position = Position(x, y)
+        player.score = score
+        player.colour = colour
+        player.radius = player_radius
+        player.vel = None
+        player.eaten = False
+        player.intent = None
+        players[player_id] = player
+    return food_cells, players, header["meta"]
@@ -0,0 +1,134 @@
+""" This module contains the pygame rendering of the world; it is only imported by code that draws. """
+import contextlib
+import functools
+
+with contextlib.redirect_stdout(None):
+    import pygame
+
+# Grid lines drawn behind the world
+TRANSPARENCY = 50
+GRIDLINE_THICKNESS = 2
+GRIDLINE_SPACING = 40
+
+
+@functools.lru_cache(maxsize=None)
+def sys_font(name, size):
+    """Fetches a system font, initialising pygame fonts on first use."""
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.SysFont(name, size)
+
+
+def name_font():
+    """Fetches the font player names are drawn with."""
+    return sys_font("arial", 20)
+
+
+def time_font():
+    """Fetches the font of the score, the round clock and the scoreboard title."""
+    return sys_font(None, 24)
+
+
+def score_font():
+    """Fetches the font of the scoreboard entries."""
+    return sys_font(None, 22)
+
+
+def draw_food(screen, food):
+    """Draws a food cell on the game screen as a circle."""
+    pygame.draw.circle(screen, food.colour, (food.x, food.y), food.radius)
+
+
+def draw_food_cells(screen, food_cells):
+    """Draws every food cell on the game screen."""
+    circle = pygame.draw.circle
+    for food in food_cells:
+        circle(screen, food.colour, (food.x, food.y), food.radius)
+
+
+def draw_player(screen, player):
+    """Draws a player on the game screen as a circle."""
+    pygame.draw.circle(
+        screen,
+        player.colour,
+        (player.position.x, player.position.y),
+        player.get_radius(),
+    )
+
+
+def draw_players(screen, players):
+    """
+    Draws each player on the game screen with a circle representing the player and their name.
+
+    Parameters:
+        screen (pygame.Surface): The game screen.
+        players (iterable): The players to draw.
+    """
+    font = name_font()
+    for player in players:
+        draw_player(screen, player)
+        player_name = font.render(player.name, 1, (0, 0, 0))
+        screen.blit(
+            player_name,
+            (
+                player.position.x - player_name.get_width() / 2,
+                player.position.y - player_name.get_height() / 2,
+            ),
+        )
+
+
+def pressed_direction():
+    """
+    Fetches the direction the arrow or WASD keys point in.
+
+    Returns:
+        tuple: The (dx, dy) direction, each component being -1, 0 or 1.
+    """
+    keys = pygame.key.get_pressed()
+    dx = (keys[pygame.K_RIGHT] or keys[pygame.K_d]) - (
+        keys[pygame.K_LEFT] or keys[pygame.K_a]
+    )
+    dy = (keys[pygame.K_DOWN] or keys[pygame.K_s]) - (
+        keys[pygame.K_UP] or keys[pygame.K_w]
+    )
+    return (dx, dy)
+
+
+def draw_score(screen, score):
+    """Draws the score of the player below the frame rate."""
+    text = time_font().render("Score: " + str(round(score)), 1, (0, 0, 0))
+    screen.blit(text, (10, 15 + text.get_height()))
+
+
+def draw_scores(screen, cfg, leaderboard):
+    """
+    Draws the top of the leaderboard kept by the server.
+
+    Parameters:
+        screen (pygame.Surface): The game screen.
+        cfg (Settings): The game settings.
+        leaderboard (list): (player_id, name, score) tuples, best first.
+    """
+    title_text = time_font().render("Scoreboard", 1, (0, 0, 0))
+    title_x = cfg.width - title_text.get_width() - 10
+    screen.blit(title_text, (title_x, 5))
+
+    # Render and display the player scores (up to 3)
+    font = score_font()
+    start_y = 25
+    for count, (_, player_name, _) in enumerate(leaderboard[:3]):
+        score_text = font.render(f"{count + 1}. {player_name}", 1, (0, 0, 0))
+        screen.blit(score_text, (title_x, start_y + count * 25))
+
+
+def draw_grid(screen, cfg):
+    """Draws the translucent grid lines behind the world."""
+    horizontal_line = pygame.Surface((cfg.width, GRIDLINE_THICKNESS), pygame.SRCALPHA)
+    horizontal_line.fill((184, 184, 184, TRANSPARENCY))
+    for i in range(0, cfg.height, GRIDLINE_SPACING):
+        screen.blit(horizontal_line, (0, i - 1))
+
+    vertical_line = pygame.Surface((GRIDLINE_THICKNESS, cfg.height), pygame.SRCALPHA)
+    vertical_line.fill((184, 184, 184, TRANSPARENCY))
+    for i in range(0, cfg.width, GRIDLINE_SPACING):
+        screen.blit(vertical_line, (i - 1, 0))
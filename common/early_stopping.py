@@ -0,0 +1,122 @@
+""" This module contains the early stopping of genome runs that cannot do well during training. """
+import numpy as np
+
+# Reasons a run is cut, as returned by EarlyStopping.judge
+MAX_STEPS = "max_steps"
+STALLED = "stalled"
+HOPELESS = "hopeless"
+
+
+class EarlyStopping:
+    """
+    The EarlyStopping class decides when a genome's run is over before its bot is eaten.
+
+    All limits count steps of the trainer, one per snapshot it receives, not
+    ticks of the server: the server may run several ticks between two steps,
+    and runs are only comparable at the same step. A run is cut when:
+
+    - it has lasted max_steps,
+    - its bot has not moved for stall_steps,
+    - at one of the checkpoints every check_interval steps, after the
+      grace_steps, its fitness is below the cut_quantile of the fitness other
+      runs of the same generation had at that age.
+
+    The distribution is built up over the generation, so it only cuts once
+    min_samples runs have reached a checkpoint. Runs reaching a checkpoint on
+    the same step are added before any of them is judged, so the order they
+    are checked in does not matter.
+    """
+
+    def __init__(
+        self,
+        max_steps=0,
+        stall_steps=0,
+        grace_steps=0,
+        check_interval=0,
+        cut_quantile=0.0,
+        min_samples=10,
+    ):
+        """
+        Initialize a new EarlyStopping instance.
+
+        Parameters:
+            max_steps (int): The longest a run may last; 0 for no limit.
+            stall_steps (int): How long a bot may stand still; 0 for no limit.
+            grace_steps (int): How long a run plays before it can be judged hopeless.
+            check_interval (int): Ticks between fitness checkpoints; 0 disables them.
+            cut_quantile (float): The share of runs cut at each checkpoint.
+            min_samples (int): The runs needed at a checkpoint before any is cut there.
+        """
+        self.max_steps = max_steps
+        self.stall_steps = stall_steps
+        self.grace_steps = grace_steps
+        self.check_interval = check_interval
+        self.cut_quantile = cut_quantile
+        self.min_samples = min_samples
+        self.samples = {}
+        self.cuts = {MAX_STEPS: 0, STALLED: 0, HOPELESS: 0}
+
+    @classmethod
+    def from_settings(cls, training):
+        """Builds the policy configured in the training settings."""
+        return cls(
+            training.max_steps,
+            training.stall_steps,
+            training.grace_steps,
+            training.check_interval,
+            training.cut_quantile,
+            training.min_samples,
+        )
+
+    def start_generation(self):
+        """Forgets the fitness distribution of the previous generation."""
+        self.samples = {}
+        self.cuts = dict.fromkeys(self.cuts, 0)
+
+    def checkpoint(self, age):
+        """Checks whether runs of this age are compared against the others."""
+        return (
+            self.check_interval > 0
+            and self.cut_quantile > 0
+            and age >= self.grace_steps
+            and age % self.check_interval == 0
+        )
+
+    def judge(self, ages, fitnesses, idle_steps):
+        """
+        Judges every run still playing after a step.
+
+        Parameters:
+            ages (list): The steps each run has lasted.
+            fitnesses (list): The fitness of each run so far.
+            idle_steps (list): The steps since each run's bot last moved.
+
+        Returns:
+            list: The reason each run is cut, None for runs that go on.
+        """
+        ages = np.asarray(ages, dtype=np.int64)
+        fitnesses = np.asarray(fitnesses, dtype=float)
+        idle_steps = np.asarray(idle_steps, dtype=np.int64)
+        reasons = np.full(len(ages), None, dtype=object)
+
+        for age in np.unique(ages).tolist():
+            if not self.checkpoint(age):
+                continue
+            at_age = ages == age
+            samples = self.samples.setdefault(age, [])
+            samples.extend(fitnesses[at_age].tolist())
+            if len(samples) >= self.min_samples:
+                bound = np.quantile(samples, self.cut_quantile)
+                reasons[at_age & (fitnesses < bound)] = HOPELESS
+        if self.stall_steps:
+            reasons[idle_steps >= self.stall_steps] = STALLED
+        if self.max_steps:
+            reasons[ages >= self.max_steps] = MAX_STEPS
+
+        for reason in reasons[reasons != None].tolist():  # noqa: E711
+            self.cuts[reason] += 1
+        return reasons.tolist()
+
+    def summary(self):
+        """Fetches how many runs were cut for each reason this generation."""
+        return dict(self.cuts)
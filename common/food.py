@@ -1,35 +1,120 @@
-import math
+from __future__ import annotations
 
-import pygame
-from omegaconf import DictConfig
+import weakref
+from collections import deque
+from typing import TYPE_CHECKING
 
-from common.utilities import Position, random_position, random_rgb
+import numpy as np
+
+from common.spawning import random_colours, sample_free_positions, spawn_count
+from common.utilities import Position, random_rgb
+
+if TYPE_CHECKING:
+    from common.settings import FoodSettings, Settings
 
 
 class FoodCell:
     """
     The Food class represents a single piece of food in the game.
     Each food has a position, as well as a colour.
+
+    Food cells are the most numerous objects in the world, so they use
+    __slots__ and keep no reference to the config.
     """
 
-    def __init__(self, cfg: DictConfig, position: Position):
+    __slots__ = ("x", "y", "colour", "radius")
+
+    def __init__(self, cfg: FoodSettings, position: Position, colour=None):
         """
         Initialize a new Food instance.
 
         Parameters:
             position (Position): The position of the food.
             colour (Tuple[int, int, int]): The colour of the food as an (R, G, B) tuple.
+                A random colour is picked if none is given.
         """
         self.radius = cfg.food_radius
-        self.position = position
-        self.xy = (self.position.x, self.position.y)
-        self.colour = random_rgb()
+        self.x = position.x
+        self.y = position.y
+        self.colour = random_rgb() if colour is None else colour
+
+    @property
+    def position(self):
+        """Fetches the position of the food."""
+        return Position(self.x, self.y)
+
+    @property
+    def xy(self):
+        """Fetches the position of the food as an (x, y) tuple."""
+        return (self.x, self.y)
 
     def draw(self, screen):
         """Draws the food on the game screen as a circle."""
-        pygame.draw.circle(
-            screen, self.colour, (self.position.x, self.position.y), self.radius
-        )
+        from common.draw import draw_food
+
+        draw_food(screen, self)
+
+
+class FoodCellPool:
+    """
+    The FoodCellPool class recycles eaten food cells instead of reallocating them.
+
+    Published snapshots keep referencing the cells that were alive when they
+    were taken, so a released cell sits in quarantine until every snapshot
+    that could hold it is gone. The pool tracks the published snapshots
+    weakly; however long a reader keeps one, the cells in it are not reused.
+    """
+
+    def __init__(self, food_cfg: FoodSettings):
+        """
+        Initialize a new FoodCellPool instance.
+
+        Parameters:
+            food_cfg (FoodSettings): The food settings new cells are created from.
+        """
+        self.food_cfg = food_cfg
+        self.free = []
+        self.released = []
+        # (version, cells) batches; no snapshot from version on holds the cells
+        self.quarantine = deque()
+        self.snapshots = weakref.WeakSet()
+        self.reused = 0
+        self.allocated = 0
+
+    def acquire(self, x, y, colour):
+        """Fetches a food cell at (x, y), reusing a free one when there is one."""
+        if self.free:
+            cell = self.free.pop()
+            cell.x = x
+            cell.y = y
+            cell.colour = colour
+            self.reused += 1
+            return cell
+        self.allocated += 1
+        return FoodCell(self.food_cfg, Position(x, y), colour)
+
+    def release(self, cells):
+        """Hands eaten food cells back to the pool; they are quarantined first."""
+        self.released.extend(cells)
+
+    def advance(self, snapshot):
+        """
+        Ends a tick: the cells released this tick enter quarantine and the
+        batches no live snapshot can refer to any more become free.
+
+        Parameters:
+            snapshot (WorldSnapshot): The snapshot just published, taken after the cells were removed.
+        """
+        self.snapshots.add(snapshot)
+        if self.released:
+            self.quarantine.append((snapshot.version, self.released))
+            self.released = []
+        oldest = min(live.version for live in list(self.snapshots))
+        while self.quarantine and self.quarantine[0][0] <= oldest:
+            self.free.extend(self.quarantine.popleft()[1])
+
+    def __len__(self):
+        return len(self.free)
 
 
 class FoodCellManager:
@@ -39,7 +124,7 @@ class FoodCellManager:
     fetching all food items and drawing them.
     """
 
-    def __init__(self, cfg: DictConfig, player_manager):
+    def __init__(self, cfg: Settings, player_manager):
         """
         Initializes a new FoodManager instance.
         """
@@ -47,6 +132,8 @@ class FoodCellManager:
         self.food_cfg = cfg.food
         self.food_cells = []
         self.player_manager = player_manager
+        self.rng = np.random.default_rng()
+        self.pool = FoodCellPool(self.food_cfg)
 
     def add(self, position):
         """
@@ -56,7 +143,7 @@ class FoodCellManager:
         :param y: The y-coordinate of the new food
         :param colour: The colour of the new food
         """
-        self.food_cells.append(FoodCell(self.food_cfg, position))
+        self.food_cells.append(self.pool.acquire(position.x, position.y, random_rgb()))
 
     def remove(self, index):
         """
@@ -65,29 +152,72 @@ class FoodCellManager:
 
         :param index: The index in the list from which to remove the food
         """
-        del self.food_cells[index]
+        self.pool.release((self.food_cells.pop(index),))
+
+    def reset(self):
+        """
+        Removes every food cell, handing them all back to the pool so the
+        next round reuses them instead of allocating new cells.
+        """
+        self.pool.release(self.food_cells)
+        self.food_cells = []
+
+    def remove_many(self, cells):
+        """
+        Removes a batch of food cells in a single pass over the list
+        and hands them back to the pool.
+
+        :param cells: The food cells to remove
+        """
+        if not cells:
+            return
+        eaten = {id(cell) for cell in cells}
+        self.food_cells = [cell for cell in self.food_cells if id(cell) not in eaten]
+        self.pool.release(cells)
+
+    def add_many(self, positions, colours):
+        """
+        Adds a batch of food cells to the FoodManager's list in one operation.
+
+        :param positions: An (n, 2) array of food positions
+        :param colours: An (n, 3) array of food colours
+        """
+        acquire = self.pool.acquire
+        self.food_cells.extend(
+            acquire(x, y, tuple(colour))
+            for (x, y), colour in zip(positions.tolist(), colours.tolist())
+        )
 
     def create_food(self, n):
-        """Creates food cells on the map
+        """Creates food cells on the map away from every player
+
+        Positions are sampled in bulk and rejected with a single spatial
+        query against all players, so fewer than n cells may be created when
+        players cover most of the map.
 
         :param n: The number of food cells to create
+        :return: The number of food cells created
         """
-        for _ in range(n):
-            while True:
-                stop = True
-                position = random_position(self.cfg.w, self.cfg.h)
-                for player in self.player_manager.players.items():
-                    p = self.player_manager.players[player]
-                    dis = math.sqrt(
-                        (position.x - p.position.x) ** 2
-                        + (position.y - p.position.y) ** 2
-                    )
-                    if dis <= self.cfg.player.player_radius + p.radius:
-                        stop = False
-                if stop:
-                    break
-
-            self.food_cells.append((position.x, position.y, random_rgb()))
+        player_xy, player_radii = self.player_manager.get_positions_and_radii()
+        positions = sample_free_positions(
+            n,
+            (0, 0, self.cfg.width, self.cfg.height),
+            player_xy,
+            player_radii,
+            self.rng,
+            margin=self.food_cfg.food_radius,
+        )
+        self.add_many(positions, random_colours(len(positions), self.rng))
+        return len(positions)
+
+    def refill(self):
+        """Tops the food up towards food_quantity following the configured spawn curve
+
+        :return: The number of food cells created
+        """
+        deficit = self.cfg.food_quantity - len(self.food_cells)
+        n = spawn_count(self.food_cfg.spawn_curve, self.food_cfg.spawn_rate, deficit)
+        return self.create_food(n) if n > 0 else 0
 
     def get_all(self):
         """
@@ -101,5 +231,6 @@ class FoodCellManager:
         """4
         Draws each piece of Food on the game screen.
         """
-        for food in self.food_cells:
-            food.draw(screen)
+        from common.draw import draw_food_cells
+
+        draw_food_cells(screen, self.food_cells)
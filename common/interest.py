@@ -0,0 +1,162 @@
+""" This module contains the per client level of detail scheduling of snapshot updates. """
+import math
+
+import _pickle as pickle
+
+from common.protocol import INTEREST
+
+# (distance, interval) pairs: players closer than distance are sent every interval ticks
+DEFAULT_TIERS = ((250, 1), (600, 3), (math.inf, 10))
+# Rough pickled sizes, used to keep each update within the byte budget
+PLAYER_BYTES = 96
+FOOD_BYTES = 20
+REMOVAL_BYTES = 8
+
+
+class InterestView:
+    """
+    The InterestView class decides what a single client is sent each tick.
+
+    Instead of the whole world, the client gets an update with what changed
+    since the previous one. Players near the observer are refreshed every
+    tick and distant ones every few ticks. Food only changes when it is eaten
+    or spawned, so it is only sent then. Updates are filled nearest first up
+    to a byte budget; whatever does not fit stays due and goes out on a later
+    tick. Removals are always sent so the client never shows what is gone.
+    """
+
+    def __init__(self, player_id, budget, tiers=DEFAULT_TIERS, centre=(0, 0)):
+        """
+        Initialize a new InterestView instance.
+
+        Parameters:
+            player_id (int): The player the client observes the world as.
+            budget (int): The rough number of bytes one update may take.
+            tiers (tuple): (distance, interval) pairs, ordered by distance.
+            centre (tuple): Where to observe from while the player is not in the world.
+        """
+        self.player_id = player_id
+        self.budget = budget
+        self.tiers = tiers
+        self.centre = centre
+        self.sent_players = {}
+        self.known_food = set()
+        self.deferred = 0
+
+    def interval(self, distance):
+        """Fetches how many ticks may pass between updates of a player at this distance."""
+        for limit, interval in self.tiers:
+            if distance < limit:
+                return interval
+        return self.tiers[-1][1]
+
+    def update(self, snapshot):
+        """
+        Builds the update that brings the client up to date with a snapshot.
+
+        Parameters:
+            snapshot (WorldSnapshot): The snapshot to send.
+
+        Returns:
+            bytes: The pickled ("interest", tick, players, removed_players,
+            food, removed_food, meta) update.
+        """
+        tick = snapshot.version
+        players = snapshot.players
+        observer = players.get(self.player_id)
+        if observer is None:
+            ox, oy = self.centre
+        else:
+            ox, oy = observer.position.x, observer.position.y
+
+        removed_players = [i for i in self.sent_players if i not in players]
+        for player_id in removed_players:
+            del self.sent_players[player_id]
+        food_keys = snapshot.food_keys()
+        removed_food = [key for key in self.known_food if key not in food_keys]
+        self.known_food.difference_update(removed_food)
+        spent = REMOVAL_BYTES * (len(removed_players) + len(removed_food))
+
+        candidates = []
+        for player_id, player in players.items():
+            distance = math.hypot(player.position.x - ox, player.position.y - oy)
+            if player_id == self.player_id:
+                distance = -1.0
+            last = self.sent_players.get(player_id)
+            if last is None or tick - last >= self.interval(distance):
+                candidates.append((distance, True, player_id))
+        for key in food_keys - self.known_food:
+            distance = math.hypot(key[0] - ox, key[1] - oy)
+            candidates.append((distance, False, key))
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        sent_players = {}
+        food = []
+        for rank, (_, is_player, key) in enumerate(candidates):
+            cost = PLAYER_BYTES if is_player else FOOD_BYTES
+            # The nearest candidate always goes out, so the client never stalls
+            if spent + cost > self.budget and rank:
+                self.deferred += len(candidates) - rank
+                break
+            spent += cost
+            if is_player:
+                sent_players[key] = players[key]
+                self.sent_players[key] = tick
+            else:
+                food.append(key)
+                self.known_food.add(key)
+
+        return pickle.dumps(
+            (
+                INTEREST,
+                tick,
+                sent_players,
+                removed_players,
+                food,
+                removed_food,
+                snapshot.meta,
+            )
+        )
+
+
+class InterestMerger:
+    """
+    The InterestMerger class rebuilds the world on the client from interest updates.
+    """
+
+    def __init__(self, food_radius):
+        """
+        Initialize a new InterestMerger instance.
+
+        Parameters:
+            food_radius (int): The radius food cells are drawn with.
+        """
+        self.food_radius = food_radius
+        self.food_cells = {}
+        self.players = {}
+        self.tick = 0
+
+    def apply(self, update):
+        """
+        Merges an update into the world.
+
+        Parameters:
+            update (tuple): An update built by InterestView.update.
+
+        Returns:
+            tuple: (food_cells, players, meta) like a full snapshot reply.
+        """
+        from common.food import FoodCell
+
+        _, self.tick, players, removed_players, food, removed_food, meta = update
+        for player_id in removed_players:
+            self.players.pop(player_id, None)
+        self.players.update(players)
+        for key in removed_food:
+            self.food_cells.pop(key, None)
+        for key in food:
+            cell = FoodCell.__new__(FoodCell)
+            cell.x, cell.y, cell.colour = key
+            cell.radius = self.food_radius
+            self.food_cells[key] = cell
+        return list(self.food_cells.values()), dict(self.players), meta
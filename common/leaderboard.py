@@ -0,0 +1,114 @@
+""" This module contains the leaderboard the server keeps up to date as scores change. """
+import heapq
+
+
+class Leaderboard:
+    """
+    The Leaderboard class keeps the top k players ordered by score, incrementally.
+
+    It is told about every score change and removal instead of sorting every
+    player each frame. A raised score only re-sorts the k entries at the top.
+    A full scan over the tracked scores only happens when a player drops out
+    of the top k and someone outside it has to take their place.
+    """
+
+    def __init__(self, k=10):
+        """
+        Initialize a new Leaderboard instance.
+
+        Parameters:
+            k (int): The number of players ranked.
+        """
+        self.k = k
+        self.scores = {}
+        self.names = {}
+        self.top = []
+        self.stale = False
+        self.version = 0
+        self._entries = ()
+        self._entries_version = -1
+
+    def rank_key(self, player_id):
+        """Orders players by descending score; ties go to the longest standing id."""
+        return (-self.scores[player_id], player_id)
+
+    def update(self, player_id, name, score):
+        """
+        Records the current score of a player, adding the player if it is new.
+
+        Parameters:
+            player_id (int): The id of the player.
+            name (str): The name of the player.
+            score (int): The current score of the player.
+        """
+        previous = self.scores.get(player_id)
+        if previous == score and self.names.get(player_id) == name:
+            return
+        self.scores[player_id] = score
+        self.names[player_id] = name
+        if self.stale:
+            self.version += 1
+            return
+
+        if player_id in self.top:
+            dropped = previous is not None and score < previous
+            if dropped and len(self.scores) > len(self.top):
+                # Someone outside the top k may now rank higher, rebuild lazily
+                self.stale = True
+            else:
+                self.top.sort(key=self.rank_key)
+        elif len(self.top) < self.k:
+            self.top.append(player_id)
+            self.top.sort(key=self.rank_key)
+        elif self.rank_key(player_id) < self.rank_key(self.top[-1]):
+            self.top[-1] = player_id
+            self.top.sort(key=self.rank_key)
+        else:
+            # The ranking shown to clients is unchanged
+            return
+        self.version += 1
+
+    def remove(self, player_id):
+        """Stops tracking a player, e.g. once it has been eaten or has left."""
+        if self.scores.pop(player_id, None) is None:
+            return
+        del self.names[player_id]
+        if player_id in self.top:
+            self.top.remove(player_id)
+            if len(self.scores) > len(self.top):
+                self.stale = True
+            self.version += 1
+
+    def clear(self):
+        """Forgets every player, e.g. when a new round starts."""
+        self.scores.clear()
+        self.names.clear()
+        self.top = []
+        self.stale = False
+        self.version += 1
+
+    def rebuild(self):
+        """Recomputes the top k from every tracked score."""
+        self.top = heapq.nsmallest(self.k, self.scores, key=self.rank_key)
+        self.stale = False
+
+    def entries(self):
+        """
+        Fetches the ranking as (player_id, name, score) tuples, best first.
+
+        The tuple is only rebuilt when a score or player changed since the last call.
+        """
+        if self._entries_version != self.version:
+            if self.stale:
+                self.rebuild()
+            self._entries = tuple(
+                (player_id, self.names[player_id], self.scores[player_id])
+                for player_id in self.top
+            )
+            self._entries_version = self.version
+        return self._entries
+
+    def top_score(self):
+        """Fetches the best score, or 0 when nobody is playing."""
+        entries = self.entries()
+        return entries[0][2] if entries else 0
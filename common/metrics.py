@@ -0,0 +1,181 @@
+""" This module contains lightweight counters for measuring the server at runtime. """
+import threading
+import time
+from collections import deque
+
+
+class TickMetrics:
+    """
+    The TickMetrics class records how long each simulation tick takes.
+    It keeps a rolling window of recent tick durations for rate and latency summaries.
+    """
+
+    def __init__(self, window=1000):
+        """
+        Initialize a new TickMetrics instance.
+
+        Parameters:
+            window (int): The number of most recent ticks kept for the summary.
+        """
+        self.ticks = 0
+        self.started = time.perf_counter()
+        self.durations = deque(maxlen=window)
+        self.timestamps = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, duration):
+        """
+        Records a completed tick.
+
+        Parameters:
+            duration (float): The time spent simulating the tick in seconds.
+        """
+        with self.lock:
+            self.ticks += 1
+            self.durations.append(duration)
+            self.timestamps.append(time.perf_counter())
+
+    def ticks_per_second(self):
+        """Fetches the tick rate over the rolling window."""
+        with self.lock:
+            if len(self.timestamps) < 2:
+                return 0.0
+            elapsed = self.timestamps[-1] - self.timestamps[0]
+            return (len(self.timestamps) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        """
+        Fetches a snapshot of the tick counters.
+
+        Returns:
+            dict: total ticks, uptime, tick rate and tick duration statistics in ms.
+        """
+        rate = self.ticks_per_second()
+        with self.lock:
+            durations = sorted(self.durations)
+            ticks = self.ticks
+        summary = {
+            "ticks": ticks,
+            "uptime": time.perf_counter() - self.started,
+            "ticks_per_sec": rate,
+            "tick_ms_mean": 0.0,
+            "tick_ms_p99": 0.0,
+            "tick_ms_max": 0.0,
+        }
+        if durations:
+            summary["tick_ms_mean"] = sum(durations) / len(durations) * 1000
+            summary["tick_ms_p99"] = percentile(durations, 99) * 1000
+            summary["tick_ms_max"] = durations[-1] * 1000
+        return summary
+
+
+def percentile(sorted_values, pct):
+    """
+    Returns the nearest-rank percentile of an already sorted sequence.
+
+    Parameters:
+        sorted_values (list): The values in ascending order.
+        pct (float): The percentile to fetch, between 0 and 100.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class ConnectionStats:
+    """
+    The ConnectionStats class holds the traffic counters of a single client connection.
+    Each connection is written to by its own thread only, so no locking is needed.
+    """
+
+    # Smoothing factor for the round trip estimate, as used by TCP's SRTT
+    RTT_ALPHA = 0.125
+
+    def __init__(self, name):
+        """
+        Initialize a new ConnectionStats instance.
+
+        Parameters:
+            name (str): The name the client connected with.
+        """
+        self.name = name
+        self.connected_at = time.time()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.malformed = 0
+        self.snapshots = 0
+        self.snapshot_bytes_total = 0
+        self.snapshot_bytes_last = 0
+        self.snapshot_bytes_max = 0
+        self.rtt_ms = None
+        self.pacer = None
+
+    def record_in(self, size, messages=1):
+        """
+        Records data received from the client.
+
+        Parameters:
+            size (int): The number of bytes received.
+            messages (int): The number of complete messages the data finished.
+        """
+        self.bytes_in += size
+        self.messages_in += messages
+
+    def record_out(self, size, snapshot=False):
+        """
+        Records a message sent to the client.
+
+        Parameters:
+            size (int): The number of bytes sent.
+            snapshot (bool): Whether the message was a world snapshot.
+        """
+        self.bytes_out += size
+        self.messages_out += 1
+        if snapshot:
+            self.snapshots += 1
+            self.snapshot_bytes_total += size
+            self.snapshot_bytes_last = size
+            self.snapshot_bytes_max = max(self.snapshot_bytes_max, size)
+
+    def record_rtt(self, rtt_ms):
+        """
+        Folds a round trip time sample reported by the client into the estimate.
+
+        Parameters:
+            rtt_ms (float): The measured round trip time in milliseconds.
+        """
+        if self.rtt_ms is None:
+            self.rtt_ms = rtt_ms
+        else:
+            self.rtt_ms += self.RTT_ALPHA * (rtt_ms - self.rtt_ms)
+
+    def summary(self):
+        """
+        Fetches a snapshot of the connection counters.
+
+        Returns:
+            dict: byte and message counts, rates, snapshot sizes and the rtt estimate.
+        """
+        elapsed = max(time.time() - self.connected_at, 1e-9)
+        return {
+            "name": self.name,
+            "connected_for": elapsed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_in_per_sec": self.bytes_in / elapsed,
+            "bytes_out_per_sec": self.bytes_out / elapsed,
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "malformed": self.malformed,
+            "snapshots": self.snapshots,
+            "snapshot_bytes_last": self.snapshot_bytes_last,
+            "snapshot_bytes_max": self.snapshot_bytes_max,
+            "snapshot_bytes_mean": (
+                self.snapshot_bytes_total / self.snapshots if self.snapshots else 0
+            ),
+            "rtt_ms": self.rtt_ms,
+            "pacing": self.pacer.summary() if self.pacer is not None else None,
+        }
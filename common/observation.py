@@ -0,0 +1,130 @@
+""" This module contains the egocentric raster observations for vision style agents. """
+import numpy as np
+
+# Channels of a raster observation
+FOOD = 0
+BIGGER = 1
+SMALLER = 2
+WALLS = 3
+CHANNELS = 4
+
+
+class RasterEncoder:
+    """
+    The RasterEncoder class renders what agents see as small grids centred on each of them.
+
+    Each agent gets a CHANNELS x resolution x resolution grid covering a
+    square field of view around it: how much food is in every cell, how many
+    bigger and smaller players, and which cells lie outside the world.
+
+    All agents are rendered at once. The (agent, entity) pairs within the
+    field of view are found with one sorted sweep and binned with a single
+    bincount, so there is no Python work per agent or per entity.
+    """
+
+    def __init__(self, width, height, resolution=16, view=200):
+        """
+        Initialize a new RasterEncoder instance.
+
+        Parameters:
+            width (int): The width of the world.
+            height (int): The height of the world.
+            resolution (int): The number of cells along each side of a grid.
+            view (float): The side of the square field of view, in world units.
+        """
+        self.width = width
+        self.height = height
+        self.resolution = resolution
+        self.view = view
+        self.cell = view / resolution
+        # Offsets of the cell centres from the agent along either axis
+        self.offsets = (np.arange(resolution) + 0.5) * self.cell - view / 2
+
+    @property
+    def shape(self):
+        """The shape of the observation of one agent."""
+        return (CHANNELS, self.resolution, self.resolution)
+
+    def pairs(self, agent_xy, xy):
+        """
+        Finds every (agent, entity) pair where the entity is in the agent's field of view.
+
+        Entities are sorted by x, so the ones in the vertical strip of an
+        agent's view are a contiguous run found with searchsorted, and the
+        runs are then pruned on y.
+
+        Returns:
+            tuple: Two int arrays (agent, entity) of row indices.
+        """
+        half = self.view / 2
+        order = np.argsort(xy[:, 0], kind="stable")
+        sorted_x = xy[order, 0]
+        start = np.searchsorted(sorted_x, agent_xy[:, 0] - half, side="left")
+        end = np.searchsorted(sorted_x, agent_xy[:, 0] + half, side="right")
+        counts = end - start
+        agents = np.repeat(np.arange(len(agent_xy)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        entities = order[np.repeat(start, counts) + offsets]
+        in_view = np.abs(xy[entities, 1] - agent_xy[agents, 1]) <= half
+        return agents[in_view], entities[in_view]
+
+    def cells(self, agent_xy, xy, agents, entities):
+        """Fetches the flat grid cell each entity falls in, relative to its agent."""
+        offset = xy[entities] - agent_xy[agents] + self.view / 2
+        col_row = np.clip(
+            (offset // self.cell).astype(np.int64), 0, self.resolution - 1
+        )
+        return col_row[:, 1] * self.resolution + col_row[:, 0]
+
+    def encode(self, agent_xy, agent_radii, food_xy, player_xy, player_radii, own=None):
+        """
+        Renders the observations of a batch of agents.
+
+        Parameters:
+            agent_xy (np.ndarray): The (n, 2) agent positions.
+            agent_radii (np.ndarray): The agent radii, to tell bigger from smaller players.
+            food_xy (np.ndarray): The (m, 2) food positions.
+            player_xy (np.ndarray): The (k, 2) positions of every player, agents included.
+            player_radii (np.ndarray): The radii of every player.
+            own (np.ndarray): The row of each agent in player_xy, so it does not see itself.
+
+        Returns:
+            np.ndarray: A float32 array of shape (n, CHANNELS, resolution, resolution).
+        """
+        agent_xy = np.asarray(agent_xy, dtype=float).reshape(-1, 2)
+        agent_radii = np.asarray(agent_radii, dtype=float)
+        food_xy = np.asarray(food_xy, dtype=float).reshape(-1, 2)
+        player_xy = np.asarray(player_xy, dtype=float).reshape(-1, 2)
+        player_radii = np.asarray(player_radii, dtype=float)
+        n = len(agent_xy)
+        area = self.resolution * self.resolution
+
+        agents, foods = self.pairs(agent_xy, food_xy)
+        food_index = agents * CHANNELS * area + FOOD * area
+        food_index += self.cells(agent_xy, food_xy, agents, foods)
+
+        agents, players = self.pairs(agent_xy, player_xy)
+        if own is not None:
+            others = players != np.asarray(own)[agents]
+            agents, players = agents[others], players[others]
+        # Players of the same size can neither eat nor be eaten, so they are left out
+        differs = player_radii[players] != agent_radii[agents]
+        agents, players = agents[differs], players[differs]
+        channel = np.where(player_radii[players] > agent_radii[agents], BIGGER, SMALLER)
+        player_index = (agents * CHANNELS + channel) * area
+        player_index += self.cells(agent_xy, player_xy, agents, players)
+
+        grid = np.bincount(
+            np.concatenate((food_index, player_index)), minlength=n * CHANNELS * area
+        ).astype(np.float32)
+        grid = grid.reshape(n, CHANNELS, self.resolution, self.resolution)
+
+        # Cells whose centre lies outside the world are walls
+        x = agent_xy[:, :1] + self.offsets
+        y = agent_xy[:, 1:] + self.offsets
+        outside_x = (x < 0) | (x > self.width)
+        outside_y = (y < 0) | (y > self.height)
+        grid[:, WALLS] = outside_y[:, :, None] | outside_x[:, None, :]
+        return grid
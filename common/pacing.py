@@ -0,0 +1,207 @@
+""" This module contains the per client send pacing, driven by the measured throughput of its link. """
+import socket
+import struct
+import sys
+import time
+
+try:
+    import fcntl
+    import termios
+
+    # Bytes written to a socket that the peer has not acknowledged yet
+    OUTQ = termios.TIOCOUTQ
+except ImportError:
+    fcntl = None
+    OUTQ = None
+
+# Sends slower than this must have waited for the link, so they measure it
+BLOCKED_SEND = 0.002
+# Snapshot rate the detail level is chosen for
+TARGET_RATE = 30
+# Roughly how much smaller the compact encodings are than a plain snapshot
+PACKED_RATIO = 6
+# While the link keeps up the estimate grows by this factor per send, up to a multiple of what it delivered
+PROBE_GROWTH = 1.25
+PROBE_HEADROOM = 4
+# Once the throughput is known, at most this many seconds of data are kept queued
+MAX_QUEUE_DELAY = 0.25
+
+
+def send_backlog(sock):
+    """
+    Fetches how many bytes sent on a socket are still waiting in the kernel.
+
+    Returns:
+        int: The backlog in bytes, or None where the platform cannot tell.
+    """
+    if OUTQ is None:
+        return None
+    try:
+        return struct.unpack("i", fcntl.ioctl(sock.fileno(), OUTQ, b"\0" * 4))[0]
+    except OSError:
+        return None
+
+
+def set_send_timeout(sock, seconds):
+    """
+    Makes sends on a socket fail once they have been blocked for seconds.
+
+    Unlike settimeout this leaves receives blocking, so a thread waiting for
+    the next command is not disturbed, but a stalled link cannot hold the
+    thread sending to it forever.
+
+    Windows takes the timeout as a DWORD of milliseconds where 0 means no
+    timeout, everywhere else it is a struct timeval.
+    """
+    if sys.platform == "win32":
+        milliseconds = int(seconds * 1000)
+        if seconds > 0:
+            # A timeout below a millisecond must not turn into no timeout
+            milliseconds = max(milliseconds, 1)
+        value = struct.pack("<I", milliseconds)
+    else:
+        whole = int(seconds)
+        value = struct.pack("ll", whole, int((seconds - whole) * 1_000_000))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, value)
+
+
+class SendPacer:
+    """
+    The SendPacer class estimates what a client's link can absorb and paces sends to it.
+
+    After every send it looks at how much of what was sent is still queued
+    in the kernel. When earlier sends are still queued the link is the
+    bottleneck, and the rate the queue drains at is its throughput. Once the
+    link keeps up again the estimate is raised, so a link that recovers is
+    used. Where the queue cannot be read, only sends that blocked are measured.
+
+    The estimate decides how often snapshots may be sent and how compact
+    they must be, so slow clients get fewer and smaller snapshots instead of
+    an ever growing queue.
+    """
+
+    def __init__(self, max_rate=60.0, high_water=1 << 18, alpha=0.25, clock=None):
+        """
+        Initialize a new SendPacer instance.
+
+        Parameters:
+            max_rate (float): The most snapshots per second sent to a fast client.
+            high_water (int): The queued bytes above which nothing more is sent.
+            alpha (float): The smoothing factor of the throughput estimate.
+            clock (callable): Returns the current time in seconds.
+        """
+        self.max_rate = max_rate
+        self.high_water = high_water
+        self.alpha = alpha
+        self.clock = time.perf_counter if clock is None else clock
+        self.throughput = None
+        self.sent = 0
+        self.backlog = 0
+        self.congested = False
+        self.waiting_since = None
+        self.waiting_backlog = None
+        self.last_size = 0
+        self.last_time = None
+        self.last_delivered = 0
+        self.next_send = 0.0
+        self.skipped = 0
+
+    def observe(self, sample):
+        """Folds a throughput sample in bytes per second into the estimate."""
+        if self.throughput is None:
+            self.throughput = sample
+        else:
+            self.throughput += self.alpha * (sample - self.throughput)
+
+    def record(self, sock, size, elapsed):
+        """
+        Records a completed send and updates the throughput estimate.
+
+        Parameters:
+            sock (socket): The socket the bytes were sent on.
+            size (int): The number of bytes sent.
+            elapsed (float): How long the send took in seconds.
+        """
+        now = self.clock()
+        self.sent += size
+        self.last_size = size
+        backlog = send_backlog(sock)
+        if backlog is None:
+            if elapsed > BLOCKED_SEND:
+                self.observe(size / elapsed)
+        else:
+            delivered = self.sent - backlog
+            # More than this send still queued: earlier sends have not drained yet
+            congested = backlog > size
+            if self.last_time is not None and now > self.last_time:
+                drained = (delivered - self.last_delivered) / (now - self.last_time)
+                if self.congested and congested:
+                    # Queued the whole time, so the link was the bottleneck
+                    self.observe(drained)
+                elif self.throughput is not None:
+                    # The link kept up, probe for more
+                    ceiling = drained * PROBE_HEADROOM
+                    if self.throughput < ceiling:
+                        self.throughput = min(self.throughput * PROBE_GROWTH, ceiling)
+            self.congested = congested
+            self.backlog = backlog
+            self.last_delivered = delivered
+        self.last_time = now
+
+        interval = 1 / self.max_rate
+        if self.throughput:
+            interval = max(interval, size / self.throughput)
+        self.next_send = now + interval
+
+    def ready(self, sock):
+        """Checks whether the next snapshot may be sent on a socket now."""
+        now = self.clock()
+        backlog = send_backlog(sock)
+        if backlog is not None:
+            limit = self.high_water
+            if self.throughput:
+                limit = min(limit, max(self.throughput * MAX_QUEUE_DELAY, 1))
+            if backlog >= limit:
+                # Only a queue that stops draining counts as waiting
+                if self.waiting_backlog is None or backlog < self.waiting_backlog:
+                    self.waiting_since = now
+                    self.waiting_backlog = backlog
+                return False
+        self.waiting_since = None
+        self.waiting_backlog = None
+        return now >= self.next_send
+
+    def stalled(self, timeout):
+        """Checks whether the queue has not drained at all for longer than timeout seconds."""
+        return (
+            self.waiting_since is not None
+            and self.clock() - self.waiting_since > timeout
+        )
+
+    def wait(self):
+        """Fetches how long to wait before the next snapshot may be sent."""
+        return max(self.next_send - self.clock(), 0.0)
+
+    def codec(self, raw_size):
+        """
+        Picks how compact snapshots must be for the link to keep up.
+
+        Parameters:
+            raw_size (int): The size of a plain snapshot in bytes.
+
+        Returns:
+            str: "raw", "packed" or "zlib", see common.codec.
+        """
+        if self.throughput is None or self.throughput >= raw_size * TARGET_RATE:
+            return "raw"
+        if self.throughput * PACKED_RATIO >= raw_size * TARGET_RATE:
+            return "packed"
+        return "zlib"
+
+    def summary(self):
+        """Fetches the pacing state reported in the server stats."""
+        return {
+            "throughput_bps": self.throughput,
+            "backlog": self.backlog,
+            "skipped": self.skipped,
+        }
@@ -1,21 +1,42 @@
-import math
-import random
+from __future__ import annotations
 
-import pygame
+import copy
+from typing import TYPE_CHECKING
 
-pygame.font.init()
-from omegaconf import DictConfig
+import numpy as np
 
+from common.leaderboard import Leaderboard
+from common.movement import clamp_to_world, integrate, player_speeds
+from common.protocol import finite_float
+from common.spawning import find_spawn_locations
 from common.utilities import Position, random_rgb
 
+if TYPE_CHECKING:
+    from common.settings import Settings
+
 
 class Player:
     """
     The Player class holds the information for a single player.
     Each player has a name, position, score and colour.
+
+    Players are pickled into every snapshot sent to clients, so they use
+    __slots__ and copy what they need out of the config instead of keeping it.
     """
 
-    def __init__(self, cfg: DictConfig, id, name, position):
+    __slots__ = (
+        "score",
+        "id",
+        "name",
+        "position",
+        "colour",
+        "vel",
+        "radius",
+        "eaten",
+        "intent",
+    )
+
+    def __init__(self, cfg: Settings, id, name, position):
         """
         Initialize a new Player instance.
 
@@ -25,16 +46,16 @@ class Player:
             score (int): The score of the player.
             colour (Tuple[int, int, int]): The colour of the player as an (R, G, B) tuple.
         """
-        self.cfg = cfg
-        self.player_config = cfg.player
         self.score = 0
         self.id = id
         self.name = name
         self.position = position
         self.colour = random_rgb()
-        self.vel = self.player_config.start_velocity
-        self.radius = self.player_config.radius
+        self.vel = cfg.player.start_velocity
+        self.radius = cfg.player.radius
         self.eaten = False
+        # (is_target, x, y) movement intent integrated by the server each tick
+        self.intent = None
 
     def draw(self, screen):
         """Draws the player on the game screen with a circle representing the player and their name.
@@ -42,36 +63,19 @@ class Player:
         Parameters:
             screen (pygame.Surface): The game screen.
         """
-        pygame.draw.circle(
-            screen,
-            self.colour,
-            (self.position.x, self.position.y),
-            self.get_radius(),
-        )
+        from common.draw import draw_player
+
+        draw_player(screen, self)
+
+    def get_direction(self):
+        """Fetches the direction the player wants to move in based on the key presses.
+
+        Returns:
+            tuple: The (dx, dy) direction, each component being -1, 0 or 1.
+        """
+        from common.draw import pressed_direction
 
-    def move(self):
-        """Moves the player based on the key presses."""
-        keys = pygame.key.get_pressed()
-        # movement based on key presses
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            pos = self.position.x - self.vel - self.player_config.radius - self.score
-            if pos >= 0:
-                self.position.x = self.position.x - self.vel
-
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            pos = self.position.x + self.vel + self.player_config.radius + self.score
-            if pos <= self.cfg.width:
-                self.position.x = self.position.x + self.vel
-
-        if keys[pygame.K_UP] or keys[pygame.K_w]:
-            pos = self.position.y - self.vel - self.player_config.radius - self.score
-            if pos >= 0:
-                self.position.y = self.position.y - self.vel
-
-        if keys[pygame.K_DOWN] or keys[pygame.K_s]:
-            pos = self.position.y + self.vel + self.player_config.radius + self.score
-            if pos <= self.cfg.height:
-                self.position.y = self.position.y + self.vel
+        return pressed_direction()
 
     def update_speed(self, vel):
         """Updates the velocity of the player.
@@ -93,6 +97,12 @@ class Player:
         """Fetches the radius of the player."""
         return self.radius + self.score
 
+    def snapshot(self):
+        """Returns a detached copy of the player for publishing in a world snapshot."""
+        player = copy.copy(self)
+        player.position = Position(self.position.x, self.position.y)
+        return player
+
 
 class PlayerManager:
     """
@@ -100,14 +110,19 @@ class PlayerManager:
     It supports operations such as adding, updating, removing players and delivering player information.
     """
 
-    def __init__(self, cfg: DictConfig):
+    def __init__(self, cfg: Settings):
         """
         Initializes a new PlayerManager instance.
         """
         self.cfg = cfg
         self.player_config = cfg.player
         self.players: dict[str, Player] = {}
-        self.name_font = pygame.font.SysFont("arial", 20)
+        # Every connected player, including those eaten this round
+        self.connected: dict[str, Player] = {}
+        self.pending_moves = {}
+        self.pending_intents = {}
+        self.rng = np.random.default_rng()
+        self.leaderboard = Leaderboard()
 
     def add(self, player_id, name):
         """
@@ -121,6 +136,21 @@ class PlayerManager:
         """
         position = self.get_start_location()
         self.players[player_id] = Player(self.cfg, player_id, name, position)
+        self.connected[player_id] = self.players[player_id]
+        self.leaderboard.update(player_id, name, 0)
+
+    def add_many(self, players):
+        """
+        Adds several players at once, spawning them all in a single batch.
+
+        Parameters:
+            players (list): (player_id, name) pairs of the players to add.
+        """
+        positions = self.get_start_locations(len(players))
+        for (player_id, name), position in zip(players, positions):
+            self.players[player_id] = Player(self.cfg, player_id, name, position)
+            self.connected[player_id] = self.players[player_id]
+            self.leaderboard.update(player_id, name, 0)
 
     def update(self, player_id, position, score, colour):
         """
@@ -136,15 +166,73 @@ class PlayerManager:
         self.players[player_id].position = position
         self.players[player_id].score = score
         self.players[player_id].colour = colour
+        self.leaderboard.update(player_id, self.players[player_id].name, score)
+
+    def add_score(self, player_id, amount):
+        """
+        Adds to the score of a specific player and keeps the leaderboard in step.
+
+        Every score change on the server goes through here or update.
+
+        Parameters:
+            player_id (int): The id of the player.
+            amount (int): The points to add.
+        """
+        player = self.players[player_id]
+        player.score += amount
+        self.leaderboard.update(player_id, player.name, player.score)
 
     def remove(self, player_id):
         """
         Removes a player from the players dictionary.
 
+        The player stays connected, so it respawns when the next round starts.
+
         Parameters:
             name (str): The name of the player to be removed.
         """
         del self.players[player_id]
+        self.leaderboard.remove(player_id)
+
+    def disconnect(self, player_id):
+        """
+        Forgets a player whose client has gone, removing it if it is still in the world.
+
+        Parameters:
+            player_id (int): The id of the player.
+        """
+        self.connected.pop(player_id, None)
+        if player_id in self.players:
+            self.remove(player_id)
+
+    def reset(self):
+        """
+        Starts a new round in place: every connected player, eaten or not,
+        keeps its id, name and colour but respawns with no score and no
+        movement intent.
+        """
+        self.pending_moves.clear()
+        self.pending_intents.clear()
+        self.leaderboard.clear()
+        for player_id, player in self.connected.items():
+            self.players.setdefault(player_id, player)
+        players = list(self.players.values())
+        # Nobody blocks the spawns but the players placed before them
+        spawns = find_spawn_locations(
+            len(players),
+            (0, 0, self.cfg.width, self.cfg.height),
+            np.empty((0, 2)),
+            np.empty(0),
+            self.player_config.radius,
+            self.rng,
+        )
+        for player, (x, y) in zip(players, spawns.tolist()):
+            player.position = Position(x, y)
+            player.score = 0
+            player.vel = self.player_config.start_velocity
+            player.eaten = False
+            player.intent = None
+            self.leaderboard.update(player.id, player.name, 0)
 
     def get(self, player_id):
         """
@@ -167,62 +255,178 @@ class PlayerManager:
         """
         return self.players
 
+    def get_positions_and_radii(self):
+        """
+        Fetches the positions and radii of all players as arrays.
+
+        Returns:
+            tuple: An (n, 2) array of positions and an (n,) array of radii.
+        """
+        players = list(self.players.values())
+        positions = np.array(
+            [(player.position.x, player.position.y) for player in players], dtype=float
+        ).reshape(-1, 2)
+        radii = np.array([player.get_radius() for player in players], dtype=float)
+        return positions, radii
+
     def get_top_score(self):
         """
-        Fetches the top score of all players.
+        Fetches the top score of all players from the leaderboard.
 
         Returns:
             int: The top score of all players.
         """
-        if not self.players:
-            return 0
-        return max(player.score for player in self.players.values())
+        return self.leaderboard.top_score()
 
     def handle_move_command(self, data, player_id):
+        """
+        Queues a move command received from a client.
+
+        The move is only applied by apply_moves on the simulation thread, so
+        client threads never write to the live players.
+        """
+        try:
+            split_data = data.split(" ")
+            x = float(int(split_data[1]))
+            y = float(int(split_data[2]))
+            self.pending_moves[player_id] = (x, y)
+        except (IndexError, ValueError, OverflowError) as e:
+            print(f"[ERR]\tBad move command {data!r}: {e}")
+
+    def handle_intent_command(self, data, player_id):
+        """
+        Queues a movement intent received from a client.
+
+        "dir dx dy" keeps the player moving along (dx, dy) until the next
+        intent, "dir 0 0" stops it and "target x y" heads for the point (x, y).
+        Infinite or NaN components are rejected.
+        """
         try:
             split_data = data.split(" ")
-            x = int(split_data[1])
-            y = int(split_data[2])
-            self.players[player_id].position.x = x
-            self.players[player_id].position.y = y
-        except Exception as e:
-            print(e)
-            input("Press enter to continue...")
+            is_target = split_data[0] == "target"
+            x = finite_float(split_data[1])
+            y = finite_float(split_data[2])
+            self.queue_intent(player_id, is_target, x, y)
+        except (IndexError, ValueError) as e:
+            print(f"[ERR]\tBad intent command {data!r}: {e}")
+
+    def queue_intent(self, player_id, is_target, x, y):
+        """
+        Queues a movement intent to be applied on the next tick.
+
+        Parameters:
+            player_id (int): The id of the player.
+            is_target (bool): True if (x, y) is a point to head for, False for a direction.
+            x (float): The x component of the direction or target.
+            y (float): The y component of the direction or target.
+        """
+        self.pending_intents[player_id] = (is_target, x, y)
+
+    def apply_moves(self):
+        """
+        Applies the latest queued move and intent of every player.
+
+        Only the most recent move and intent per player survive until the next
+        tick. Moves are clamped to the world like integrated movement is.
+        """
+        pending, self.pending_moves = self.pending_moves, {}
+        moves = [
+            (self.players[player_id], xy)
+            for player_id, xy in pending.items()
+            if player_id in self.players
+        ]
+        if moves:
+            positions = clamp_to_world(
+                [xy for _, xy in moves],
+                [player.get_radius() for player, _ in moves],
+                self.cfg.width,
+                self.cfg.height,
+            )
+            for (player, _), (x, y) in zip(moves, positions.tolist()):
+                player.position.x = x
+                player.position.y = y
+        intents, self.pending_intents = self.pending_intents, {}
+        for player_id, intent in intents.items():
+            player = self.players.get(player_id)
+            if player is not None:
+                player.intent = intent
+
+    def integrate_movement(self, scale=1.0):
+        """
+        Moves every player that has an intent, in one vectorized pass.
+
+        Speed shrinks with score down to min_velocity and players are kept
+        inside the world.
+
+        Parameters:
+            scale (float): How many nominal ticks this tick is worth, see movement.tick_scale.
+        """
+        moving = [player for player in self.players.values() if player.intent]
+        if not moving:
+            return
+        intents = np.array([player.intent for player in moving], dtype=float)
+        scores = np.array([player.score for player in moving], dtype=float)
+        speeds = player_speeds(
+            scores, self.player_config.start_velocity, self.player_config.min_velocity
+        )
+        positions = integrate(
+            [(player.position.x, player.position.y) for player in moving],
+            intents[:, 1:],
+            intents[:, 0].astype(bool),
+            speeds * scale,
+            self.player_config.radius + scores,
+            self.cfg.width,
+            self.cfg.height,
+        )
+        for player, (x, y), speed in zip(moving, positions.tolist(), speeds.tolist()):
+            player.position.x = x
+            player.position.y = y
+            player.vel = speed
+
+    def snapshot(self):
+        """
+        Fetches detached copies of all players for a world snapshot.
+
+        Returns:
+            dict: A dictionary of player copies keyed by player id.
+        """
+        return {
+            player_id: player.snapshot() for player_id, player in self.players.items()
+        }
 
     def get_start_location(self):
         """
         picks a start location for a player based on other player
         locations. It will ensure it does not spawn inside another player
 
-        :param players: dict
-        :return: tuple (x,y)
-        """
-        while True:
-            stop = True
-            x = random.randrange(0, self.cfg.width)
-            y = random.randrange(0, self.cfg.height)
-            for player in self.players.values():
-                dis = math.sqrt(
-                    (x - player.position.x) ** 2 + (y - player.position.y) ** 2
-                )
-                if dis <= self.player_config.radius + player.score:
-                    stop = False
-                    break
-            if stop:
-                break
-        return Position(x, y)
+        :return: Position
+        """
+        return self.get_start_locations(1)[0]
+
+    def get_start_locations(self, n):
+        """
+        picks start locations for n new players at once, in bounded time.
+        They will not spawn inside existing players or each other while
+        there is room left on the map.
+
+        :param n: int
+        :return: list of Position
+        """
+        player_xy, player_radii = self.get_positions_and_radii()
+        spawns = find_spawn_locations(
+            n,
+            (0, 0, self.cfg.width, self.cfg.height),
+            player_xy,
+            player_radii,
+            self.player_config.radius,
+            self.rng,
+        )
+        return [Position(x, y) for x, y in spawns.tolist()]
 
     def draw(self, screen):
         """
         Draw each player on the game screen with a circle representing the player and their name.
         """
-        for _, player in self.players.items():
-            player.draw(screen)
-            player_name = self.name_font.render(player.name, 1, (0, 0, 0))
-            screen.blit(
-                player_name,
-                (
-                    player.position.x - player_name.get_width() / 2,
-                    player.position.y - player_name.get_height() / 2,
-                ),
-            )
+        from common.draw import draw_players
+
+        draw_players(screen, self.players.values())
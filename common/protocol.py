@@ -0,0 +1,272 @@
+""" This module contains the framing of the text commands clients send to the server. """
+import math
+
+# Every command, the name handshake included, ends with this byte
+MESSAGE_DELIMITER = b"\n"
+
+# The longest name handshake, e.g. "spectator auto 512.5", without its delimiter
+MAX_HANDSHAKE = 64
+
+# Commands that set where a player goes; only the latest one per batch matters
+MOVEMENT_COMMANDS = ("move", "dir", "target")
+
+
+def finite_float(value):
+    """Converts a string to a float, rejecting nan and infinities."""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"{value!r} is not a finite number")
+    return number
+
+
+def non_negative_float(value):
+    """Converts a string to a finite float that is zero or more, such as a round trip time."""
+    number = finite_float(value)
+    if number < 0:
+        raise ValueError(f"{value!r} is negative")
+    return number
+
+
+def bounded_int(low, high):
+    """
+    Builds a converter from a string to an int between low and high, both included.
+
+    Parameters:
+        low (int): The smallest accepted value.
+        high (int): The largest accepted value.
+    """
+
+    def convert(value):
+        number = int(value)
+        if not low <= number <= high:
+            raise ValueError(f"{value!r} is outside [{low}, {high}]")
+        return number
+
+    return convert
+
+
+# Moves beyond this are rejected even where the size of the world is not known
+MAX_COORDINATE = (1 << 16) - 1
+coordinate = bounded_int(0, MAX_COORDINATE)
+
+# Command name -> converters for its arguments; "ping" takes an optional rtt
+COMMAND_ARGUMENTS = {
+    "get": (),
+    "restart": (),
+    "stats": (),
+    "shm": (),
+    "udp": (),
+    "encoding": (str, float),
+    "interest": (),
+    "move": (coordinate, coordinate),
+    "dir": (finite_float, finite_float),
+    "target": (finite_float, finite_float),
+    "ping": (str, non_negative_float),
+}
+OPTIONAL_ARGUMENTS = {"ping": 1, "encoding": 1}
+
+# First element of a snapshot reply packed by common.codec
+PACKED = "packed"
+# First element of a level of detail update built by common.interest
+INTEREST = "interest"
+
+# Batch session commands take a variable number of groups of these arguments
+VARIADIC_ARGUMENTS = {
+    "register": (int, str),
+    "inputs": (int, finite_float, finite_float),
+    "unregister": (int,),
+}
+
+# A batch session sends the inputs of every bot in one frame, so it may be long
+BATCH_MAX_FRAME = 1 << 16
+# The most bots a single register command may ask for, over all its groups
+MAX_REGISTER = 1024
+# The most bots one batch session may own at a time
+MAX_SESSION_BOTS = 4096
+
+
+def frame(command):
+    """Encodes a command as a single frame ready to be sent."""
+    return command.encode("utf-8") + MESSAGE_DELIMITER
+
+
+def read_handshake(sock, limit=MAX_HANDSHAKE):
+    """
+    Reads the name handshake a client opens its connection with.
+
+    The handshake is read a byte at a time, so none of the commands sent
+    after it are taken from the socket before their own decoder reads them.
+
+    Parameters:
+        sock (socket.socket): The socket of the new connection.
+        limit (int): The longest handshake accepted, without its delimiter.
+
+    Returns:
+        str: The handshake, e.g. a player name or "spectator zlib".
+
+    Raises:
+        ValueError: If the handshake is too long, not utf-8 or cut off by the client.
+    """
+    data = b""
+    while len(data) <= limit:
+        byte = sock.recv(1)
+        if not byte:
+            raise ValueError("connection closed during the handshake")
+        if byte == MESSAGE_DELIMITER:
+            return data.decode("utf-8").strip()
+        data += byte
+    raise ValueError(f"handshake longer than {limit} bytes")
+
+
+def is_packed(reply):
+    """Checks whether a reply is a snapshot packed by common.codec, without importing it."""
+    return type(reply) is tuple and len(reply) == 3 and reply[0] == PACKED
+
+
+def is_interest(reply):
+    """Checks whether a reply is a level of detail update from common.interest."""
+    return type(reply) is tuple and len(reply) == 7 and reply[0] == INTEREST
+
+
+def is_valid(command, bounds=None):
+    """
+    Checks a decoded command against the known commands and their arguments.
+
+    Parameters:
+        command (str): A single command without its delimiter.
+        bounds (tuple): The (width, height) of the world; moves outside it are rejected.
+    """
+    split_data = command.split(" ")
+    if split_data[0] in VARIADIC_ARGUMENTS:
+        try:
+            return bool(parse_groups(command))
+        except ValueError:
+            return False
+    converters = COMMAND_ARGUMENTS.get(split_data[0])
+    if converters is None:
+        return False
+    if split_data[0] == "move" and bounds is not None:
+        converters = (bounded_int(0, bounds[0]), bounded_int(0, bounds[1]))
+    args = split_data[1:]
+    required = len(converters) - OPTIONAL_ARGUMENTS.get(split_data[0], 0)
+    if not required <= len(args) <= len(converters):
+        return False
+    try:
+        for converter, arg in zip(converters, args):
+            converter(arg)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_groups(command):
+    """
+    Converts the arguments of a variadic batch command into tuples.
+
+    For example "inputs 3 1 0 4 -1 0" gives [(3, 1.0, 0.0), (4, -1.0, 0.0)].
+
+    Parameters:
+        command (str): A single variadic command without its delimiter.
+
+    Raises:
+        ValueError: If the arguments do not form whole, valid groups.
+    """
+    verb, *args = command.split(" ")
+    converters = VARIADIC_ARGUMENTS[verb]
+    size = len(converters)
+    if not args or len(args) % size:
+        raise ValueError(f"{verb} expects groups of {size} arguments")
+    return [
+        tuple(converter(arg) for converter, arg in zip(converters, args[i : i + size]))
+        for i in range(0, len(args), size)
+    ]
+
+
+def coalesce(commands):
+    """
+    Drops movement commands that are superseded within the same batch.
+
+    Only the last movement command survives, in the position it arrived in;
+    every other command is kept in order.
+
+    Parameters:
+        commands (list): Decoded commands in the order they arrived.
+    """
+    last_movement = None
+    for index, command in enumerate(commands):
+        if command.split(" ", 1)[0] in MOVEMENT_COMMANDS:
+            last_movement = index
+    return [
+        command
+        for index, command in enumerate(commands)
+        if index == last_movement or command.split(" ", 1)[0] not in MOVEMENT_COMMANDS
+    ]
+
+
+class InputDecoder:
+    """
+    The InputDecoder class extracts complete commands from a client's byte stream.
+    Commands may arrive concatenated in one recv or split across several.
+    """
+
+    def __init__(self, max_frame=1024, bounds=None):
+        """
+        Initialize a new InputDecoder instance.
+
+        Parameters:
+            max_frame (int): The longest frame accepted; longer input is discarded.
+            bounds (tuple): The (width, height) of the world moves must stay in.
+        """
+        self.max_frame = max_frame
+        self.bounds = bounds
+        self.buffer = b""
+        self.malformed = 0
+        # Set while skipping the rest of an overlong frame up to its delimiter
+        self.discarding = False
+
+    def feed(self, data):
+        """
+        Adds received bytes to the buffer and returns every complete, valid command.
+
+        Malformed frames are counted and skipped, so a bad client can never
+        block or crash the connection thread.
+
+        Parameters:
+            data (bytes): The bytes returned by recv.
+
+        Returns:
+            list: The decoded commands, in the order they arrived.
+        """
+        data = self.buffer + data
+        if self.discarding:
+            end = data.find(MESSAGE_DELIMITER)
+            if end < 0:
+                self.buffer = b""
+                return []
+            data = data[end + 1 :]
+            self.discarding = False
+        *frames, self.buffer = data.split(MESSAGE_DELIMITER)
+        if len(self.buffer) > self.max_frame:
+            # A frame this long can never be valid, skip it up to its delimiter
+            # rather than grow forever or parse its tail as a new frame
+            self.buffer = b""
+            self.discarding = True
+            self.malformed += 1
+
+        commands = []
+        for raw in frames:
+            if len(raw) > self.max_frame:
+                self.malformed += 1
+                continue
+            try:
+                command = raw.decode("utf-8").strip()
+            except UnicodeDecodeError:
+                self.malformed += 1
+                continue
+            if not command:
+                continue
+            if is_valid(command, self.bounds):
+                commands.append(command)
+            else:
+                self.malformed += 1
+        return commands
@@ -0,0 +1,116 @@
+""" This module contains the round lifecycle, driven by the simulation tick. """
+import time
+
+WAITING = "waiting"
+RUNNING = "running"
+ENDED = "ended"
+
+# Events returned by RoundManager.tick
+ROUND_STARTED = "started"
+ROUND_ENDED = "ended"
+ROUND_RESET = "reset"
+
+
+class RoundManager:
+    """
+    The RoundManager class owns the timing of rounds for the whole server.
+
+    A round waits for its first player, runs for round_time seconds or until
+    someone reaches the win score, then shows the result for the intermission
+    before the world is reset for the next round. A restart request skips
+    straight to the reset. The simulation thread calls tick once per tick, so
+    no other thread has to poll the clock.
+    """
+
+    def __init__(self, round_time, intermission, win_score, clock=time.monotonic):
+        """
+        Initialize a new RoundManager instance.
+
+        Parameters:
+            round_time (float): The length of a round in seconds.
+            intermission (float): The pause between the end of a round and the reset.
+            win_score (int): The score that ends a round early; 0 disables it.
+            clock (callable): Returns the current time in seconds.
+        """
+        self.round_time = round_time
+        self.intermission = intermission
+        self.win_score = win_score
+        self.clock = clock
+        self.number = 1
+        self.state = WAITING
+        self.started_at = None
+        self.ends_at = None
+        self.winner = None
+        self.restart_requested = False
+
+    def request_restart(self):
+        """
+        Asks for the world to be reset on the next tick.
+
+        Safe to call from any thread; only the simulation thread acts on it.
+        """
+        self.restart_requested = True
+
+    def tick(self, players, leader):
+        """
+        Advances the round lifecycle by one simulation tick.
+
+        Parameters:
+            players (int): The number of connected players, including those eaten this round.
+            leader (tuple): The (player_id, name, score) at the top of the leaderboard, or None.
+
+        Returns:
+            str: ROUND_STARTED, ROUND_ENDED or ROUND_RESET when the round changed, otherwise None.
+        """
+        now = self.clock()
+        if self.restart_requested:
+            self.restart_requested = False
+            return self.reset(now, players)
+
+        if self.state == WAITING:
+            if players:
+                self.begin(now)
+                return ROUND_STARTED
+        elif self.state == RUNNING:
+            won = self.win_score and leader is not None and leader[2] >= self.win_score
+            if won or now >= self.ends_at:
+                self.state = ENDED
+                self.winner = leader
+                self.ends_at = now + self.intermission
+                return ROUND_ENDED
+        elif now >= self.ends_at:
+            return self.reset(now, players)
+        return None
+
+    def begin(self, now):
+        """Starts the clock of the current round."""
+        self.state = RUNNING
+        self.started_at = now
+        self.ends_at = now + self.round_time
+        self.winner = None
+
+    def reset(self, now, players):
+        """Moves on to the next round; it starts straight away if anyone is playing."""
+        self.number += 1
+        self.state = WAITING
+        self.started_at = None
+        self.ends_at = None
+        self.winner = None
+        if players:
+            self.begin(now)
+        return ROUND_RESET
+
+    def remaining(self):
+        """Fetches the seconds left in the current phase, or None while waiting."""
+        if self.ends_at is None:
+            return None
+        return max(self.ends_at - self.clock(), 0.0)
+
+    def meta(self):
+        """Fetches the round section sent to clients in every snapshot."""
+        return {
+            "number": self.number,
+            "state": self.state,
+            "remaining": self.remaining(),
+            "winner": self.winner,
+        }
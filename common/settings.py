@@ -0,0 +1,293 @@
+""" This module contains the frozen game settings, resolved once from the YAML config tree. """
+import dataclasses
+import os
+import pickle
+import re
+import typing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_DIR = os.path.join(ROOT, "config")
+CONFIG_NAME = "config"
+# Compiled settings live next to the bytecode caches, which git already ignores
+DEFAULT_CACHE = os.path.join(CONFIG_DIR, "__pycache__", "settings.pickle")
+
+# An override is a dotted key of plain names, "=" and a YAML scalar
+OVERRIDE_KEY = re.compile(r"^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$")
+# Hydra sweeps and casts such as choice(a,b) or range(1,5)
+HYDRA_FUNCTION = re.compile(r"^\s*[A-Za-z_]\w*\(.*\)\s*$", re.DOTALL)
+
+
+@dataclasses.dataclass(frozen=True)
+class PlayerSettings:
+    """Mirrors config/player/default.yaml."""
+
+    min_velocity: float
+    start_velocity: float
+    radius: int
+    win_score: int
+
+
+@dataclasses.dataclass(frozen=True)
+class FoodSettings:
+    """Mirrors config/food/default.yaml."""
+
+    food_radius: int
+    spawn_curve: str = "proportional"
+    spawn_rate: float = 0.1
+
+
+@dataclasses.dataclass(frozen=True)
+class ServerSettings:
+    """Mirrors config/server/default.yaml."""
+
+    buffer_size: int
+    round_time: int
+    mass_loss_time: int
+    gridline_spacing: int
+    transparency: int
+    gridline_thickness: int
+    w: int
+    h: int
+    port: int
+    chunk_cols: int = 1
+    chunk_rows: int = 1
+    intermission: int = 3
+    shm_slots: int = 0
+    shm_name: str = "evolario"
+    shm_players: int = 1024
+    unix_path: str = ""
+    udp_port: int = 0
+    interest_budget: int = 16384
+    send_timeout: float = 5.0
+    max_send_rate: float = 60.0
+    tick_rate: float = 1000.0
+    agents: str = ""
+
+
+@dataclasses.dataclass(frozen=True)
+class TrainingSettings:
+    """
+    Mirrors config/training/default.yaml.
+
+    The run limits count steps of the trainer, one per snapshot it receives,
+    not ticks of the server.
+    """
+
+    train: bool = False
+    generations: int = 10
+    arena_size: int = 0
+    max_steps: int = 3000
+    stall_steps: int = 150
+    grace_steps: int = 100
+    check_interval: int = 50
+    cut_quantile: float = 0.25
+    min_samples: int = 10
+    checkpoint_dir: str = "checkpoints"
+    checkpoint_interval: int = 1
+    checkpoint_keep: int = 3
+    resume: str = ""
+
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    """
+    The Settings class is a frozen snapshot of the whole config tree.
+
+    Reading a field is a plain attribute lookup, so runtime code can read
+    settings inside hot loops. Use dataclasses.replace to derive variants.
+    """
+
+    player: PlayerSettings
+    food: FoodSettings
+    server: ServerSettings
+    width: int
+    height: int
+    food_quantity: int
+    fps: int
+    neat_ai_config_file: str
+    training: TrainingSettings = TrainingSettings()
+
+
+def read_yaml(path):
+    """Reads a YAML file into a dict; empty files give an empty dict."""
+    import yaml
+
+    with open(path, encoding="utf-8") as file:
+        return yaml.safe_load(file) or {}
+
+
+def compose(config_dir=CONFIG_DIR, config_name=CONFIG_NAME, overrides=()):
+    """
+    Composes the config tree the way hydra does for this repo's layout.
+
+    Only the subset of hydra this repo uses is supported, and anything else
+    is rejected rather than silently misread:
+
+    - the defaults list of the root file holds "_self_" and "group: option"
+      entries, each pulling config/<group>/<option>.yaml into the <group> key,
+      then the root keys are applied on top;
+    - overrides are "dotted.key=value" with a YAML scalar value, see apply_override;
+    - values are literals, "${...}" interpolation is not resolved.
+
+    Parameters:
+        config_dir (str): The directory holding the YAML files.
+        config_name (str): The root file name without its extension.
+        overrides (iterable): Dotted overrides such as "server.port=6000".
+
+    Returns:
+        dict: The composed config tree.
+
+    Raises:
+        ValueError: If the files or overrides use unsupported hydra syntax.
+    """
+    root = read_yaml(os.path.join(config_dir, f"{config_name}.yaml"))
+    tree = {}
+    for entry in root.pop("defaults", []):
+        if entry == "_self_":
+            # "_self_" only orders the merge, and root keys are always applied last
+            continue
+        if not isinstance(entry, dict) or not all(
+            OVERRIDE_KEY.match(str(group)) and isinstance(option, str)
+            for group, option in entry.items()
+        ):
+            raise ValueError(f"Unsupported defaults list entry {entry!r}")
+        for group, option in entry.items():
+            tree[group] = read_yaml(os.path.join(config_dir, group, f"{option}.yaml"))
+    tree.update(root)
+    for override in overrides:
+        apply_override(tree, override)
+    reject_interpolation(tree)
+    return tree
+
+
+def apply_override(tree, override):
+    """
+    Applies a single "dotted.key=value" override to a config tree.
+
+    The value is parsed as YAML, so numbers and booleans keep their types.
+    Hydra's other override grammar is rejected: the +, ++ and ~ prefixes,
+    picking a config group option, lists, dicts, sweeps and functions such as
+    choice(a,b) or range(1,5).
+
+    Raises:
+        ValueError: If the override is not a supported key=value pair.
+        KeyError: If a parent of the key is not a config group.
+    """
+    import yaml
+
+    key, separator, value = override.partition("=")
+    if not separator or not OVERRIDE_KEY.match(key):
+        raise ValueError(
+            f"Override {override!r} is not of the form dotted.key=value; "
+            "hydra prefixes such as +, ++ and ~ are not supported"
+        )
+    if HYDRA_FUNCTION.match(value):
+        raise ValueError(f"Hydra sweeps and functions are not supported: {override!r}")
+    *parents, leaf = key.split(".")
+    node = tree
+    for parent in parents:
+        if not isinstance(node.get(parent), dict):
+            raise KeyError(f"Unknown config group {parent!r} in override {override!r}")
+        node = node[parent]
+    if isinstance(node.get(leaf), dict):
+        raise ValueError(
+            f"Selecting a config group option is not supported: {override!r}"
+        )
+    try:
+        parsed = yaml.safe_load(value)
+    except yaml.YAMLError as e:
+        raise ValueError(f"Override {override!r} has an invalid value: {e}") from e
+    if isinstance(parsed, (list, dict)):
+        raise ValueError(f"Override {override!r} must set a single value")
+    node[leaf] = parsed
+
+
+def reject_interpolation(tree):
+    """
+    Checks that no value in a config tree relies on "${...}" interpolation.
+
+    Raises:
+        ValueError: If a string value contains an interpolation.
+    """
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            reject_interpolation(value)
+        elif isinstance(value, str) and "${" in value:
+            raise ValueError(f"Interpolation is not supported: {key}={value!r}")
+
+
+def build(cls, tree):
+    """
+    Builds a settings dataclass from a config tree, recursing into nested settings.
+
+    Unknown keys are rejected so typos in YAML files or overrides fail fast.
+    """
+    hints = typing.get_type_hints(cls)
+    names = {field.name for field in dataclasses.fields(cls)}
+    unknown = set(tree) - names
+    if unknown:
+        raise KeyError(f"Unknown {cls.__name__} keys: {', '.join(sorted(unknown))}")
+    values = {}
+    for name, value in tree.items():
+        hint = hints[name]
+        if dataclasses.is_dataclass(hint):
+            value = build(hint, value)
+        elif hint is float and isinstance(value, int):
+            value = float(value)
+        values[name] = value
+    return cls(**values)
+
+
+def cache_key(config_dir, config_name, overrides):
+    """Identifies a compiled config by its overrides and the state of every YAML file."""
+    files = []
+    for directory, _, names in sorted(os.walk(config_dir)):
+        for name in sorted(names):
+            if name.endswith(".yaml"):
+                stat = os.stat(os.path.join(directory, name))
+                files.append((directory, name, stat.st_mtime_ns, stat.st_size))
+    return (config_name, tuple(overrides), tuple(files))
+
+
+def load_settings(
+    overrides=(), config_dir=CONFIG_DIR, config_name=CONFIG_NAME, cache_path=None
+):
+    """
+    Resolves the config tree once into a frozen Settings instance.
+
+    With a cache_path the compiled settings are pickled to disk and reused
+    until one of the YAML files or the overrides change.
+
+    Parameters:
+        overrides (iterable): Dotted overrides such as "server.port=6000".
+        config_dir (str): The directory holding the YAML files.
+        config_name (str): The root file name without its extension.
+        cache_path (str): Where to cache the compiled settings, or None.
+
+    Returns:
+        Settings: The resolved settings.
+    """
+    overrides = tuple(overrides)
+    key = None
+    if cache_path is not None:
+        key = cache_key(config_dir, config_name, overrides)
+        try:
+            with open(cache_path, "rb") as file:
+                cached_key, settings = pickle.load(file)
+            if cached_key == key:
+                return settings
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError):
+            pass
+
+    settings = build(Settings, compose(config_dir, config_name, overrides))
+
+    if cache_path is not None:
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temporary = f"{cache_path}.{os.getpid()}"
+            with open(temporary, "wb") as file:
+                pickle.dump((key, settings), file)
+            os.replace(temporary, cache_path)
+        except OSError as e:
+            print(f"[ERR]\tCould not cache settings to {cache_path}: {e}")
+    return settings
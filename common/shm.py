@@ -0,0 +1,331 @@
+""" This module contains the shared memory ring the server publishes the world into for local clients. """
+import itertools
+import operator
+
+import _pickle as pickle
+import numpy as np
+
+# Identifies a ring created by this module, and the version of its layout
+MAGIC = 0x45564F31
+# Header fields, stored as int64
+MAGIC_FIELD, SLOTS, FOOD_CAPACITY, PLAYER_CAPACITY, META_CAPACITY, LATEST = range(6)
+HEADER_FIELDS = 8
+# Every slot starts with its sequence number and the counts of what it holds
+SEQUENCE, FOOD_COUNT, PLAYER_COUNT, META_LENGTH = range(4)
+SLOT_FIELDS = 4
+# How many times a reader retries when the writer laps the slot it is reading
+READ_RETRIES = 8
+
+cell_xy = operator.attrgetter("x", "y")
+cell_colour = operator.attrgetter("colour")
+
+
+def flatten(values, getter, dtype, count):
+    """Packs getter(value) of every value into a flat array without building a list of tuples."""
+    flat = itertools.chain.from_iterable(map(getter, values))
+    return np.fromiter(flat, dtype, count)
+
+
+def align(offset, alignment=8):
+    """Rounds an offset up to the next multiple of alignment."""
+    return -(-offset // alignment) * alignment
+
+
+def slot_layout(food_capacity, player_capacity, meta_capacity):
+    """
+    Computes where each array of a slot lives, relative to the start of the slot.
+
+    Returns:
+        tuple: The {name: (offset, dtype, shape)} layout and the size of a slot in bytes.
+    """
+    arrays = (
+        ("fields", np.int64, (SLOT_FIELDS,)),
+        ("food_xy", np.int32, (food_capacity, 2)),
+        ("food_colour", np.uint8, (food_capacity, 3)),
+        ("player_id", np.int64, (player_capacity,)),
+        ("player_xy", np.float64, (player_capacity, 2)),
+        ("player_radius", np.float64, (player_capacity,)),
+        ("player_score", np.int64, (player_capacity,)),
+        ("player_colour", np.uint8, (player_capacity, 3)),
+        ("meta", np.uint8, (meta_capacity,)),
+    )
+    layout = {}
+    offset = 0
+    for name, dtype, shape in arrays:
+        layout[name] = (offset, dtype, shape)
+        offset = align(offset + np.dtype(dtype).itemsize * int(np.prod(shape)))
+    return layout, offset
+
+
+def ring_size(slots, food_capacity, player_capacity, meta_capacity):
+    """Computes the number of bytes a ring with these capacities needs."""
+    _, slot_size = slot_layout(food_capacity, player_capacity, meta_capacity)
+    return HEADER_FIELDS * 8 + slots * slot_size
+
+
+def map_slots(buffer, slots, food_capacity, player_capacity, meta_capacity):
+    """Creates the NumPy views of every slot of a ring, without copying."""
+    layout, slot_size = slot_layout(food_capacity, player_capacity, meta_capacity)
+    views = []
+    for slot in range(slots):
+        start = HEADER_FIELDS * 8 + slot * slot_size
+        views.append(
+            {
+                name: np.ndarray(shape, dtype, buffer, start + offset)
+                for name, (offset, dtype, shape) in layout.items()
+            }
+        )
+    return views
+
+
+class ShmWorldWriter:
+    """
+    The ShmWorldWriter class publishes every tick of the world into a shared memory ring.
+
+    Each snapshot is written into the next of a fixed number of slots as
+    plain arrays, so clients on the same machine read the world without any
+    serialization or socket traffic. Every slot is guarded by a sequence
+    number, a seqlock: it is odd while the slot is being written and even
+    once it holds the tick it names. With several slots a reader has slots - 1
+    ticks to use a view before the writer comes back round to it.
+    """
+
+    def __init__(
+        self, name, slots, food_capacity, player_capacity=1024, meta_capacity=65536
+    ):
+        """
+        Initialize a new ShmWorldWriter instance.
+
+        Parameters:
+            name (str): The name of the shared memory block clients attach to.
+            slots (int): The number of ticks kept in the ring.
+            food_capacity (int): The most food cells a slot holds.
+            player_capacity (int): The most players a slot holds.
+            meta_capacity (int): The bytes reserved for the pickled meta section.
+        """
+        from multiprocessing import shared_memory
+
+        size = ring_size(slots, food_capacity, player_capacity, meta_capacity)
+        try:
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a server that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        self.name = name
+        self.slots = slots
+        self.food_capacity = food_capacity
+        self.player_capacity = player_capacity
+        self.meta_capacity = meta_capacity
+        self.truncated = 0
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, self.memory.buf)
+        self.views = map_slots(
+            self.memory.buf, slots, food_capacity, player_capacity, meta_capacity
+        )
+        self.header[:] = 0
+        self.header[SLOTS] = slots
+        self.header[FOOD_CAPACITY] = food_capacity
+        self.header[PLAYER_CAPACITY] = player_capacity
+        self.header[META_CAPACITY] = meta_capacity
+        self.header[LATEST] = -1
+        # Written last so readers never see a half initialized header
+        self.header[MAGIC_FIELD] = MAGIC
+
+    def publish(self, snapshot):
+        """
+        Writes a snapshot into the next slot of the ring.
+
+        Food and players beyond the capacity of a slot are left out and counted in truncated.
+
+        Parameters:
+            snapshot (WorldSnapshot): The snapshot published by the simulation thread.
+        """
+        version = snapshot.version
+        view = self.views[version % self.slots]
+        fields = view["fields"]
+        fields[SEQUENCE] = 2 * version + 1
+
+        food_cells = snapshot.food_cells[: self.food_capacity]
+        food_count = len(food_cells)
+        if food_count:
+            view["food_xy"][:food_count] = flatten(
+                food_cells, cell_xy, np.int32, 2 * food_count
+            ).reshape(food_count, 2)
+            view["food_colour"][:food_count] = flatten(
+                food_cells, cell_colour, np.uint8, 3 * food_count
+            ).reshape(food_count, 3)
+
+        players = list(snapshot.players.values())[: self.player_capacity]
+        player_count = len(players)
+        if player_count:
+            view["player_id"][:player_count] = [player.id for player in players]
+            view["player_xy"][:player_count] = [
+                (player.position.x, player.position.y) for player in players
+            ]
+            view["player_radius"][:player_count] = [player.radius for player in players]
+            view["player_score"][:player_count] = [player.score for player in players]
+            view["player_colour"][:player_count] = [player.colour for player in players]
+
+        meta = dict(snapshot.meta)
+        meta["names"] = {player.id: player.name for player in players}
+        blob = pickle.dumps(meta)
+        if len(blob) > self.meta_capacity:
+            # Names are the least important part, the leaderboard already has the top ones
+            blob = pickle.dumps(snapshot.meta)
+            if len(blob) > self.meta_capacity:
+                blob = pickle.dumps({})
+        view["meta"][: len(blob)] = np.frombuffer(blob, np.uint8)
+
+        if food_count < len(snapshot.food_cells) or player_count < len(
+            snapshot.players
+        ):
+            self.truncated += 1
+        fields[FOOD_COUNT] = food_count
+        fields[PLAYER_COUNT] = player_count
+        fields[META_LENGTH] = len(blob)
+        fields[SEQUENCE] = 2 * version + 2
+        self.header[LATEST] = version
+
+    def close(self):
+        """Releases the ring; clients still attached keep their mapping until they detach."""
+        self.header = None
+        self.views = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class ShmFrame:
+    """
+    The ShmFrame class is one tick of the world as read from the ring.
+
+    Its arrays are views into shared memory that the writer reuses after
+    slots - 1 more ticks, so check valid() after using them, or read with
+    copy=True to keep them for longer.
+    """
+
+    __slots__ = (
+        "version",
+        "food_xy",
+        "food_colour",
+        "player_id",
+        "player_xy",
+        "player_radius",
+        "player_score",
+        "player_colour",
+        "meta",
+        "_fields",
+        "_sequence",
+    )
+
+    def __init__(self, version, view, meta, copy=False):
+        """
+        Initialize a new ShmFrame instance.
+
+        Parameters:
+            version (int): The tick the frame was published at.
+            view (dict): The views of the slot holding the frame.
+            meta (dict): The unpickled meta section, including the player names.
+            copy (bool): Whether to copy the arrays out of shared memory.
+        """
+        fields = view["fields"]
+        food_count = int(fields[FOOD_COUNT])
+        player_count = int(fields[PLAYER_COUNT])
+        self.version = version
+        self.meta = meta
+        for name in ("food_xy", "food_colour"):
+            array = view[name][:food_count]
+            setattr(self, name, array.copy() if copy else array)
+        for name in (
+            "player_id",
+            "player_xy",
+            "player_radius",
+            "player_score",
+            "player_colour",
+        ):
+            array = view[name][:player_count]
+            setattr(self, name, array.copy() if copy else array)
+        self._fields = fields
+        self._sequence = 2 * version + 2
+
+    def valid(self):
+        """Checks the writer has not started reusing the slot behind this frame."""
+        return int(self._fields[SEQUENCE]) == self._sequence
+
+
+class ShmWorldReader:
+    """
+    The ShmWorldReader class attaches to the ring published by a server on the same machine.
+    """
+
+    def __init__(self, name):
+        """
+        Initialize a new ShmWorldReader instance.
+
+        Parameters:
+            name (str): The name of the shared memory block the server created.
+        """
+        from multiprocessing import resource_tracker, shared_memory
+
+        # The server owns the block; readers must not unlink it when they exit
+        try:
+            self.memory = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # Python < 3.13 always tracks the block, so stop tracking it by hand
+            self.memory = shared_memory.SharedMemory(name)
+            resource_tracker.unregister(self.memory._name, "shared_memory")
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, self.memory.buf)
+        if int(self.header[MAGIC_FIELD]) != MAGIC:
+            raise ValueError(f"Shared memory {name!r} is not an evolario world ring")
+        self.slots = int(self.header[SLOTS])
+        self.views = map_slots(
+            self.memory.buf,
+            self.slots,
+            int(self.header[FOOD_CAPACITY]),
+            int(self.header[PLAYER_CAPACITY]),
+            int(self.header[META_CAPACITY]),
+        )
+        self.version = -1
+
+    def latest(self, copy=False):
+        """
+        Reads the most recently published tick.
+
+        Parameters:
+            copy (bool): Whether to copy the arrays out of shared memory.
+
+        Returns:
+            ShmFrame: The frame, or None when nothing was published yet or the
+            writer kept overtaking the reader.
+        """
+        for _ in range(READ_RETRIES):
+            version = int(self.header[LATEST])
+            if version < 0:
+                return None
+            view = self.views[version % self.slots]
+            fields = view["fields"]
+            if int(fields[SEQUENCE]) != 2 * version + 2:
+                continue
+            length = int(fields[META_LENGTH])
+            blob = view["meta"][:length].tobytes()
+            frame = ShmFrame(version, view, None, copy)
+            # The slot must not have been rewritten while it was being read
+            if not frame.valid():
+                continue
+            frame.meta = pickle.loads(blob)
+            self.version = version
+            return frame
+        return None
+
+    def newer(self, copy=False):
+        """Reads the latest tick only if it was published since the last read."""
+        if int(self.header[LATEST]) <= self.version:
+            return None
+        return self.latest(copy)
+
+    def close(self):
+        """Detaches from the ring."""
+        self.header = None
+        self.views = None
+        self.memory.close()
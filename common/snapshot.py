@@ -0,0 +1,147 @@
+""" This module contains the immutable world snapshots published by the simulation thread. """
+import threading
+from collections import deque
+
+import _pickle as pickle
+
+
+class WorldSnapshot:
+    """
+    The WorldSnapshot class is a frozen copy of the world at the end of a tick.
+    It is never mutated after publishing, so any thread can read or serialize it without locks.
+    """
+
+    __slots__ = (
+        "version",
+        "food_cells",
+        "players",
+        "meta",
+        "_payload",
+        "_encoded",
+        "_food_keys",
+        "__weakref__",
+    )
+
+    def __init__(self, version, food_cells, players, meta=None):
+        """
+        Initialize a new WorldSnapshot instance.
+
+        Parameters:
+            version (int): The tick number the snapshot was taken at.
+            food_cells (tuple): The food cells alive at the end of the tick.
+            players (dict): Detached copies of the players keyed by player id.
+            meta (dict): Small world wide sections such as the leaderboard.
+        """
+        self.version = version
+        self.food_cells = tuple(food_cells)
+        self.players = players
+        self.meta = {} if meta is None else meta
+        self._payload = None
+        self._encoded = {}
+        self._food_keys = None
+
+    def payload(self):
+        """
+        Fetches the pickled (food_cells, players, meta) tuple sent to clients.
+
+        The bytes are produced once per snapshot by whichever reader asks first
+        and shared by every other connection. Two readers racing here both
+        produce identical bytes, so no lock is needed.
+        """
+        payload = self._payload
+        if payload is None:
+            payload = pickle.dumps((list(self.food_cells), self.players, self.meta))
+            self._payload = payload
+        return payload
+
+    def food_keys(self):
+        """
+        Fetches the (x, y, colour) keys of the food cells, shared by every connection.
+
+        Pooled cells are reused at new positions, so a cell object does not
+        identify the same food across snapshots, but its key does.
+        """
+        food_keys = self._food_keys
+        if food_keys is None:
+            food_keys = frozenset(
+                (cell.x, cell.y, cell.colour) for cell in self.food_cells
+            )
+            self._food_keys = food_keys
+        return food_keys
+
+    def encoded(self, encoder, codec):
+        """
+        Fetches the snapshot packed with one of the compact encodings.
+
+        Like payload, each encoding is produced once per snapshot and shared
+        by every connection that asked for it.
+
+        Parameters:
+            encoder (SnapshotEncoder): Packs the snapshot.
+            codec (str): The encoding, see common.codec.CODECS.
+        """
+        payload = self._encoded.get(codec)
+        if payload is None:
+            payload = encoder.encode(self, codec)
+            self._encoded[codec] = payload
+        return payload
+
+
+class SnapshotBuffer:
+    """
+    The SnapshotBuffer class keeps the most recent WorldSnapshots published by the simulation.
+    Readers fetch the latest one lock-free; the writer only ever appends new snapshots.
+    """
+
+    def __init__(self, depth=2):
+        """
+        Initialize a new SnapshotBuffer instance.
+
+        Parameters:
+            depth (int): How many snapshots are kept alive (2 for double buffering).
+        """
+        self.snapshots = deque(maxlen=depth)
+        self.condition = threading.Condition()
+        self._latest = WorldSnapshot(0, (), {})
+        self.snapshots.append(self._latest)
+
+    def publish(self, snapshot):
+        """
+        Makes a snapshot the latest one and wakes up waiting readers.
+
+        Parameters:
+            snapshot (WorldSnapshot): The snapshot taken at the end of a tick.
+        """
+        with self.condition:
+            self.snapshots.append(snapshot)
+            self._latest = snapshot
+            self.condition.notify_all()
+
+    def latest(self):
+        """Fetches the most recently published snapshot."""
+        return self._latest
+
+    def wait_for(self, predicate, timeout=None):
+        """
+        Blocks until the latest snapshot satisfies predicate or the timeout passes.
+
+        Parameters:
+            predicate (callable): Called with each newly published snapshot.
+            timeout (float): The maximum time to wait in seconds.
+
+        Returns:
+            WorldSnapshot: The latest snapshot, whether or not it satisfies predicate.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: predicate(self._latest), timeout)
+            return self._latest
+
+    def wait_for_newer(self, version, timeout=None):
+        """
+        Blocks until a snapshot newer than version is published or the timeout passes.
+
+        Parameters:
+            version (int): The version the caller has already seen.
+            timeout (float): The maximum time to wait in seconds.
+        """
+        return self.wait_for(lambda snapshot: snapshot.version > version, timeout)
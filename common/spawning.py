@@ -0,0 +1,190 @@
+""" This module contains the vectorized helpers used to spawn food away from players. """
+import math
+
+import numpy as np
+
+SPAWN_CURVES = ("constant", "proportional", "instant")
+
+
+def spawn_count(curve, rate, deficit):
+    """
+    Works out how many food cells to spawn this tick.
+
+    Parameters:
+        curve (str): "constant" spawns rate cells per tick, "proportional" spawns
+            rate * deficit cells per tick and "instant" fills the whole deficit.
+        rate (float): The parameter of the curve.
+        deficit (int): How many cells are missing from the target quantity.
+    """
+    if deficit <= 0:
+        return 0
+    if curve == "constant":
+        count = int(rate)
+    elif curve == "proportional":
+        count = math.ceil(deficit * rate)
+    elif curve == "instant":
+        count = deficit
+    else:
+        raise ValueError(f"Unknown spawn curve {curve}, expected one of {SPAWN_CURVES}")
+    return min(max(count, 1), deficit)
+
+
+def sample_free_positions(
+    n, bounds, player_xy, player_radii, rng, margin=0, max_rounds=8
+):
+    """
+    Samples up to n integer positions that are not inside any player.
+
+    Candidates are drawn as arrays and every candidate inside a player's radius
+    (plus margin) is rejected with a single ball query over all players. Any
+    shortfall is redrawn with twice the oversampling, for at most max_rounds.
+
+    Parameters:
+        n (int): The number of positions wanted.
+        bounds (tuple): The (x0, y0, x1, y1) rectangle to sample from, inclusive.
+        player_xy (np.ndarray): The (p, 2) player positions.
+        player_radii (np.ndarray): The player radii.
+        rng (np.random.Generator): The random generator to draw from.
+        margin (float): Extra clearance around every player.
+        max_rounds (int): The most sampling rounds before giving up.
+
+    Returns:
+        np.ndarray: A (k, 2) int array with k <= n free positions.
+    """
+    from scipy.spatial import cKDTree
+
+    x0, y0, x1, y1 = (int(v) for v in bounds)
+    accepted = []
+    remaining = n
+    oversample = 1.25
+    for _ in range(max_rounds):
+        if remaining <= 0:
+            break
+        size = max(int(remaining * oversample), 1)
+        candidates = np.column_stack(
+            (
+                rng.integers(x0, x1 + 1, size),
+                rng.integers(y0, y1 + 1, size),
+            )
+        )
+        if len(player_xy):
+            blocked = cKDTree(candidates).query_ball_point(
+                player_xy, np.asarray(player_radii, dtype=float) + margin
+            )
+            mask = np.ones(size, dtype=bool)
+            for indices in blocked:
+                mask[indices] = False
+            candidates = candidates[mask]
+        candidates = candidates[:remaining]
+        accepted.append(candidates)
+        remaining -= len(candidates)
+        oversample *= 2
+    if not accepted:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.concatenate(accepted)
+
+
+def random_colours(n, rng):
+    """Returns an (n, 3) array of random RGB colours."""
+    return rng.integers(0, 256, (n, 3), dtype=np.uint8)
+
+
+def clearance(points, player_xy, player_radii):
+    """
+    Returns, for every point, the distance to the edge of the nearest player.
+
+    Points with no players around get an infinite clearance.
+    """
+    if not len(player_xy):
+        return np.full(len(points), np.inf)
+    distances = np.hypot(
+        points[:, None, 0] - player_xy[None, :, 0],
+        points[:, None, 1] - player_xy[None, :, 1],
+    )
+    return (distances - player_radii[None, :]).min(axis=1)
+
+
+def free_cells(bounds, player_xy, player_radii, min_clearance, cell_size):
+    """
+    Builds a coarse occupancy grid and returns the centres of the free cells.
+
+    A cell is free when its centre is at least min_clearance away from the
+    edge of every player, which is decided with one ball query per player.
+    """
+    from scipy.spatial import cKDTree
+
+    x0, y0, x1, y1 = bounds
+    xs = np.arange(x0 + cell_size / 2, x1, cell_size)
+    ys = np.arange(y0 + cell_size / 2, y1, cell_size)
+    centres = np.column_stack([grid.ravel() for grid in np.meshgrid(xs, ys)])
+    if not len(centres) or not len(player_xy):
+        return centres
+    occupied = np.zeros(len(centres), dtype=bool)
+    for indices in cKDTree(centres).query_ball_point(
+        player_xy, player_radii + min_clearance
+    ):
+        occupied[indices] = True
+    return centres[~occupied]
+
+
+def find_spawn_locations(
+    n, bounds, player_xy, player_radii, min_clearance, rng, batch=64
+):
+    """
+    Picks n spawn positions that do not overlap players or each other, in bounded time.
+
+    Each spawn first tests a vectorized batch of random candidates. If none of
+    them is free, it samples from the free cells of a coarse occupancy grid. If
+    the grid is full too, it falls back to the candidate furthest from any player.
+    Every spawn placed becomes a blocker for the following ones.
+
+    Parameters:
+        n (int): The number of spawn positions wanted.
+        bounds (tuple): The (x0, y0, x1, y1) rectangle to spawn in.
+        player_xy (np.ndarray): The (p, 2) player positions.
+        player_radii (np.ndarray): The player radii.
+        min_clearance (float): The radius of the player being spawned.
+        rng (np.random.Generator): The random generator to draw from.
+        batch (int): The number of random candidates tested per spawn.
+
+    Returns:
+        np.ndarray: An (n, 2) int array of spawn positions.
+    """
+    x0, y0, x1, y1 = (int(v) for v in bounds)
+    blockers_xy = np.asarray(player_xy, dtype=float).reshape(-1, 2)
+    blockers_r = np.asarray(player_radii, dtype=float)
+    spawns = np.empty((n, 2), dtype=np.int64)
+    grid = None
+    grid_blockers = 0
+    for i in range(n):
+        candidates = np.column_stack(
+            (rng.integers(x0, x1, batch), rng.integers(y0, y1, batch))
+        )
+        room = clearance(candidates, blockers_xy, blockers_r)
+        free = np.flatnonzero(room > min_clearance)
+        if len(free):
+            spawn = candidates[free[0]]
+        else:
+            if grid is None:
+                grid = free_cells(
+                    (x0, y0, x1, y1),
+                    blockers_xy,
+                    blockers_r,
+                    min_clearance,
+                    max(2 * min_clearance, 1),
+                )
+            elif len(blockers_r) > grid_blockers:
+                # Only spawns placed since the grid was built can fill more cells
+                new = slice(grid_blockers, None)
+                grid = grid[
+                    clearance(grid, blockers_xy[new], blockers_r[new]) > min_clearance
+                ]
+            grid_blockers = len(blockers_r)
+            if len(grid):
+                spawn = grid[rng.integers(len(grid))].round()
+            else:
+                spawn = candidates[int(np.argmax(room))]
+        spawns[i] = spawn
+        blockers_xy = np.vstack((blockers_xy, spawn[None, :]))
+        blockers_r = np.append(blockers_r, min_clearance)
+    return spawns
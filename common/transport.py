@@ -0,0 +1,149 @@
+""" This module contains the socket transports clients and the server talk over. """
+import os
+import secrets
+import socket
+
+# The largest payload a single UDP datagram can carry
+MAX_DATAGRAM = 65507
+# Commands that may be sent over the unreliable channel; a lost one is superseded by the next
+DATAGRAM_COMMANDS = ("move", "dir", "target", "inputs")
+
+
+def is_unix(address):
+    """Checks whether an address is a Unix domain socket path rather than a (host, port) pair."""
+    return isinstance(address, str)
+
+
+def open_stream(address, timeout=None):
+    """
+    Connects a reliable stream to the server.
+
+    Parameters:
+        address (tuple or str): A (host, port) pair for TCP, or a path for a Unix domain socket.
+        timeout (float): The socket timeout in seconds, or None to block.
+
+    Returns:
+        socket: The connected socket.
+    """
+    if is_unix(address):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+        return sock
+    sock = socket.create_connection(address, timeout)
+    # Commands are small and latency bound, so do not wait to coalesce them
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def listen_unix(path):
+    """Binds a listening Unix domain socket, replacing one left behind by a previous server."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    sock.listen()
+    return sock
+
+
+def encode_datagram(token, sequence, command):
+    """Encodes a command as a "<token> <sequence> <command>" datagram."""
+    return f"{token} {sequence} {command}".encode("utf-8")
+
+
+def decode_datagram(data):
+    """
+    Splits a datagram into its token, sequence number and command.
+
+    Raises:
+        ValueError: If the datagram is not of the form "<token> <sequence> <command>".
+    """
+    token, sequence, command = data.decode("utf-8").split(" ", 2)
+    return int(token), int(sequence), command
+
+
+class UdpSession:
+    """
+    The UdpSession class is the server side of the unreliable input channel of one connection.
+
+    The token handed out over the reliable connection ties datagrams to the
+    player, or the bots of a batch session, that the connection controls.
+    Datagrams can arrive late or out of order; only ones with a sequence number
+    above every one seen so far are applied, so a stale input never overrides
+    a newer one.
+    """
+
+    __slots__ = (
+        "token",
+        "player_id",
+        "owned",
+        "last_sequence",
+        "received",
+        "stale",
+        "malformed",
+    )
+
+    def __init__(self, player_id=None, owned=None):
+        """
+        Initialize a new UdpSession instance.
+
+        Parameters:
+            player_id (int): The player controlled by the connection, or None for a batch session.
+            owned (set): The bots owned by a batch session, shared with its connection.
+        """
+        self.token = secrets.randbits(63)
+        self.player_id = player_id
+        self.owned = owned
+        self.last_sequence = 0
+        self.received = 0
+        self.stale = 0
+        self.malformed = 0
+
+    def accept(self, sequence):
+        """Checks a datagram is newer than every one applied so far, and records it if so."""
+        if sequence <= self.last_sequence:
+            self.stale += 1
+            return False
+        self.last_sequence = sequence
+        self.received += 1
+        return True
+
+
+class UdpChannel:
+    """
+    The UdpChannel class is the client side of the unreliable input channel.
+    """
+
+    def __init__(self, address, token):
+        """
+        Initialize a new UdpChannel instance.
+
+        Parameters:
+            address (tuple): The (host, port) the server receives datagrams on.
+            token (int): The token the server handed out for this connection.
+        """
+        self.address = address
+        self.token = token
+        self.sequence = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, command):
+        """
+        Sends a command without any delivery or ordering guarantee.
+
+        Returns:
+            int: The number of bytes sent.
+        """
+        self.sequence += 1
+        datagram = encode_datagram(self.token, self.sequence, command)
+        if len(datagram) > MAX_DATAGRAM:
+            raise ValueError(
+                f"Command of {len(datagram)} bytes does not fit a datagram"
+            )
+        return self.sock.sendto(datagram, self.address)
+
+    def close(self):
+        """Closes the channel."""
+        self.sock.close()
@@ -34,6 +34,8 @@ def calculate_distance(x1, y1, x2, y2):
 class Position:
     """The Position class holds the x and y coordinates of a player."""
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
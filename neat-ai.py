@@ -1,19 +1,21 @@
-import concurrent.futures
 import contextlib
 import math
+import sys
 import threading
 import time
 
-import hydra
 import neat
-import pygame
-from omegaconf import DictConfig
+import numpy as np
 
+from client.batch import BatchClient
 from client.client import Client
+from common.agents import Observations
+from common.checkpoint import AsyncCheckpointer, latest_checkpoint, restore_population
+from common.early_stopping import EarlyStopping
 from common.food import FoodCellManager
 from common.player import PlayerManager
+from common.settings import DEFAULT_CACHE, Settings, load_settings
 from common.utilities import calculate_distance
-from user import draw_grid, draw_score, draw_scores
 
 directions = [
     "up",
@@ -28,17 +30,85 @@ directions = [
 ]
 
 
+class GenomeRun:
+    """Tracks the fitness of one genome while its bot plays"""
+
+    # Metric weights
+    score_weight = 0.5
+    distance_weight = 0.2
+    exploration_weight = 0.3
+    # Change this value according to your game's scale
+    movement_threshold = 0.2
+    # Steps of survival counted as one second of exploration; a step is one
+    # snapshot received by the trainer, not a tick of the server
+    step_rate = 60
+    # Snapshots a bot may be missing from before it ever showed up
+    missing_limit = 10
+
+    def __init__(self, genome_id, genome, net):
+        self.genome_id = genome_id
+        self.genome = genome
+        self.net = net
+        self.score = 0
+        self.total_distance_travelled = 0
+        self.last_position = None
+        self.steps = 0
+        self.idle_steps = 0
+        self.missing_steps = 0
+
+    def update(self, player):
+        """
+        Records the latest state of the bot
+
+        Parameters:
+            player (Player): The bot in the latest snapshot, None once it has been eaten
+
+        Returns:
+            bool: True once the bot has been eaten, or never showed up
+        """
+        if player is None:
+            if self.last_position is None:
+                # Not in a snapshot yet, or eaten before it ever was; either
+                # way the run ends instead of waiting on early stopping
+                self.missing_steps += 1
+                return self.missing_steps >= self.missing_limit
+            return True
+        self.score = player.score
+        current_position = (player.position.x, player.position.y)
+        if self.last_position is None:
+            # The first snapshot the bot is in starts the run
+            self.last_position = current_position
+            return False
+        self.steps += 1
+        self.idle_steps += 1
+        if current_position != self.last_position:
+            distance_moved = calculate_distance(*current_position, *self.last_position)
+            if distance_moved > self.movement_threshold:
+                self.total_distance_travelled += distance_moved
+                self.last_position = current_position
+                self.idle_steps = 0
+        return False
+
+    def fitness(self):
+        exploration_score = self.steps / self.step_rate * self.exploration_weight
+        distance_score = self.total_distance_travelled * self.distance_weight
+        score_score = self.score * self.score_weight
+        return (exploration_score + distance_score + score_score) / 100
+
+
 class NeatAI:
     """NEAT AI class"""
 
-    def __init__(self, cfg: DictConfig):
+    def __init__(self, cfg: Settings):
         self.cfg = cfg
         self.player_cfg = cfg.player
         self.food_cfg = cfg.food
         self.player_manager = PlayerManager(cfg)
         self.food_manager = FoodCellManager(cfg, self.player_manager)
 
-        self.generations = 10
+        self.training_cfg = cfg.training
+        self.generations = self.training_cfg.generations
+        self.early_stopping = EarlyStopping.from_settings(self.training_cfg)
 
         self.neat_config = neat.Config(
             neat.DefaultGenome,
@@ -48,15 +118,36 @@ class NeatAI:
             cfg.neat_ai_config_file,
         )
 
-        # Create the NEAT population
-        self.population = neat.Population(self.neat_config)
+        stats = neat.StatisticsReporter()
+        resume = self.training_cfg.resume
+        if resume == "latest":
+            resume = latest_checkpoint(self.training_cfg.checkpoint_dir)
+            if resume is None:
+                raise FileNotFoundError(
+                    f"No checkpoint to resume from in {self.training_cfg.checkpoint_dir!r}"
+                )
+        if resume:
+            # Pick the population, species and statistics back up
+            self.population = restore_population(resume, self.neat_config, stats)
+            print(
+                f"[INFO]\tResuming from {resume} at generation {self.population.generation}"
+            )
+        else:
+            # Create the NEAT population
+            self.population = neat.Population(self.neat_config)
         # Add reporters for output and statistics
         self.population.add_reporter(neat.StdOutReporter(True))
-        stats = neat.StatisticsReporter()
         self.population.add_reporter(stats)
+        self.checkpointer = None
+        if self.training_cfg.checkpoint_interval > 0:
+            self.checkpointer = AsyncCheckpointer(
+                self.training_cfg.checkpoint_dir,
+                self.training_cfg.checkpoint_interval,
+                self.training_cfg.checkpoint_keep,
+                stats,
+            )
+            self.population.add_reporter(self.checkpointer)
 
-        self.nearby_player_limit = 10
-        self.nearby_food_limit = 10
         self.generation_time_limit = 10
         self.start_next_generation = False
 
@@ -66,240 +157,162 @@ class NeatAI:
         #     self.generation_time_limit, self.start_next_generation
         # )
         # self.timer.start()
-        self.winner = self.population.run(self.evaluate_genomes, self.generations)
+        # A resumed run only plays the generations it has left
+        remaining = self.generations - self.population.generation
+        try:
+            if remaining > 0:
+                self.winner = self.population.run(self.evaluate_genomes, remaining)
+        finally:
+            if self.checkpointer is not None:
+                self.checkpointer.close()
 
     def evaluate_genomes(self, genomes, config):
-        with concurrent.futures.ThreadPoolExecutor(max_workers=25) as executor:
-            futures = {
-                executor.submit(
-                    self.evaluate_single_genome, genome_id, genome, config
-                ): (
-                    genome_id,
-                    genome,
-                )
-                for genome_id, genome in genomes
-            }
-
-            for future in concurrent.futures.as_completed(futures):
-                genome_id, genome = futures[future]
-                try:
-                    genome.fitness = future.result()
-                except Exception as e:
-                    print(
-                        f"[INFO]\tAn error occurred while evaluating genome {genome_id}: {e}"
+        """
+        Evaluates a whole generation over a single batch session
+
+        Every genome controls one bot, and up to arena_size of them play at
+        once. The inputs of all bots still running are sent in one message
+        per step and the snapshot that comes back is shared by all of them.
+        A run ends when its bot is eaten or the early stopping policy cuts
+        it, and its slot goes to the next genome waiting.
+        """
+        client = BatchClient()
+        client.connect()
+        waiting = list(genomes)
+        arena_size = self.training_cfg.arena_size or len(waiting)
+        self.early_stopping.start_generation()
+        runs = {}
+
+        # limit the steps to the configured fps
+        period = 1 / self.cfg.fps
+        next_step = time.perf_counter()
+        while runs or waiting:
+            free = arena_size - len(runs)
+            if waiting and free > 0:
+                starting, waiting = waiting[:free], waiting[free:]
+                ids = client.register(len(starting), prefix="bot")
+                if not ids and not runs:
+                    raise RuntimeError(
+                        f"The server registered none of {len(starting)} bots"
+                    )
+                # The server caps the bots it adds, the rest wait for a free slot
+                waiting = starting[len(ids) :] + waiting
+                for player_id, (genome_id, genome) in zip(ids, starting):
+                    runs[player_id] = GenomeRun(
+                        genome_id,
+                        genome,
+                        neat.nn.FeedForwardNetwork.create(genome, config),
                     )
+            now = time.perf_counter()
+            if next_step > now:
+                time.sleep(next_step - now)
+            next_step = max(next_step + period, now)
+            inputs = {}
+            present = [i for i in runs if i in self.player_manager.players]
+            if present:
+                for player_id, row in zip(present, self.get_inputs(present).tolist()):
+                    # Get the output of the neural network
+                    output = runs[player_id].net.activate(row)
+                    # The server moves the player along the chosen direction
+                    inputs[player_id] = self.get_next_direction(output)
+
+            (
+                self.food_manager.food_cells,
+                self.player_manager.players,
+                _,
+            ) = client.step(inputs)
+
+            eaten = [
+                run.update(self.player_manager.players.get(player_id))
+                or self.start_next_generation
+                for player_id, run in runs.items()
+            ]
+            reasons = self.early_stopping.judge(
+                [run.steps for run in runs.values()],
+                [run.fitness() for run in runs.values()],
+                [run.idle_steps for run in runs.values()],
+            )
+            finished = [
+                player_id
+                for player_id, is_eaten, reason in zip(runs, eaten, reasons)
+                if is_eaten or reason is not None
+            ]
+            for player_id in finished:
+                run = runs.pop(player_id)
+                run.genome.fitness = run.fitness()
+                print(f"bot_{run.genome_id} : {run.genome.fitness:.2f}")
+            if finished:
+                client.unregister(finished)
+
+        print(f"[INFO]\tRuns cut early: {self.early_stopping.summary()}")
         # Restart server
-        self.restart_server()
+        self.restart_server(client)
+        client.disconnect()
         print("[INFO]\tGeneration complete")
 
-    # def evaluate_genomes(self, genomes, config):
-    #     for genome_id, genome in genomes:
-    #         genome.fitness = self.evaluate_single_genome(genome_id, genome, config)
-
-    def evaluate_single_genome(self, genome_id, genome, config):
-        name = f"bot_{genome_id}"
-        net = neat.nn.FeedForwardNetwork.create(genome, config)
-
-        # Metric weights
-        score_weight = 0.5
-        distance_weight = 0.2
-        exploration_weight = 0.3
-
-        # start by connecting to the network
-        client = Client()
-        current_id = client.connect(name)
-        self.food_manager.food_cells, self.player_manager.players = client.send("get")
-        # setup the clock, limit to 30fps
-        clock = pygame.time.Clock()
-        movement_threshold = 0.2  # Change this value according to your game's scale
-        total_distance_travelled = 0
-        last_position = (
-            self.player_manager.players[current_id].position.x,
-            self.player_manager.players[current_id].position.y,
-        )
-        start_time = time.time()
-        last_move_time = time.time()
-        while True:
-            player = self.player_manager.players[current_id]
-            distance_moved = 0
-            time_since_last_move = time.time() - last_move_time
-
-            clock.tick(self.cfg.fps)
-            # print(
-            #     f"{name} : {player.position.get()} : {player.score} : {time_since_last_move:.2f}"
-            # )
-
-            # Create a list called foods_data to contain the euclidean distances of the foods
-            nearby_food_distances = self.get_nearby_food(current_id)
-            nearby_player_distances = self.get_nearby_players(current_id)
-
-            # Create input data for the neural network
-            input_data = (
-                self.player_manager.players[current_id].position.x,
-                self.player_manager.players[current_id].position.y,
-                *nearby_food_distances,
-                *nearby_player_distances,
-            )
-
-            # Calculate the velocity of the player
-            vel = (
-                self.player_cfg.start_velocity
-                - self.player_manager.players[current_id].score / 14
-            )
-            if vel <= self.player_cfg.min_velocity:
-                vel = self.player_cfg.min_velocity
-
-            # Get the output of the neural network
-            output = net.activate(input_data)
-
-            # Get the next move of the player
-            self.player_manager.players[current_id] = self.get_next_move(
-                output, self.player_manager.players[current_id], vel
-            )
-
-            # Create the next move command
-            x, y = (
-                self.player_manager.players[current_id].position.x,
-                self.player_manager.players[current_id].position.y,
-            )
-            next_move = f"move {x} {y}"
+    def get_inputs(self, player_ids):
+        """
+        Builds the inputs of the neural networks for some players in one batch
 
-            # send next_move to server and recieve back all players information
-            self.food_manager.food_cells, self.player_manager.players = client.send(
-                next_move
-            )
+        The features are the ones the server's neat agents see, so a genome
+        trained here plays the same when hosted with "server.agents=neat:...".
 
-            current_position = (
-                self.player_manager.players[current_id].position.x,
-                self.player_manager.players[current_id].position.y,
-            )
+        Parameters:
+            player_ids (list): The ids of the players
 
-            if current_position != last_position:
-                distance_moved = calculate_distance(
-                    current_position[0],
-                    current_position[1],
-                    *last_position,
-                )
+        Returns:
+            np.ndarray: One row per player: its position followed by the nearby
+            food and player distances, see common.agents.Observations.features
+        """
+        food_xy = np.array(
+            [(cell.x, cell.y) for cell in self.food_manager.food_cells], dtype=float
+        ).reshape(-1, 2)
+        observations = Observations(player_ids, self.player_manager.players, food_xy)
+        return observations.features(np.arange(len(player_ids)))
 
-                if distance_moved > movement_threshold:
-                    total_distance_travelled += distance_moved
-                    last_position = current_position
-                    last_move_time = time.time()
-
-            if time_since_last_move >= 2.5 or self.start_next_generation:
-                exploration_score = (time.time() - start_time) * exploration_weight
-                distance_score = total_distance_travelled * distance_weight
-                score_score = (
-                    self.player_manager.players[current_id].score
-                ) * score_weight
-                fitness_score = (exploration_score + distance_score + score_score) / 100
-                print(f"{name} : {fitness_score:.2f}")
-                # You can return a default fitness score or a penalty
-                return fitness_score
-
-    def get_next_move(self, output, player, vel):
+    def get_next_direction(self, output):
         """
-        Gets the next move of the player based on the output of the neural network
+        Gets the direction the player should move in based on the output of the neural network
+
+        Speed and bounds are applied by the server when it integrates the move.
 
         Parameters:
             output (list): The output of the neural network
-            player (Player): The player instance whose next move is to be determined
-            vel (int): The velocity of the player
+
+        Returns:
+            tuple: The (dx, dy) direction, (0, 0) for no movement
         """
         max_index = output.index(max(output))
-        x, y = player.position.x, player.position.y
 
         move_directions = {
-            "left": (-vel, 0),
-            "right": (vel, 0),
-            "up": (0, -vel),
-            "down": (0, vel),
-            "up-left": (-vel, -vel),
-            "up-right": (vel, -vel),
-            "down-left": (-vel, vel),
-            "down-right": (vel, vel),
+            "left": (-1, 0),
+            "right": (1, 0),
+            "up": (0, -1),
+            "down": (0, 1),
+            "up-left": (-1, -1),
+            "up-right": (1, -1),
+            "down-left": (-1, 1),
+            "down-right": (1, 1),
         }
 
-        move = move_directions.get(directions[max_index])
-
-        if move:
-            new_x = round(x + move[0])
-            new_y = round(y + move[1])
-
-            if (
-                0 <= new_x - player.radius - player.score <= self.cfg.width
-                and 0 <= new_y - player.radius - player.score <= self.cfg.height
-            ):
-                player.position.x = new_x
-                player.position.y = new_y
-
-        return player
-
-    def get_nearby_players(self, current_id):
-        nearby_player_distances = []
-        current_player = self.player_manager.players[current_id]
-
-        for player_id, player in self.player_manager.players.items():
-            if player_id == current_id:
-                continue
-
-            distance = calculate_distance(
-                player.position.x,
-                player.position.y,
-                current_player.position.x,
-                current_player.position.y,
-            )
-
-            if distance < 100:
-                # Normalize the distance and append to the list
-                nearby_player_distances.append(distance / 100)
-
-        # Fill the rest with 0s if there are less than 10 players
-        num_players = len(nearby_player_distances)
-        if num_players < self.nearby_player_limit:
-            nearby_player_distances.extend(
-                [0] * (self.nearby_player_limit - num_players)
-            )
-
-        return nearby_player_distances[: self.nearby_player_limit]
-
-    def get_nearby_food(self, current_id):
-        current_player = self.player_manager.players[current_id]
-        nearby_food_distances = []
-
-        for food_cell in self.food_manager.food_cells:
-            distance = calculate_distance(
-                current_player.position.x,
-                current_player.position.y,
-                food_cell.position.x,
-                food_cell.position.y,
-            )
-
-            if distance < 100:
-                normalized_distance = distance / 100
-                nearby_food_distances.append(normalized_distance)
+        return move_directions.get(directions[max_index], (0, 0))
 
-        if len(nearby_food_distances) < self.nearby_food_limit:
-            remaining_length = self.nearby_food_limit - len(nearby_food_distances)
-            nearby_food_distances.extend([0] * remaining_length)
-        else:
-            nearby_food_distances = nearby_food_distances[: self.nearby_food_limit]
-
-        return nearby_food_distances
-
-    def restart_server(self):
-        client = Client()
-        client.connect("controller")
+    def restart_server(self, client):
         client.send("restart")
-        client.disconnect()
 
 
-def preview_game(cfg: DictConfig):
+def preview_game(cfg: Settings):
+    # pygame is only needed to watch, keep it out of headless training
+    with contextlib.redirect_stdout(None):
+        import pygame
+    from common.draw import draw_grid, draw_score, draw_scores, sys_font
+
     global SCREEN, W, H
     W = cfg.width
     H = cfg.height
     # setup pygame window
     SCREEN = pygame.display.set_mode((cfg.width, cfg.height), 1, 16)
+    pygame.display.set_caption("Evolario")
     player_name = "spectator"
     player_manager = PlayerManager(cfg)
     food_manager = FoodCellManager(cfg, player_manager)
@@ -309,7 +322,7 @@ def preview_game(cfg: DictConfig):
 
     clock = pygame.time.Clock()
     # Get current player
-    font = pygame.font.Font(None, 36)
+    font = sys_font(None, 36)
     run = True
     while run:
         # limit the game to 30 frames per second
@@ -318,11 +331,12 @@ def preview_game(cfg: DictConfig):
         # Get current information from server
         response = client.send("get")
         try:
-            food_manager.food_cells, player_manager.players = response
+            food_manager.food_cells, player_manager.players, meta = response
             print("[INFO]\tClient-side connected to server")
         except Exception:
             print("Error: Unexpected response from client.send('get')")
-        food_manager.food_cells, player_manager.players = response
+        food_manager.food_cells, player_manager.players, meta = response
+        leaderboard = meta["leaderboard"]
 
         for event in pygame.event.get():
             # if user hits red x button close window
@@ -340,8 +354,8 @@ def preview_game(cfg: DictConfig):
         draw_grid(SCREEN, cfg)
         food_manager.draw(SCREEN)
         player_manager.draw(SCREEN)
-        draw_score(SCREEN, player_manager.get_top_score())
-        draw_scores(SCREEN, cfg, player_manager)
+        draw_score(SCREEN, leaderboard[0][2] if leaderboard else 0)
+        draw_scores(SCREEN, cfg, leaderboard)
         fps = font.render(f"FPS: {clock.get_fps():.0f}", True, (0, 0, 0))
         fps = SCREEN.blit(fps, (10, 10))
         pygame.display.update()
@@ -351,8 +365,16 @@ def preview_game(cfg: DictConfig):
     quit()
 
 
-@hydra.main(version_base=None, config_path="config", config_name="config")
-def main(cfg: DictConfig) -> None:
+def train(cfg: Settings) -> None:
+    neat_ai = NeatAI(cfg)
+    neat_ai.run()
+
+
+def main(cfg: Settings) -> None:
+    if cfg.training.train or cfg.training.resume:
+        # Train, or pick a checkpointed training run back up, instead of previewing
+        train(cfg)
+        return
     # Run preview game in a separate thread
     preview_game(cfg)
     # with contextlib.suppress(Exception):
@@ -362,4 +384,4 @@ def main(cfg: DictConfig) -> None:
 
 
 if __name__ == "__main__":
-    main()
+    main(load_settings(sys.argv[1:], cache_path=DEFAULT_CACHE))
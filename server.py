@@ -1,3 +1,4 @@
+import atexit
 import math
 import socket
 import threading
@@ -5,32 +6,72 @@ import time
 from _thread import start_new_thread
 
 import _pickle as pickle
-import hydra
-from omegaconf import DictConfig
-from scipy.spatial import cKDTree
+import numpy as np
 
+from common.agents import AgentManager
+from common.broadphase import eat_pairs, resolve_eats
+from common.chunks import ShardedWorld
+from common.codec import RAW, SnapshotEncoder, choose_codec
 from common.food import FoodCellManager
+from common.interest import InterestView
+from common.metrics import ConnectionStats, TickMetrics
+from common.movement import tick_scale
+from common.pacing import SendPacer, set_send_timeout
 from common.player import PlayerManager
-from common.utilities import random_position
+from common.protocol import (
+    BATCH_MAX_FRAME,
+    MAX_REGISTER,
+    MAX_SESSION_BOTS,
+    MOVEMENT_COMMANDS,
+    InputDecoder,
+    coalesce,
+    is_valid,
+    parse_groups,
+    read_handshake,
+)
+from common.rounds import ENDED, ROUND_ENDED, ROUND_RESET, WAITING, RoundManager
+from common.settings import DEFAULT_CACHE, Settings, load_settings
+from common.shm import ShmWorldWriter, cell_xy, flatten
+from common.snapshot import SnapshotBuffer, WorldSnapshot
+from common.transport import (
+    DATAGRAM_COMMANDS,
+    MAX_DATAGRAM,
+    UdpSession,
+    decode_datagram,
+    listen_unix,
+)
 
 
 class ServerConfig:
-    def __init__(self, cfg: DictConfig):
+    def __init__(self, cfg: Settings):
         self.cfg = cfg
         self.hostname = socket.gethostname()
         self.ip = socket.gethostbyname(self.hostname)
         self.port = self.cfg.server.port
         self.buffer_size = self.cfg.server.buffer_size
-        self.round_time = self.cfg.server.round_time * 1000
+        self.round_time = self.cfg.server.round_time
+        self.intermission = self.cfg.server.intermission
         self.w = self.cfg.server.w
         self.h = self.cfg.server.h
+        self.chunk_cols = self.cfg.server.chunk_cols
+        self.chunk_rows = self.cfg.server.chunk_rows
+        self.shm_slots = self.cfg.server.shm_slots
+        self.shm_name = self.cfg.server.shm_name
+        self.shm_players = self.cfg.server.shm_players
+        self.unix_path = self.cfg.server.unix_path
+        self.udp_port = self.cfg.server.udp_port
+        self.interest_budget = self.cfg.server.interest_budget
+        self.send_timeout = self.cfg.server.send_timeout
+        self.max_send_rate = self.cfg.server.max_send_rate
+        self.tick_rate = self.cfg.server.tick_rate
+        self.agents = self.cfg.server.agents
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
 
 class ServerLogic:
     def __init__(
-        self, cfg: DictConfig, p_manager: PlayerManager, f_manager: FoodCellManager
+        self, cfg: Settings, p_manager: PlayerManager, f_manager: FoodCellManager
     ):
         self.cfg = cfg
         self.p_manager = p_manager
@@ -46,6 +87,8 @@ class ServerLogic:
         :param food: a list of food
         :return: None
         """
+        from scipy.spatial import cKDTree
+
         try:
             if len(self.p_manager.players) == 0:
                 return
@@ -54,6 +97,8 @@ class ServerLogic:
             food_tree = cKDTree(food_positions)
             food_dict = {i: cell for i, cell in enumerate(self.f_manager.food_cells)}
 
+            eaten = []
+            credits = {}
             for player, p in self.p_manager.players.items():
                 player_radius = self.cfg.player.radius + p.score
                 # Find food cells within player_radius of the player
@@ -65,9 +110,12 @@ class ServerLogic:
                         index, None
                     )  # Remove the food cell from the dictionary
                     if cell is not None:
-                        self.p_manager.players[player].score += 1
-                        # Remove the food cell from the original list as well
-                        self.f_manager.food_cells.remove(cell)
+                        credits[player] = credits.get(player, 0) + 1
+                        eaten.append(cell)
+            for player, amount in credits.items():
+                self.p_manager.add_score(player, amount)
+            # Remove the eaten cells from the original list in a single pass
+            self.f_manager.remove_many(eaten)
 
         except Exception as e:
             print(e)
@@ -76,42 +124,31 @@ class ServerLogic:
         """
         checks if any of the players have collided with each other
 
-        :param players: a dictionary of players
+        Candidate pairs come from a sweep and prune broad phase. Eat events are
+        resolved in one batch, biggest eater first, and eaten players are
+        removed once the batch is done.
+
         :return: None
         """
-        try:
-            if len(self.p_manager.players) <= 1:
-                return
-            # Build a k-d tree of player positions and a dictionary for fast removal
-            player_positions = [
-                p.position.get() for p in self.p_manager.players.values()
-            ]
-            player_tree = cKDTree(player_positions)
-            player_dict = {
-                player_id: player
-                for player_id, player in self.p_manager.players.items()
-            }
-            for player_id, player in self.p_manager.players.items():
-                if player.eaten:
-                    continue
-                player_radius = player.get_radius()
-                # Find players within player_radius of the current player
-                indices = player_tree.query_ball_point(
-                    (player.position.x, player.position.y), player_radius
-                )
-                for other_player_id in indices:
-                    if other_player_id != player_id:
-                        other_player = player_dict.get(other_player_id)
-                        if other_player:
-                            # Handle the collision between players here
-                            self.handle_player_collision(player_id, other_player_id)
-                            break
-            # Delete the eaten players
-            for player_id, player in self.p_manager.players.items():
-                if player.eaten:
-                    del self.p_manager.players[player_id]
-        except Exception as e:
-            print(e)
+        players = self.p_manager.players
+        if len(players) <= 1:
+            return
+        player_ids = list(players)
+        player_xy, player_radii = self.p_manager.get_positions_and_radii()
+        eaters, victims = eat_pairs(player_xy, player_radii)
+        pairs = zip(
+            [player_ids[i] for i in eaters.tolist()],
+            [player_ids[i] for i in victims.tolist()],
+        )
+        for eater_id, victim_id in resolve_eats(
+            pairs, lambda player_id: players[player_id].get_radius()
+        ):
+            self.handle_player_collision(eater_id, victim_id)
+        # Delete the eaten players once the whole batch has been resolved
+        for player_id in [
+            player_id for player_id, player in players.items() if player.eaten
+        ]:
+            self.p_manager.remove(player_id)
 
     def handle_player_collision(self, player1_id, player2_id):
         """Handles the collision between two players
@@ -119,8 +156,8 @@ class ServerLogic:
         :param player1: The first player
         :param player2: The second player
         """
-        self.p_manager.players[player1_id].score += (
-            self.p_manager.players[player2_id].score // 2
+        self.p_manager.add_score(
+            player1_id, self.p_manager.players[player2_id].score // 2
         )
         # Deal with player 2
         self.p_manager.players[player2_id].eaten = True
@@ -137,25 +174,46 @@ class ServerLogic:
         :param food: existing list of food cells
         :param n: the number of food cells to create
         """
-        for _ in range(n):
-            if len(self.f_manager.food_cells) >= self.cfg.food_quantity:
-                break
-            position = random_position(self.cfg.width, self.cfg.height)
-            self.f_manager.add(position)
+        n = min(n, self.cfg.food_quantity - len(self.f_manager.food_cells))
+        if n > 0:
+            self.f_manager.create_food(n)
 
 
 class Server:
-    def __init__(self, cfg: DictConfig):
+    def __init__(self, cfg: Settings):
         self.cfg = cfg
         self.p_manager = PlayerManager(cfg)
         self.f_manager = FoodCellManager(cfg, self.p_manager)
         self.server_config = ServerConfig(cfg)
         self.server_logic = ServerLogic(cfg, self.p_manager, self.f_manager)
+        self.tick_metrics = TickMetrics()
+        self.world_lock = threading.Lock()
+        self.snapshots = SnapshotBuffer(depth=2)
+        self.sharded_world = None
+        self.shm_writer = None
+        self.shm_subscribers = set()
+        self.udp_socket = None
+        self.udp_sessions: dict[int, UdpSession] = {}
+        self.udp_tokens = {}
+        self.encoder = SnapshotEncoder(
+            cfg.width, cfg.height, cfg.food.food_radius, cfg.player.radius
+        )
+        self.encodings = {}
+        self.interest_views: dict[socket.socket, InterestView] = {}
+        self.agents = AgentManager(cfg, self.p_manager)
+        self.tick = 0
+        self.tick_errors = 0
+        self.tick_scale = 1.0
+        self.connection_stats: dict[str, ConnectionStats] = {}
         self.connections = 0
+        self.disconnects = 0
         self._id = 0
-        self.game_time = "Starting Soon"
-        self.start = False
-        self.start_time = 0
+        self.id_lock = threading.Lock()
+        self.rounds = RoundManager(
+            self.server_config.round_time,
+            self.server_config.intermission,
+            cfg.player.win_score,
+        )
 
     def bind_server(self):
         try:
@@ -182,23 +240,63 @@ class Server:
 
         print("[SERVER] Waiting for connections")
         print("[INFO] Setting up level")
+        cols, rows = self.server_config.chunk_cols, self.server_config.chunk_rows
+        if cols * rows > 1:
+            # Start the chunk workers before any thread is running
+            self.sharded_world = ShardedWorld(self.cfg, cols, rows)
+            atexit.register(self.sharded_world.stop)
+            print(f"[INFO] World split into {cols}x{rows} chunks")
+        if self.server_config.shm_slots > 0:
+            self.shm_writer = ShmWorldWriter(
+                self.server_config.shm_name,
+                self.server_config.shm_slots,
+                # Sharded food can briefly overshoot the quantity
+                2 * self.cfg.food_quantity,
+                self.server_config.shm_players,
+            )
+            atexit.register(self.shm_writer.close)
+            print(
+                f"[INFO] Publishing the world to shared memory {self.shm_writer.name}"
+            )
+        if self.server_config.agents:
+            self.agents.spawn(self.server_config.agents, self.allocate_ids)
+            print(f"[INFO] Hosting {len(self.agents)} agents")
         # start_new_thread(self.check_collisions, ())
         collision_thread = threading.Thread(target=self.check_collisions, args=())
         collision_thread.start()
-        # Keep looping to accept new connections
-        while True:
-            clientsocket, addr = self.server_config.socket.accept()
-            if addr[0] == self.server_config.ip and not self.start:
-                self.start = True
-                self.start_time = time.time()
-                print("[INFO] Game Started")
+        if self.server_config.unix_path:
+            unix_socket = listen_unix(self.server_config.unix_path)
+            threading.Thread(
+                target=self.accept_connections, args=(unix_socket,), daemon=True
+            ).start()
+            print(f"[SERVER] Listening on {self.server_config.unix_path}")
+        if self.server_config.udp_port:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_socket.bind(
+                (self.server_config.hostname, self.server_config.udp_port)
+            )
+            threading.Thread(target=self.receive_datagrams, daemon=True).start()
+            print(
+                f"[SERVER] Receiving inputs on udp port {self.server_config.udp_port}"
+            )
+        self.accept_connections(self.server_config.socket)
+
+        print("[SERVER] Server offline")
 
+    def accept_connections(self, listener):
+        """
+        Keeps accepting clients on a listening socket, TCP or Unix domain
+
+        :param socket listener: the listening socket
+        :return: None
+        """
+        while True:
+            clientsocket, addr = listener.accept()
             self.connections += 1
-            start_new_thread(self.threaded_client, (clientsocket, self._id))
+            start_new_thread(
+                self.threaded_client, (clientsocket, self.allocate_ids(1)[0])
+            )
             # self.threaded_client(clientsocket, self._id)
-            self._id += 1
-
-        print("[SERVER] Server offline")
 
     def check_collisions(self):
         """
@@ -208,25 +306,411 @@ class Server:
         :param food: list
         :return: None
         """
+        last_error_log = -math.inf
+        # The simulation runs at a fixed rate; a late tick moves players further instead
+        period = 1 / self.server_config.tick_rate
+        next_tick = time.perf_counter()
+        last_tick = next_tick - period
         while True:
-            self.server_logic.player_food_collision()
-            self.server_logic.player_collisions()
+            tick_start = time.perf_counter()
+            self.tick_scale = tick_scale(
+                tick_start - last_tick, self.server_config.tick_rate
+            )
+            last_tick = tick_start
+            try:
+                with self.world_lock:
+                    self.run_tick()
+            except Exception as e:
+                # One failing tick is skipped, the simulation goes on for everyone else
+                self.tick_errors += 1
+                # A fault that repeats every tick is logged at most once a second
+                if tick_start - last_error_log >= 1:
+                    last_error_log = tick_start
+                    print(
+                        f"[ERR]\tTick {self.tick} failed: {e!r} ({self.tick_errors} so far)"
+                    )
+            tick_end = time.perf_counter()
+            self.tick_metrics.record(tick_end - tick_start)
+            # Ticks that are behind are not made up in a burst, the schedule restarts
+            next_tick = max(next_tick + period, tick_end)
+            time.sleep(next_tick - tick_end)
+
+    def run_tick(self):
+        """
+        Advances the world by one tick and publishes the result
+
+        Must be called by the simulation thread while holding the world lock.
+
+        :return: None
+        """
+        self.advance_round()
+        if self.rounds.state != ENDED:
+            if len(self.agents):
+                self.agents.step(self.food_positions())
+            self.p_manager.apply_moves()
+            self.p_manager.integrate_movement(self.tick_scale)
+            if self.sharded_world is not None:
+                self.sharded_world.step(self.p_manager, self.f_manager)
+            else:
+                self.server_logic.player_food_collision()
+                self.server_logic.player_collisions()
+
+                # top the food back up following the spawn curve
+                self.f_manager.refill()
+        self.publish_snapshot()
+
+    def food_positions(self):
+        """
+        Fetches the positions of every food cell for the agents to observe
+
+        :return: np.ndarray of shape (n, 2)
+        """
+        food_cells = self.f_manager.food_cells
+        return flatten(food_cells, cell_xy, np.float64, 2 * len(food_cells)).reshape(
+            -1, 2
+        )
+
+    def advance_round(self):
+        """
+        Moves the round lifecycle on by one tick and resets the world when a new round begins
+
+        Must be called by the simulation thread while holding the world lock.
+
+        :return: None
+        """
+        leaderboard = self.p_manager.leaderboard.entries()
+        event = self.rounds.tick(
+            len(self.p_manager.connected), leaderboard[0] if leaderboard else None
+        )
+        if event is None:
+            return
+        if event == ROUND_RESET:
+            self.reset_world()
+        if event == ROUND_ENDED and self.rounds.winner is not None:
+            print(f"[GAME]\t{self.rounds.winner[1]} won round {self.rounds.number}")
+        elif self.rounds.state == WAITING:
+            print(f"[GAME]\tRound {self.rounds.number} waiting for players")
+        else:
+            print(f"[GAME]\tRound {self.rounds.number} {self.rounds.state}")
+
+    def reset_world(self):
+        """
+        Resets the world in place for a new round
 
-            # if the amount of food is less than 150 create more
-            if len(self.f_manager.food_cells) <= self.cfg.food_quantity:
-                self.server_logic.create_food(1)
-            time.sleep(0.001)
+        Connected players keep their ids and respawn with no score. Food cells
+        go back to the pool and are reused once no snapshot refers to them.
+
+        :return: None
+        """
+        self.p_manager.reset()
+        self.f_manager.reset()
+        if self.sharded_world is not None:
+            self.sharded_world.reset()
+        else:
+            self.server_logic.create_food(self.cfg.food_quantity)
+
+    def publish_snapshot(self):
+        """
+        Publishes a frozen copy of the world for client threads to serialize
+
+        Must be called by the simulation thread while holding the world lock.
+
+        :return: None
+        """
+        self.tick += 1
+        snapshot = WorldSnapshot(
+            self.tick,
+            self.f_manager.food_cells,
+            self.p_manager.snapshot(),
+            {
+                "leaderboard": self.p_manager.leaderboard.entries(),
+                "round": self.rounds.meta(),
+            },
+        )
+        self.snapshots.publish(snapshot)
+        if self.shm_writer is not None:
+            self.shm_writer.publish(snapshot)
+        # Cells eaten this tick are no longer in any new snapshot
+        self.f_manager.pool.advance(snapshot)
+
+    def get_stats(self):
+        """
+        Fetches the server metrics that are reported to clients sending "stats"
+
+        :return: dict
+        """
+        stats = self.tick_metrics.summary()
+        stats["tick_errors"] = self.tick_errors
+        stats["connections"] = self.connections
+        stats["disconnects"] = self.disconnects
+        stats["players"] = len(self.p_manager.players)
+        stats["food"] = len(self.f_manager.food_cells)
+        sessions = list(self.udp_sessions.values())
+        stats["udp"] = {
+            "sessions": len(sessions),
+            "received": sum(session.received for session in sessions),
+            "stale": sum(session.stale for session in sessions),
+            "malformed": sum(session.malformed for session in sessions),
+        }
+        stats["agents"] = self.agents.summary()
+        views = list(self.interest_views.values())
+        stats["interest"] = {
+            "views": len(views),
+            "deferred": sum(view.deferred for view in views),
+        }
+        stats["clients"] = {
+            key: connection.summary()
+            for key, connection in list(self.connection_stats.items())
+        }
+        return stats
+
+    def send_payload(self, clientsocket, connection, payload, snapshot=False):
+        """
+        Sends a complete payload to a client and records it in the connection counters
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :param bytes payload: the bytes to send
+        :param bool snapshot: whether the payload is a world snapshot
+        :return: None
+        """
+        start = time.perf_counter()
+        clientsocket.sendall(payload)
+        connection.record_out(len(payload), snapshot)
+        if connection.pacer is not None:
+            connection.pacer.record(
+                clientsocket, len(payload), time.perf_counter() - start
+            )
+
+    def open_connection(self, key, name):
+        """
+        Creates the counters and send pacer of a new connection and lists it in the stats
+
+        :param str key: the key of the connection in the stats
+        :param str name: the name the client connected with
+        :return: ConnectionStats
+        """
+        connection = ConnectionStats(name)
+        connection.pacer = SendPacer(self.server_config.max_send_rate)
+        self.connection_stats[key] = connection
+        return connection
+
+    def handle_ping(self, clientsocket, connection, data):
+        """
+        Echoes a timestamped ping back to the client
+
+        The client sends "ping <timestamp> [<last rtt ms>]" so the round trip
+        measured on the previous ping is reported to the server.
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :param str data: the ping message
+        :return: None
+        """
+        split_data = data.split(" ")
+        if len(split_data) > 2:
+            connection.record_rtt(float(split_data[2]))
+        pong = pickle.dumps(("pong", split_data[1] if len(split_data) > 1 else ""))
+        self.send_payload(clientsocket, connection, pong)
+
+    def snapshot_payload(self, clientsocket, connection, snapshot):
+        """
+        Fetches a snapshot in the encoding the client asked for
+
+        Clients that did not pick an encoding get the one their measured
+        throughput can keep up with.
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :param WorldSnapshot snapshot: the snapshot to send
+        :return: bytes
+        """
+        view = self.interest_views.get(clientsocket)
+        if view is not None:
+            return view.update(snapshot)
+        codec = self.encodings.get(clientsocket)
+        if codec is None:
+            codec = RAW
+            if connection.pacer is not None and connection.pacer.throughput:
+                codec = connection.pacer.codec(len(snapshot.payload()))
+        if codec == RAW:
+            return snapshot.payload()
+        return snapshot.encoded(self.encoder, codec)
+
+    def set_encoding(self, clientsocket, args):
+        """
+        Picks the snapshot encoding of a connection from "<name> [kbit/s]"
+
+        :param socket clientsocket: socket object
+        :param list args: the encoding name and optionally the link speed
+        :return: str, the resolved encoding or None when it is unknown
+        """
+        try:
+            link_kbps = float(args[1]) if len(args) > 1 else None
+            codec = choose_codec(args[0], link_kbps)
+        except (IndexError, ValueError) as e:
+            print(f"[ERR]\tBad encoding {' '.join(args)!r}: {e}")
+            return None
+        self.encodings[clientsocket] = codec
+        return codec
+
+    def handle_encoding(self, clientsocket, connection, command):
+        """
+        Switches the snapshots sent to a client to a compact encoding
+
+        "encoding <raw|packed|zlib|lz4>" picks one directly, and
+        "encoding auto <kbit/s>" picks by the speed of the client's link.
+        The reply is ("encoding", name), with None for an unknown encoding.
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :param str command: the encoding command
+        :return: None
+        """
+        codec = self.set_encoding(clientsocket, command.split(" ")[1:])
+        self.send_payload(clientsocket, connection, pickle.dumps(("encoding", codec)))
+
+    def handle_interest(self, clientsocket, connection, player_id):
+        """
+        Switches a client to level of detail updates around its player
+
+        From then on the client is sent what changed since its previous
+        update instead of whole snapshots, nearest first and within the
+        interest budget. The reply is ("interest", food_radius), which the
+        client needs to rebuild food cells.
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :param int player_id: the player the client observes the world as
+        :return: None
+        """
+        self.interest_views[clientsocket] = InterestView(
+            player_id,
+            self.server_config.interest_budget,
+            centre=(self.cfg.width / 2, self.cfg.height / 2),
+        )
+        reply = pickle.dumps(("interest", self.cfg.food.food_radius))
+        self.send_payload(clientsocket, connection, reply)
+
+    def handle_shm(self, clientsocket, connection):
+        """
+        Subscribes a client to the shared memory ring, if the server publishes one
+
+        Once subscribed, inputs from the client are no longer answered with a
+        snapshot, as the client reads the world from shared memory instead.
+        The reply is ("shm", name), with a name of None when there is no ring.
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :return: None
+        """
+        name = None
+        if self.shm_writer is not None:
+            name = self.shm_writer.name
+            self.shm_subscribers.add(clientsocket)
+        self.send_payload(clientsocket, connection, pickle.dumps(("shm", name)))
+
+    def handle_udp(self, clientsocket, connection, player_id=None, owned=None):
+        """
+        Opens the unreliable input channel for a connection, if the server has one
+
+        The reply is ("udp", host, port, token); the port and token are None
+        when the server does not receive datagrams. Movement commands sent as
+        "<token> <sequence> <command>" datagrams to that port are applied like
+        the ones sent over the connection, unless a newer one arrived first.
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :param int player_id: the player the connection controls
+        :param set owned: ids of the bots registered by a batch session
+        :return: None
+        """
+        reply = ("udp", self.server_config.ip, None, None)
+        if self.udp_socket is not None:
+            self.close_udp(clientsocket)
+            session = UdpSession(player_id, owned)
+            self.udp_sessions[session.token] = session
+            self.udp_tokens[clientsocket] = session.token
+            reply = (
+                "udp",
+                self.server_config.ip,
+                self.server_config.udp_port,
+                session.token,
+            )
+        self.send_payload(clientsocket, connection, pickle.dumps(reply))
+
+    def close_udp(self, clientsocket):
+        """
+        Stops accepting datagrams on behalf of a connection
+
+        :param socket clientsocket: socket object
+        :return: None
+        """
+        token = self.udp_tokens.pop(clientsocket, None)
+        self.udp_sessions.pop(token, None)
+
+    def receive_datagrams(self):
+        """
+        Receives movement commands over UDP and queues them like TCP ones
+
+        Datagrams with an unknown token, an invalid command or a sequence
+        number that is not newer than the last one applied are dropped.
+
+        :return: None
+        """
+        while True:
+            try:
+                data, _ = self.udp_socket.recvfrom(MAX_DATAGRAM)
+            except OSError as e:
+                print(f"[ERR]\tUDP receive failed {e}")
+                break
+            try:
+                token, sequence, command = decode_datagram(data)
+            except (UnicodeDecodeError, ValueError):
+                continue
+            session = self.udp_sessions.get(token)
+            if session is None:
+                continue
+            verb = command.split(" ", 1)[0]
+            if verb not in DATAGRAM_COMMANDS or not is_valid(
+                command, (self.cfg.width, self.cfg.height)
+            ):
+                session.malformed += 1
+                continue
+            if not session.accept(sequence):
+                continue
+            if session.owned is not None:
+                if verb == "inputs":
+                    for player_id, dx, dy in parse_groups(command):
+                        if player_id in session.owned:
+                            self.p_manager.queue_intent(player_id, False, dx, dy)
+            elif verb == "move":
+                self.p_manager.handle_move_command(command, session.player_id)
+            elif verb in ("dir", "target"):
+                self.p_manager.handle_intent_command(command, session.player_id)
 
     def restart_game(self):
-        self.p_manager = PlayerManager(self.cfg)
-        self.f_manager = FoodCellManager(self.cfg, self.p_manager)
-        self.server_logic = ServerLogic(self.cfg, self.p_manager, self.f_manager)
-        self.connections = 0
-        self._id = 0
-        self.game_time = "Starting Soon"
-        self.start = False
-        self.start_time = 0
-        self.server_logic.create_food(self.cfg.food_quantity)
+        """
+        Asks the round manager to start a new round on the next tick
+
+        The world is reset in place by the simulation thread, so the managers
+        other threads hold on to stay valid.
+
+        :return: None
+        """
+        self.rounds.request_restart()
+
+    def allocate_ids(self, n):
+        """
+        Hands out n unused player ids; safe to call from any thread
+
+        :param int n: the number of ids wanted
+        :return: range of ids
+        """
+        with self.id_lock:
+            first = self._id
+            self._id += n
+        return range(first, first + n)
 
     def threaded_client(self, clientsocket, _id):
         """
@@ -238,36 +722,42 @@ class Server:
         """
         try:
             player_id = _id
+            # A client that stops reading must not block its thread forever
+            set_send_timeout(clientsocket, self.server_config.send_timeout)
 
             # Receive a name from the client
-            name = clientsocket.recv(16).decode("utf-8")
+            name = read_handshake(clientsocket)
 
             print(f"[INFO] {name} connected")
-            if name == "spectator":
+            if name.split(" ")[0] == "spectator":
+                # "spectator <encoding> [kbit/s]" asks for compact snapshots
+                if " " in name:
+                    self.set_encoding(clientsocket, name.split(" ")[1:])
                 spectator_thread = threading.Thread(
                     target=self.threaded_spectator, args=(clientsocket,)
                 )
                 spectator_thread.start()
                 return
+            if name == "batch":
+                self.threaded_batch(clientsocket)
+                return
+            if name == "stats":
+                self.threaded_stats(clientsocket)
+                return
             # Setup properties for each new player
-            self.p_manager.add(player_id, name)
+            with self.world_lock:
+                self.p_manager.add(player_id, name)
+            # Only hand out the id once the player is part of a published snapshot
+            self.snapshots.wait_for(
+                lambda snapshot: player_id in snapshot.players, timeout=1
+            )
 
             # pickle data and send initial info to clients
             clientsocket.send(str.encode(str(player_id)))
-            self.start = True
 
-            # Create a separate thread for receiving data from the client
-            recv_thread = threading.Thread(
-                target=self.receive_data, args=(clientsocket, player_id, name)
-            )
-            recv_thread.start()
-            while True:
-                if self.start:
-                    game_time = round(time.time() - self.start_time)
-                    # if the game time passes the round time the game will stop
-                    if game_time >= self.server_config.round_time:
-                        self.start = False
-                time.sleep(0.001)
+            # This thread now serves the client until it disconnects
+            connection = self.open_connection(str(player_id), name)
+            self.receive_data(clientsocket, player_id, name, connection)
 
         except Exception as e:
             print(f"[ERR]\t{e}")
@@ -279,18 +769,243 @@ class Server:
         try:
             # pickle data and send initial info to clients
             clientsocket.send(str.encode(str(self._id)))
-            self.send_data(clientsocket)
+            key = f"spectator-{id(clientsocket)}"
+            connection = self.open_connection(key, "spectator")
+            self.send_data(clientsocket, connection)
+            del self.connection_stats[key]
+            self.encodings.pop(clientsocket, None)
             quit()
         except Exception as e:
             print(f"[ERR]\t{e}")
 
-    def receive_data(self, clientsocket, player_id, name):
+    def threaded_stats(self, clientsocket):
+        """
+        Serves a stats probe, a connection that only ever asks for "stats"
+
+        The probe gets no player, so measuring the server does not change
+        the world being measured, and it is not counted as a connection.
+
+        :param socket clientsocket: socket object
+        :return: None
+        """
+        decoder = InputDecoder()
+        try:
+            # The probe has no player of its own
+            clientsocket.send(str.encode("-1"))
+            while True:
+                data = clientsocket.recv(self.server_config.buffer_size)
+                if len(data) == 0:
+                    break
+                for command in decoder.feed(data):
+                    if command == "stats":
+                        clientsocket.sendall(pickle.dumps(self.get_stats()))
+        except Exception as e:
+            print(f"[ERR]\tStats probe disconnected {e}")
+        self.connections -= 1
+        clientsocket.close()
+
+    def threaded_batch(self, clientsocket):
+        """
+        Serves a batch session, one connection that controls many bots
+
+        The session registers bots with "register <count> <prefix>", sends
+        the inputs of all of them in one "inputs <id> <dx> <dy> ..." frame per
+        tick and receives one shared snapshot in reply. Its bots are removed
+        when the session disconnects.
+
+        :param socket clientsocket: socket object
+        :return: None
+        """
+        key = f"batch-{id(clientsocket)}"
+        connection = self.open_connection(key, "batch")
+        owned = set()
+        decoder = InputDecoder(max_frame=BATCH_MAX_FRAME)
+        try:
+            # The session has no player of its own
+            clientsocket.send(str.encode("-1"))
+            while True:
+                data = clientsocket.recv(BATCH_MAX_FRAME)
+                if len(data) == 0:
+                    break
+                commands = decoder.feed(data)
+                connection.record_in(len(data), len(commands))
+                connection.malformed = decoder.malformed
+                if commands:
+                    self.handle_batch_commands(
+                        clientsocket, connection, owned, commands
+                    )
+        except Exception as e:
+            print(f"[ERR]\tBatch session disconnected {e}")
+
+        print(f"[INFO] batch session with {len(owned)} bots disconnected")
+        self.connections -= 1
+        self.disconnects += 1
+        self.connection_stats.pop(key, None)
+        self.shm_subscribers.discard(clientsocket)
+        self.close_udp(clientsocket)
+        self.encodings.pop(clientsocket, None)
+        with self.world_lock:
+            for player_id in owned:
+                self.p_manager.disconnect(player_id)
+        clientsocket.close()
+
+    def handle_batch_commands(self, clientsocket, connection, owned, commands):
+        """
+        Handles one batch of decoded commands from a batch session
+
+        "register" and "unregister" are answered with the affected ids,
+        "stats" and "ping" on their own, and everything else with a single
+        snapshot once the whole batch has been applied. Inputs for bots the
+        session does not own are ignored.
+
+        :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
+        :param set owned: ids of the bots registered by this session
+        :param list commands: decoded commands in the order they arrived
+        :return: None
+        """
+        reply = False
+        version = None
+        subscribed = clientsocket in self.shm_subscribers
+        for command in commands:
+            verb = command.split(" ", 1)[0]
+            if verb == "register":
+                # Requests beyond the command and session caps are granted in part
+                allowance = min(MAX_REGISTER, MAX_SESSION_BOTS - len(owned))
+                bots = []
+                for count, prefix in parse_groups(command):
+                    count = min(max(count, 0), allowance - len(bots))
+                    bots.extend(
+                        (player_id, f"{prefix}_{player_id}")
+                        for player_id in self.allocate_ids(count)
+                    )
+                with self.world_lock:
+                    self.p_manager.add_many(bots)
+                ids = [player_id for player_id, _ in bots]
+                owned.update(ids)
+                # Only hand out the ids once the bots are part of a published snapshot
+                self.snapshots.wait_for(
+                    lambda snapshot: all(i in snapshot.players for i in ids),
+                    timeout=1,
+                )
+                registered = pickle.dumps(("registered", ids))
+                self.send_payload(clientsocket, connection, registered)
+            elif verb == "unregister":
+                ids = [player_id for (player_id,) in parse_groups(command)]
+                with self.world_lock:
+                    for player_id in ids:
+                        if player_id in owned:
+                            self.p_manager.disconnect(player_id)
+                owned.difference_update(ids)
+                unregistered = pickle.dumps(("unregistered", ids))
+                self.send_payload(clientsocket, connection, unregistered)
+            elif verb == "stats":
+                self.send_payload(
+                    clientsocket, connection, pickle.dumps(self.get_stats())
+                )
+            elif verb == "ping":
+                self.handle_ping(clientsocket, connection, command)
+            elif verb == "shm":
+                self.handle_shm(clientsocket, connection)
+                subscribed = clientsocket in self.shm_subscribers
+            elif verb == "udp":
+                self.handle_udp(clientsocket, connection, owned=owned)
+            elif verb == "encoding":
+                self.handle_encoding(clientsocket, connection, command)
+            else:
+                # Sessions reading the shared memory ring only send inputs
+                reply = reply or verb != "inputs" or not subscribed
+                if verb == "inputs":
+                    version = self.snapshots.latest().version
+                    for player_id, dx, dy in parse_groups(command):
+                        if player_id in owned:
+                            self.p_manager.queue_intent(player_id, False, dx, dy)
+                elif verb == "restart":
+                    self.restart_game()
+
+        if not reply:
+            return
+        if version is not None:
+            # Reply with the first snapshot that includes these inputs
+            self.snapshots.wait_for_newer(version, timeout=0.05)
+        send_data = self.snapshot_payload(
+            clientsocket, connection, self.snapshots.latest()
+        )
+        self.send_payload(clientsocket, connection, send_data, snapshot=True)
+
+    def handle_commands(self, clientsocket, player_id, connection, commands):
+        """
+        Handles one batch of decoded commands from a client
+
+        Redundant movement commands are coalesced to the latest one. "stats"
+        and "ping" are answered on their own; everything else is answered
+        with a single snapshot once the whole batch has been applied.
+
+        :param socket clientsocket: socket object
+        :param int player_id: id of the player
+        :param ConnectionStats connection: counters of the connection
+        :param list commands: decoded commands in the order they arrived
+        :return: None
+        """
+        reply = False
+        version = None
+        subscribed = clientsocket in self.shm_subscribers
+        for command in coalesce(commands):
+            verb = command.split(" ", 1)[0]
+            if verb == "stats":
+                self.send_payload(
+                    clientsocket, connection, pickle.dumps(self.get_stats())
+                )
+                continue
+            if verb == "ping":
+                self.handle_ping(clientsocket, connection, command)
+                continue
+            if verb == "shm":
+                self.handle_shm(clientsocket, connection)
+                subscribed = clientsocket in self.shm_subscribers
+                continue
+            if verb == "udp":
+                self.handle_udp(clientsocket, connection, player_id=player_id)
+                continue
+            if verb == "encoding":
+                self.handle_encoding(clientsocket, connection, command)
+                continue
+            if verb == "interest":
+                self.handle_interest(clientsocket, connection, player_id)
+                continue
+            # Clients reading the shared memory ring only send inputs
+            reply = reply or verb not in MOVEMENT_COMMANDS or not subscribed
+            if verb == "restart":
+                self.restart_game()
+            elif verb == "move":
+                version = self.snapshots.latest().version
+                self.p_manager.handle_move_command(command, player_id)
+            elif verb in ("dir", "target"):
+                version = self.snapshots.latest().version
+                self.p_manager.handle_intent_command(command, player_id)
+
+        if not reply:
+            return
+        if version is not None:
+            # Reply with the first snapshot that includes this input
+            self.snapshots.wait_for_newer(version, timeout=0.05)
+        send_data = self.snapshot_payload(
+            clientsocket, connection, self.snapshots.latest()
+        )
+        self.send_payload(clientsocket, connection, send_data, snapshot=True)
+
+    def receive_data(self, clientsocket, player_id, name, connection):
         """
         Receives data from the client and sends data to the client
 
         :param socket clientsocket: socket object
         :param int player_id: id of the player
+        :param ConnectionStats connection: counters of the connection
         """
+        decoder = InputDecoder(
+            max_frame=self.server_config.buffer_size,
+            bounds=(self.cfg.width, self.cfg.height),
+        )
         while True:
             try:
                 # Receive data from client
@@ -299,21 +1014,12 @@ class Server:
                 if len(data) == 0:
                     break
 
-                data = data.decode("utf-8")
-                if data.split(" ")[0] == "restart":
-                    self.restart_game()
-                if data.split(" ")[0] == "move":
-                    self.p_manager.handle_move_command(data, player_id)
-
-                    # self.server_logic.player_food_collision()
-                    # self.server_logic.player_collisions()
-
-                    # # if the amount of food is less than 150 create more
-                    # if len(self.f_manager.food_cells) <= self.cfg.food_quantity:
-                    #     self.server_logic.create_food(1)
-                data_to_send = (self.f_manager.food_cells, self.p_manager.players)
-                send_data = pickle.dumps(data_to_send)
-                clientsocket.send(send_data)
+                # A single recv may hold several commands or only part of one
+                commands = decoder.feed(data)
+                connection.record_in(len(data), len(commands))
+                connection.malformed = decoder.malformed
+                if commands:
+                    self.handle_commands(clientsocket, player_id, connection, commands)
 
             except Exception as e:
                 print(f"[ERR]\tDisconnected {e}")
@@ -322,36 +1028,59 @@ class Server:
         print(f"[INFO] {name}\tdisconnected")
 
         self.connections -= 1
+        self.disconnects += 1
+        self.connection_stats.pop(str(player_id), None)
+        self.shm_subscribers.discard(clientsocket)
+        self.close_udp(clientsocket)
+        self.encodings.pop(clientsocket, None)
+        self.interest_views.pop(clientsocket, None)
         # remove client information from players list
-        self.p_manager.remove(player_id)
+        with self.world_lock:
+            self.p_manager.disconnect(player_id)
         # Close the connection using a context manager
         clientsocket.close()
 
     # Create function that just sends player and food data to client
-    def send_data(self, clientsocket):
+    def send_data(self, clientsocket, connection):
         """
         Sends data to the client
 
         :param socket clientsocket: socket object
+        :param ConnectionStats connection: counters of the connection
         """
+        version = 0
+        pacer = connection.pacer
         while True:
             try:
-                data_to_send = (self.f_manager.food_cells, self.p_manager.players)
-                send_data = pickle.dumps(data_to_send)
-                clientsocket.send(send_data)
+                # Each snapshot is sent at most once, as soon as it is published
+                snapshot = self.snapshots.wait_for_newer(version, timeout=1)
+                if snapshot.version == version:
+                    continue
+                if not pacer.ready(clientsocket):
+                    if pacer.stalled(self.server_config.send_timeout):
+                        raise TimeoutError("the client stopped reading")
+                    # Snapshots published while waiting are skipped, the newest one goes out
+                    time.sleep(min(max(pacer.wait(), 0.001), 0.05))
+                    continue
+                if version:
+                    pacer.skipped += snapshot.version - version - 1
+                version = snapshot.version
+                send_data = self.snapshot_payload(clientsocket, connection, snapshot)
+                self.send_payload(clientsocket, connection, send_data, snapshot=True)
             except Exception as e:
                 print(f"[ERR]\tDisconnected {e}")
                 break
-            time.sleep(0.001)
 
 
-@hydra.main(version_base=None, config_path="config", config_name="config")
-def main(cfg: DictConfig) -> None:
+def main(cfg: Settings) -> None:
     server = Server(cfg)
     server.start_server()
 
 
-import cProfile
-
 if __name__ == "__main__":
-    cProfile.run("main()")
+    import cProfile
+    import sys
+
+    # Command line arguments are dotted overrides, e.g. server.port=6000
+    cfg = load_settings(sys.argv[1:], cache_path=DEFAULT_CACHE)
+    cProfile.run("main(cfg)")
@@ -0,0 +1,109 @@
+import dataclasses
+import math
+import pickle
+
+import neat
+import numpy as np
+import pytest
+
+from common.agents import (
+    FEATURES,
+    NEARBY_LIMIT,
+    VIEW_DISTANCE,
+    NeatPolicy,
+    Observations,
+    parse_agents,
+)
+from common.player import PlayerManager
+from common.settings import ROOT, load_settings
+
+
+def reference_features(player_id, players, food_xy):
+    """The features of one agent, built with plain loops."""
+    me = players[player_id].position
+
+    def nearby(points):
+        distances = sorted(math.hypot(x - me.x, y - me.y) for x, y in points)
+        distances = [d / VIEW_DISTANCE for d in distances if d <= VIEW_DISTANCE]
+        distances = distances[:NEARBY_LIMIT]
+        return distances + [0] * (NEARBY_LIMIT - len(distances))
+
+    others = [
+        (player.position.x, player.position.y)
+        for other_id, player in players.items()
+        if other_id != player_id
+    ]
+    return [me.x, me.y, *nearby(food_xy.tolist()), *nearby(others)]
+
+
+def test_features_match_a_reference_loop():
+    rng = np.random.default_rng(3)
+    manager = PlayerManager(load_settings())
+    manager.add_many([(i, f"p{i}") for i in range(30)])
+    for player in manager.players.values():
+        player.position.x, player.position.y = rng.uniform(0, 300, 2).tolist()
+    food_xy = rng.uniform(0, 300, (200, 2))
+    agent_ids = [4, 17, 0]
+
+    features = Observations(agent_ids, manager.players, food_xy).features(
+        np.arange(len(agent_ids))
+    )
+    assert features.shape == (len(agent_ids), FEATURES)
+    for row, player_id in zip(features, agent_ids):
+        np.testing.assert_allclose(
+            row, reference_features(player_id, manager.players, food_xy)
+        )
+
+
+def test_features_without_food_or_neighbours_are_zero():
+    manager = PlayerManager(load_settings())
+    manager.add(1, "alone")
+    features = Observations([1], manager.players, np.empty((0, 2))).features(
+        np.arange(1)
+    )
+    assert features[0, 2:].tolist() == [0] * (2 * NEARBY_LIMIT)
+
+
+def test_parse_agents():
+    assert parse_agents("seek:2, neat:1:winner.pkl") == [
+        ("seek", 2, None),
+        ("neat", 1, "winner.pkl"),
+    ]
+    with pytest.raises(ValueError):
+        parse_agents("seek:many")
+
+
+def make_genome(tmp_path, num_inputs):
+    with open(f"{ROOT}/config-feedforward.txt", encoding="utf-8") as file:
+        text = file.read().replace("num_inputs = 22", f"num_inputs = {num_inputs}")
+    config_path = tmp_path / "config.txt"
+    config_path.write_text(text)
+    neat_config = neat.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        str(config_path),
+    )
+    genome = next(iter(neat.Population(neat_config).population.values()))
+    genome_path = tmp_path / "genome.pkl"
+    genome_path.write_bytes(pickle.dumps(genome))
+    cfg = dataclasses.replace(load_settings(), neat_ai_config_file=str(config_path))
+    return cfg, str(genome_path)
+
+
+def test_neat_policy_accepts_genomes_built_for_the_observations(tmp_path):
+    cfg, path = make_genome(tmp_path, FEATURES)
+    policy = NeatPolicy(cfg, path)
+    manager = PlayerManager(cfg)
+    manager.add_many([(1, "a"), (2, "b")])
+    targets, moves = policy.act(
+        Observations([1, 2], manager.players, np.empty((0, 2))), np.arange(2)
+    )
+    assert moves.shape == (2, 2) and not targets.any()
+
+
+def test_neat_policy_rejects_genomes_with_other_inputs(tmp_path):
+    cfg, path = make_genome(tmp_path, FEATURES - 2)
+    with pytest.raises(ValueError, match="inputs"):
+        NeatPolicy(cfg, path)
@@ -0,0 +1,77 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from common.broadphase import eat_pairs, overlapping_pairs, resolve_eats
+
+
+def brute_force_overlaps(xy, radii):
+    return {
+        (i, j)
+        for i, j in itertools.combinations(range(len(radii)), 2)
+        if abs(xy[i][0] - xy[j][0]) <= radii[i] + radii[j]
+        and abs(xy[i][1] - xy[j][1]) <= radii[i] + radii[j]
+    }
+
+
+def brute_force_eats(xy, radii):
+    pairs = set()
+    for i, j in itertools.permutations(range(len(radii)), 2):
+        distance = math.hypot(xy[i][0] - xy[j][0], xy[i][1] - xy[j][1])
+        if radii[i] > radii[j] and distance < radii[i]:
+            pairs.add((i, j))
+    return pairs
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_pairs_match_a_brute_force_search(seed):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, 300, (120, 2))
+    # Widely varying radii, with plenty of equal ones
+    radii = rng.choice([6.0, 6.0, 12.0, 40.0, 90.0], 120)
+
+    i, j = overlapping_pairs(xy, radii)
+    found = {tuple(sorted(pair)) for pair in zip(i.tolist(), j.tolist())}
+    assert len(found) == len(i)
+    assert found == brute_force_overlaps(xy.tolist(), radii.tolist())
+
+    eater, victim = eat_pairs(xy, radii)
+    assert set(zip(eater.tolist(), victim.tolist())) == brute_force_eats(
+        xy.tolist(), radii.tolist()
+    )
+
+
+@pytest.mark.parametrize("n", [0, 1])
+def test_fewer_than_two_circles_have_no_pairs(n):
+    i, j = overlapping_pairs(np.zeros((n, 2)), np.ones(n))
+    assert len(i) == len(j) == 0
+
+
+def test_equal_players_do_not_eat_each_other():
+    eater, victim = eat_pairs([(0, 0), (1, 0)], [10, 10])
+    assert len(eater) == 0
+
+
+def test_resolve_eats_lets_the_biggest_eat_first():
+    radii = {"whale": 50, "shark": 20, "fish": 10, "krill": 5}
+    pairs = [
+        ("fish", "krill"),
+        ("shark", "fish"),
+        ("whale", "shark"),
+        ("whale", "fish"),
+    ]
+    accepted = resolve_eats(pairs, radii.get)
+    # The whale eats the shark first; the shark is gone before it can eat
+    assert accepted == [("whale", "shark"), ("whale", "fish")]
+
+
+def test_resolve_eats_does_not_depend_on_the_input_order():
+    radii = {1: 30, 2: 30, 3: 10, 4: 8}
+    pairs = [(1, 3), (2, 3), (2, 4), (3, 4)]
+    results = {
+        tuple(resolve_eats(permutation, radii.get))
+        for permutation in itertools.permutations(pairs)
+    }
+    assert results == {((1, 3), (2, 4))}
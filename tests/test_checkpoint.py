@@ -0,0 +1,132 @@
+import importlib.util
+import os
+import pickle
+import random
+
+import neat
+import pytest
+
+from common.checkpoint import (
+    HEADER,
+    MAGIC,
+    VERSION,
+    AsyncCheckpointer,
+    CheckpointError,
+    checkpoint_path,
+    decode,
+    encode,
+    latest_checkpoint,
+    list_checkpoints,
+    restore_population,
+)
+from common.settings import ROOT, load_settings
+
+
+@pytest.fixture
+def neat_config(tmp_path):
+    # A small population keeps speciation quick
+    with open(os.path.join(ROOT, "config-feedforward.txt"), encoding="utf-8") as file:
+        text = file.read().replace("pop_size = 100", "pop_size = 20")
+    path = tmp_path / "config.txt"
+    path.write_text(text)
+    return neat.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        str(path),
+    )
+
+
+def test_encode_decode_round_trip():
+    state = {"generation": 3, "values": list(range(100))}
+    data = encode(pickle.dumps(state))
+    assert data[: len(MAGIC)] == MAGIC
+    assert decode(data) == state
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"EVO",
+        HEADER.pack(b"NOTCKPT", VERSION) + b"x",
+        HEADER.pack(MAGIC, VERSION + 1) + b"x",
+    ],
+)
+def test_decode_rejects_foreign_and_newer_files(data):
+    with pytest.raises(CheckpointError):
+        decode(data)
+
+
+def test_listing_ignores_other_files_and_orders_by_generation(tmp_path):
+    for generation in (10, 2, 7):
+        open(checkpoint_path(tmp_path, generation), "wb").close()
+    (tmp_path / "notes.txt").write_text("")
+    (tmp_path / "neat-checkpoint-00003.ckpt.tmp").write_text("")
+    assert [g for g, _ in list_checkpoints(tmp_path)] == [2, 7, 10]
+    assert latest_checkpoint(tmp_path) == checkpoint_path(tmp_path, 10)
+    assert latest_checkpoint(tmp_path / "missing") is None
+
+
+def run_generation(population, checkpointer, generation):
+    """Plays one generation the way neat.Population.run reports it."""
+    checkpointer.start_generation(generation)
+    for genome in population.population.values():
+        genome.fitness = random.random()
+    population.population = population.reproduction.reproduce(
+        population.config,
+        population.species,
+        population.config.pop_size,
+        generation,
+    )
+    population.species.speciate(
+        population.config, population.population, generation + 1
+    )
+    checkpointer.end_generation(
+        population.config, population.population, population.species
+    )
+
+
+def test_checkpoints_rotate_and_restore(tmp_path, neat_config):
+    random.seed(1)
+    population = neat.Population(neat_config)
+    directory = tmp_path / "checkpoints"
+    checkpointer = AsyncCheckpointer(directory, interval=2, keep=2)
+    try:
+        for generation in range(6):
+            run_generation(population, checkpointer, generation)
+        checkpointer.flush()
+    finally:
+        checkpointer.close()
+
+    # Generations 2, 4 and 6 were saved, the oldest was rotated away
+    assert [g for g, _ in list_checkpoints(directory)] == [4, 6]
+    assert checkpointer.written == 3
+    assert not list(directory.glob("*.tmp"))
+
+    # Nothing drew a random number since the last checkpoint was taken
+    expected = random.random()
+    random.seed(0)
+    restored = restore_population(latest_checkpoint(directory), neat_config)
+    assert random.random() == expected
+    assert restored.generation == 6
+    assert sorted(restored.population) == sorted(population.population)
+    assert set(restored.species.species) == set(population.species.species)
+
+
+def test_resuming_the_latest_checkpoint_without_one_fails(tmp_path):
+    spec = importlib.util.spec_from_file_location(
+        "neat_ai", os.path.join(ROOT, "neat-ai.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    cfg = load_settings(
+        [
+            "training.resume=latest",
+            f"training.checkpoint_dir={tmp_path}",
+            f"neat_ai_config_file={os.path.join(ROOT, 'config-feedforward.txt')}",
+        ]
+    )
+    with pytest.raises(FileNotFoundError):
+        module.NeatAI(cfg)
@@ -0,0 +1,215 @@
+import dataclasses
+
+import numpy as np
+import pytest
+
+from common.chunks import (
+    FOOD_ID_SHIFT,
+    ChunkGrid,
+    ChunkWorker,
+    ShardedWorld,
+    chunk_specs,
+)
+from common.food import FoodCellManager
+from common.player import PlayerManager
+from common.settings import load_settings
+from common.utilities import Position
+
+
+class InlineConnection:
+    """Serves the worker protocol in-process instead of over a pipe."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.reply = None
+
+    def send(self, message):
+        command, payload = message
+        if command == "step":
+            self.reply = self.worker.step(*payload)
+        elif command == "reset":
+            self.worker.reset()
+
+    def recv(self):
+        return self.reply
+
+    def close(self):
+        pass
+
+
+class InlineWorld(ShardedWorld):
+    """A ShardedWorld whose chunk workers run in the calling thread."""
+
+    def __init__(self, cfg, cols, rows, seed=0):
+        self.cfg = cfg
+        self.grid = ChunkGrid(cfg.width, cfg.height, cols, rows)
+        self.owners = {}
+        self.handovers = 0
+        self.food = {}
+        self.workers = [
+            ChunkWorker(*spec) for spec in chunk_specs(cfg, self.grid, seed)
+        ]
+        self.connections = [InlineConnection(worker) for worker in self.workers]
+        self.processes = []
+
+
+@pytest.fixture
+def cfg():
+    return dataclasses.replace(
+        load_settings(), width=800, height=600, food_quantity=200
+    )
+
+
+@pytest.fixture
+def world(cfg):
+    p_manager = PlayerManager(cfg)
+    f_manager = FoodCellManager(cfg, p_manager)
+    return InlineWorld(cfg, 2, 2), p_manager, f_manager
+
+
+def place(p_manager, player_id, x, y, score=0):
+    p_manager.add(player_id, f"p{player_id}")
+    player = p_manager.get(player_id)
+    player.position = Position(x, y)
+    player.score = score
+    p_manager.leaderboard.update(player_id, player.name, score)
+    return player
+
+
+def test_grid_chunks_and_overlaps():
+    grid = ChunkGrid(800, 600, 2, 2)
+    assert [
+        grid.chunk_of(x, y) for x, y in ((0, 0), (799, 0), (0, 599), (400, 300))
+    ] == [
+        0,
+        1,
+        2,
+        3,
+    ]
+    # Points outside the world belong to the nearest chunk
+    assert grid.chunk_of(-5, 700) == 2
+    assert grid.bounds(3) == (400, 300, 800, 600)
+    assert grid.chunks_overlapping(100, 100, 10) == [0]
+    assert grid.chunks_overlapping(395, 100, 10) == [0, 1]
+    assert grid.chunks_overlapping(400, 300, 10) == [0, 1, 2, 3]
+
+
+def test_chunk_specs_share_out_the_food_by_area(cfg):
+    specs = chunk_specs(cfg, ChunkGrid(cfg.width, cfg.height, 2, 2), seed=5)
+    assert [spec[2] for spec in specs] == [50] * 4
+    assert [spec[4] for spec in specs] == [5, 6, 7, 8]
+
+
+def test_players_spanning_a_border_are_ghosts_in_the_neighbours(world):
+    sharded, p_manager, _ = world
+    place(p_manager, 1, 100, 100)
+    place(p_manager, 2, 398, 100, score=10)
+    rows = sharded.assign(p_manager.players)
+    assert [[(row[0], row[4]) for row in chunk] for chunk in rows] == [
+        [(1, True), (2, True)],
+        [(2, False)],
+        [],
+        [],
+    ]
+
+
+def test_handovers_are_counted_when_the_owner_changes(world):
+    sharded, p_manager, _ = world
+    player = place(p_manager, 1, 390, 100)
+    sharded.assign(p_manager.players)
+    player.position = Position(410, 100)
+    sharded.assign(p_manager.players)
+    player.position = Position(420, 100)
+    sharded.assign(p_manager.players)
+    assert sharded.handovers == 1
+    assert sharded.owners == {1: 1}
+    p_manager.remove(1)
+    sharded.assign(p_manager.players)
+    assert sharded.owners == {}
+
+
+def test_worker_credits_food_to_the_biggest_player_first(cfg):
+    worker = ChunkWorker(0, (0, 0, 400, 300), quota=0, refill_rate=1, seed=0)
+    worker.food_ids = np.array([1, 2, 3], dtype=np.int64)
+    worker.food_xy = np.array([(100, 100), (105, 100), (300, 300)], dtype=np.int32)
+    worker.food_colours = np.zeros((3, 3), dtype=np.uint8)
+    result = worker.step(
+        np.array([7, 8]),
+        np.array([(100.0, 100.0), (104.0, 100.0)]),
+        np.array([20.0, 8.0]),
+        np.array([True, True]),
+    )
+    assert result["credits"] == {7: 2}
+    assert result["removed"].tolist() == [1, 2]
+    assert worker.food_ids.tolist() == [3]
+
+
+def test_worker_fills_its_quota_then_refills_slowly(cfg):
+    worker = ChunkWorker(3, (400, 300, 800, 600), quota=40, refill_rate=2, seed=0)
+    empty = (np.empty(0, np.int64), np.empty((0, 2)), np.empty(0), np.empty(0, bool))
+    ids, xy, _ = worker.step(*empty)["added"]
+    assert len(ids) == 40
+    assert (ids >> FOOD_ID_SHIFT).tolist() == [3] * 40
+    assert ((xy >= (400, 300)) & (xy < (800, 600))).all()
+    worker.food_ids = worker.food_ids[10:]
+    worker.food_xy = worker.food_xy[10:]
+    worker.food_colours = worker.food_colours[10:]
+    assert len(worker.step(*empty)["added"][0]) == 2
+
+
+def test_only_the_victims_owner_reports_an_eat(cfg):
+    worker = ChunkWorker(0, (0, 0, 400, 300), quota=0, refill_rate=1, seed=0)
+    args = (
+        np.array([1, 2]),
+        np.array([(395.0, 100.0), (405.0, 100.0)]),
+        np.array([30.0, 6.0]),
+    )
+    assert worker.step(*args, np.array([True, False]))["events"] == []
+    assert worker.step(*args, np.array([False, True]))["events"] == [(1, 2)]
+
+
+def test_ghost_eats_across_a_chunk_border(world):
+    sharded, p_manager, f_manager = world
+    place(p_manager, 1, 395, 100, score=24)
+    place(p_manager, 2, 405, 100, score=8)
+    sharded.step(p_manager, f_manager)
+    assert list(p_manager.players) == [1]
+    assert p_manager.get(1).score >= 24 + 4
+
+
+def test_food_from_every_worker_is_merged_and_recycled(world, cfg):
+    sharded, p_manager, f_manager = world
+    sharded.step(p_manager, f_manager)
+    assert len(f_manager.food_cells) == cfg.food_quantity
+    assert len(sharded.food) == cfg.food_quantity
+    by_chunk = [
+        sum(1 for food_id in sharded.food if food_id >> FOOD_ID_SHIFT == index)
+        for index in range(4)
+    ]
+    assert by_chunk == [50] * 4
+
+    # A player dropped onto some food eats it in its chunk
+    food_id, cell = next(iter(sharded.food.items()))
+    place(p_manager, 1, cell.x, cell.y)
+    sharded.step(p_manager, f_manager)
+    assert food_id not in sharded.food
+    assert p_manager.get(1).score >= 1
+    assert cell in f_manager.pool.released
+    assert {(c.x, c.y) for c in f_manager.food_cells} == {
+        (c.x, c.y) for c in sharded.food.values()
+    }
+
+
+def test_reset_clears_the_food_of_every_chunk(world):
+    sharded, p_manager, f_manager = world
+    sharded.step(p_manager, f_manager)
+    sharded.reset()
+    assert sharded.food == {}
+    assert all(len(worker.food_ids) == 0 for worker in sharded.workers)
+
+
+def test_stop_ends_real_worker_processes(cfg):
+    sharded = ShardedWorld(cfg, 2, 1)
+    sharded.stop()
+    sharded.stop()
+    assert not any(process.is_alive() for process in sharded.processes)
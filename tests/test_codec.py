@@ -0,0 +1,97 @@
+import pickle
+
+import pytest
+
+from common.codec import (
+    CODECS,
+    RAW,
+    SnapshotEncoder,
+    choose_codec,
+    decode_snapshot,
+    palette_colours,
+    palette_index,
+)
+from common.food import FoodCell
+from common.player import PlayerManager
+from common.protocol import is_packed
+from common.settings import load_settings
+from common.snapshot import WorldSnapshot
+from common.utilities import Position
+
+
+@pytest.fixture
+def snapshot():
+    cfg = load_settings()
+    manager = PlayerManager(cfg)
+    manager.add_many([(3, "alice"), (7, "bob")])
+    manager.add_score(7, 25)
+    food = [
+        FoodCell(cfg.food, Position(x, y), (x % 256, y % 256, 128))
+        for x, y in ((0, 0), (800, 600), (123, 456), (400, 1))
+    ]
+    meta = {"leaderboard": manager.leaderboard.entries(), "round": {"number": 1}}
+    return cfg, WorldSnapshot(5, food, manager.snapshot(), meta)
+
+
+@pytest.mark.parametrize("codec", [codec for codec in CODECS if codec != RAW])
+def test_round_trip_keeps_the_world_within_quantization(snapshot, codec):
+    cfg, world = snapshot
+    encoder = SnapshotEncoder(cfg.width, cfg.height, cfg.food.food_radius, 6)
+    reply = pickle.loads(world.encoded(encoder, codec))
+    assert is_packed(reply)
+
+    food, players, meta = decode_snapshot(reply)
+    assert meta == world.meta
+    assert [(cell.x, cell.y) for cell in food] == [cell.xy for cell in world.food_cells]
+    assert [cell.colour for cell in food] == palette_colours(
+        palette_index([cell.colour for cell in world.food_cells])
+    )
+    assert all(cell.radius == cfg.food.food_radius for cell in food)
+
+    assert list(players) == list(world.players)
+    step = max(cfg.width, cfg.height) / 65535
+    for player_id, player in players.items():
+        original = world.players[player_id]
+        assert player.name == original.name
+        assert player.score == original.score
+        assert player.get_radius() == original.get_radius()
+        assert player.position.x == pytest.approx(original.position.x, abs=step)
+        assert player.position.y == pytest.approx(original.position.y, abs=step)
+
+
+def test_encodings_are_cached_per_snapshot(snapshot):
+    cfg, world = snapshot
+    encoder = SnapshotEncoder(cfg.width, cfg.height, cfg.food.food_radius, 6)
+    assert world.encoded(encoder, "zlib") is world.encoded(encoder, "zlib")
+
+
+def test_empty_world_round_trips(snapshot):
+    cfg, _ = snapshot
+    encoder = SnapshotEncoder(cfg.width, cfg.height, cfg.food.food_radius, 6)
+    reply = pickle.loads(encoder.encode(WorldSnapshot(1, [], {}), "packed"))
+    assert decode_snapshot(reply) == ([], {}, {})
+
+
+def test_palette_keeps_the_extremes():
+    colours = [(0, 0, 0), (255, 255, 255), (255, 0, 0)]
+    assert palette_colours(palette_index(colours)) == colours
+
+
+@pytest.mark.parametrize(
+    "name, link_kbps, expected",
+    [
+        ("auto", None, "packed"),
+        ("auto", 1_000_000, "packed"),
+        ("auto", 50_000, "lz4"),
+        ("auto", 500, "zlib"),
+        ("zlib", None, "zlib"),
+        (RAW, None, RAW),
+    ],
+)
+def test_choose_codec(name, link_kbps, expected):
+    assert choose_codec(name, link_kbps) == expected
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        choose_codec("brotli")
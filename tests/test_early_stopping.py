@@ -0,0 +1,155 @@
+import importlib.util
+import os
+
+import pytest
+
+from common.early_stopping import HOPELESS, MAX_STEPS, STALLED, EarlyStopping
+from common.settings import ROOT, load_settings
+from common.utilities import Position
+
+
+def test_no_limits_never_cut():
+    policy = EarlyStopping()
+    assert policy.judge([10**6], [0.0], [10**6]) == [None]
+
+
+def test_max_steps_and_stall_cut_runs():
+    policy = EarlyStopping(max_steps=100, stall_steps=20)
+    reasons = policy.judge([100, 50, 50, 99], [1, 1, 1, 1], [0, 20, 19, 25])
+    assert reasons == [MAX_STEPS, STALLED, None, STALLED]
+    assert policy.summary() == {MAX_STEPS: 1, STALLED: 2, HOPELESS: 0}
+
+
+def test_hopeless_runs_are_cut_at_checkpoints_once_enough_samples_exist():
+    policy = EarlyStopping(
+        grace_steps=50, check_interval=50, cut_quantile=0.25, min_samples=4
+    )
+    # Before the grace period and between checkpoints nothing is judged
+    assert policy.judge([40, 75], [0, 0], [0, 0]) == [None, None]
+    # Too few samples at the checkpoint yet
+    assert policy.judge([50, 50], [1.0, 1.5], [0, 0]) == [None, None]
+    # The distribution now holds 0.1, 1, 1.5, 2 and 3; the lower quarter is cut
+    reasons = policy.judge([50, 50, 50], [2.0, 3.0, 0.1], [0, 0, 0])
+    assert reasons == [None, None, HOPELESS]
+    assert policy.summary()[HOPELESS] == 1
+
+
+def test_runs_reaching_a_checkpoint_together_are_judged_in_any_order():
+    fitnesses = [float(f) for f in range(10)]
+    forward = EarlyStopping(check_interval=10, cut_quantile=0.3, min_samples=10)
+    backward = EarlyStopping(check_interval=10, cut_quantile=0.3, min_samples=10)
+    cut = forward.judge([10] * 10, fitnesses, [0] * 10)
+    assert cut == backward.judge([10] * 10, fitnesses[::-1], [0] * 10)[::-1]
+    assert cut.count(HOPELESS) == 3
+
+
+def test_start_generation_forgets_the_distribution():
+    policy = EarlyStopping(check_interval=10, cut_quantile=0.5, min_samples=2)
+    policy.judge([10, 10], [0, 1], [0, 0])
+    policy.start_generation()
+    assert policy.summary() == {MAX_STEPS: 0, STALLED: 0, HOPELESS: 0}
+    assert policy.judge([10], [0], [0]) == [None]
+
+
+def test_from_settings():
+    training = load_settings(["training.stall_steps=7"]).training
+    assert EarlyStopping.from_settings(training).stall_steps == 7
+
+
+@pytest.fixture(scope="module")
+def neat_ai():
+    spec = importlib.util.spec_from_file_location(
+        "neat_ai", os.path.join(ROOT, "neat-ai.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def genome_run(neat_ai):
+    return neat_ai.GenomeRun
+
+
+class Bot:
+    def __init__(self, x, y, score=0):
+        self.position = Position(x, y)
+        self.score = score
+
+
+def test_a_bot_that_never_shows_up_ends_its_run(genome_run):
+    run = genome_run(1, None, None)
+    ended = [run.update(None) for _ in range(genome_run.missing_limit)]
+    assert ended[-1] and not any(ended[:-1])
+
+
+def test_a_run_tracks_movement_until_the_bot_is_eaten(genome_run):
+    run = genome_run(1, None, None)
+    assert not run.update(None)
+    assert not run.update(Bot(10, 10))
+    assert not run.update(Bot(13, 14, score=2))
+    assert not run.update(Bot(13, 14, score=2))
+    assert (run.steps, run.idle_steps, run.total_distance_travelled) == (2, 1, 5)
+    assert run.update(None)
+
+
+class CappedClient:
+    """A batch session whose server adds at most cap bots per register."""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self.registered = []
+        self.next_id = 0
+
+    def connect(self):
+        pass
+
+    def register(self, count, prefix="bot"):
+        ids = list(range(self.next_id, self.next_id + min(count, self.cap)))
+        self.next_id += len(ids)
+        self.registered.append(len(ids))
+        return ids
+
+    def step(self, inputs):
+        # The bots never show up, so every run ends after missing_limit steps
+        return {}, {}, {}
+
+    def unregister(self, ids):
+        return list(ids)
+
+    def send(self, data):
+        pass
+
+    def disconnect(self):
+        pass
+
+
+def evaluate(neat_ai, monkeypatch, client, genomes):
+    cfg = load_settings(["fps=10000", "training.arena_size=5"])
+    trainer = neat_ai.NeatAI.__new__(neat_ai.NeatAI)
+    trainer.cfg = cfg
+    trainer.training_cfg = cfg.training
+    trainer.early_stopping = EarlyStopping.from_settings(cfg.training)
+    trainer.player_manager = neat_ai.PlayerManager(cfg)
+    trainer.food_manager = neat_ai.FoodCellManager(cfg, trainer.player_manager)
+    trainer.start_next_generation = False
+    monkeypatch.setattr(neat_ai, "BatchClient", lambda: client)
+    monkeypatch.setattr(neat_ai.neat.nn.FeedForwardNetwork, "create", lambda g, c: None)
+    trainer.evaluate_genomes(genomes, None)
+
+
+class Genome:
+    fitness = None
+
+
+def test_genomes_the_server_did_not_register_wait_for_a_slot(neat_ai, monkeypatch):
+    genomes = [(i, Genome()) for i in range(7)]
+    client = CappedClient(cap=2)
+    evaluate(neat_ai, monkeypatch, client, genomes)
+    assert sum(client.registered) == 7
+    assert all(genome.fitness is not None for _, genome in genomes)
+
+
+def test_a_server_that_registers_no_bots_fails_the_generation(neat_ai, monkeypatch):
+    with pytest.raises(RuntimeError):
+        evaluate(neat_ai, monkeypatch, CappedClient(cap=0), [(0, Genome())])
@@ -0,0 +1,50 @@
+from common.food import FoodCellPool
+from common.settings import load_settings
+from common.snapshot import SnapshotBuffer, WorldSnapshot
+
+
+def make_pool():
+    return FoodCellPool(load_settings().food)
+
+
+def test_released_cells_wait_for_every_snapshot_holding_them():
+    pool = make_pool()
+    buffer = SnapshotBuffer(depth=2)
+    cell = pool.acquire(1, 2, (3, 4, 5))
+    held = WorldSnapshot(1, [cell], {})
+    buffer.publish(held)
+    pool.advance(held)
+
+    pool.release([cell])
+    for version in range(2, 40):
+        snapshot = WorldSnapshot(version, [], {})
+        buffer.publish(snapshot)
+        pool.advance(snapshot)
+        # A slow reader still holds the snapshot with the cell in it
+        assert len(pool) == 0
+        assert held.food_cells[0].xy == (1, 2)
+
+    del held
+    snapshot = WorldSnapshot(40, [], {})
+    buffer.publish(snapshot)
+    pool.advance(snapshot)
+    assert pool.acquire(7, 8, (0, 0, 0)) is cell
+    assert pool.reused == 1
+
+
+def test_cells_are_freed_once_the_buffered_snapshots_move_on():
+    pool = make_pool()
+    buffer = SnapshotBuffer(depth=2)
+    cells = [pool.acquire(i, i, (0, 0, 0)) for i in range(3)]
+    snapshot = WorldSnapshot(1, cells, {})
+    buffer.publish(snapshot)
+    pool.advance(snapshot)
+    pool.release(cells)
+    del snapshot
+
+    for version in (2, 3):
+        snapshot = WorldSnapshot(version, [], {})
+        buffer.publish(snapshot)
+        pool.advance(snapshot)
+        del snapshot
+    assert len(pool) == 3
@@ -0,0 +1,99 @@
+import math
+
+import _pickle as pickle
+import pytest
+
+from common.food import FoodCell
+from common.interest import FOOD_BYTES, PLAYER_BYTES, InterestMerger, InterestView
+from common.player import PlayerManager
+from common.protocol import is_interest
+from common.settings import load_settings
+from common.snapshot import WorldSnapshot
+from common.utilities import Position
+
+
+@pytest.fixture
+def cfg():
+    return load_settings()
+
+
+def food(cfg, *points):
+    return [FoodCell(cfg.food, Position(x, y), (1, 2, 3)) for x, y in points]
+
+
+def merge(view, merger, snapshot):
+    update = pickle.loads(view.update(snapshot))
+    assert is_interest(update)
+    return merger.apply(update)
+
+
+def test_merged_updates_rebuild_the_world(cfg):
+    manager = PlayerManager(cfg)
+    manager.add_many([(1, "me"), (2, "other")])
+    view = InterestView(1, budget=1 << 20)
+    merger = InterestMerger(cfg.food.food_radius)
+
+    cells = food(cfg, (10, 10), (20, 20), (30, 30))
+    meta = {"round": {"number": 1}}
+    merged_food, players, merged_meta = merge(
+        view, merger, WorldSnapshot(1, cells, manager.snapshot(), meta)
+    )
+    assert {cell.xy for cell in merged_food} == {cell.xy for cell in cells}
+    assert set(players) == {1, 2}
+    assert merged_meta == meta
+
+    # One cell is eaten, another spawns and a player leaves
+    manager.remove(2)
+    cells = cells[1:] + food(cfg, (40, 40))
+    merged_food, players, _ = merge(
+        view, merger, WorldSnapshot(2, cells, manager.snapshot())
+    )
+    assert {cell.xy for cell in merged_food} == {cell.xy for cell in cells}
+    assert set(players) == {1}
+
+
+def test_distant_players_are_refreshed_less_often(cfg):
+    manager = PlayerManager(cfg)
+    manager.add_many([(1, "me"), (2, "far")])
+    manager.get(1).position = Position(0, 0)
+    manager.get(2).position = Position(700, 500)
+    view = InterestView(1, budget=1 << 20, tiers=((250, 1), (math.inf, 4)))
+
+    sent = []
+    for tick in range(1, 10):
+        update = pickle.loads(view.update(WorldSnapshot(tick, [], manager.snapshot())))
+        sent.append(sorted(update[2]))
+    assert all(1 in players for players in sent)
+    assert [tick for tick, players in enumerate(sent, 1) if 2 in players] == [1, 5, 9]
+
+
+def test_over_budget_updates_defer_the_furthest_and_catch_up(cfg):
+    manager = PlayerManager(cfg)
+    manager.add(1, "me")
+    manager.get(1).position = Position(0, 0)
+    cells = food(cfg, *((x, 0) for x in range(10, 110, 10)))
+    view = InterestView(1, budget=PLAYER_BYTES + 3 * FOOD_BYTES)
+    merger = InterestMerger(cfg.food.food_radius)
+
+    merged_food, _, _ = merge(view, merger, WorldSnapshot(1, cells, manager.snapshot()))
+    assert sorted(cell.x for cell in merged_food) == [10, 20, 30]
+    assert view.deferred == 7
+
+    for tick in range(2, 6):
+        merged_food, _, _ = merge(
+            view, merger, WorldSnapshot(tick, cells, manager.snapshot())
+        )
+    assert {cell.xy for cell in merged_food} == {cell.xy for cell in cells}
+
+
+def test_removals_are_sent_even_over_budget(cfg):
+    manager = PlayerManager(cfg)
+    manager.add(1, "me")
+    cells = food(cfg, (10, 10), (20, 20))
+    view = InterestView(1, budget=1 << 20)
+    merger = InterestMerger(cfg.food.food_radius)
+    merge(view, merger, WorldSnapshot(1, cells, manager.snapshot()))
+
+    view.budget = 0
+    merged_food, _, _ = merge(view, merger, WorldSnapshot(2, [], manager.snapshot()))
+    assert merged_food == []
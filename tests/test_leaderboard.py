@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from common.leaderboard import Leaderboard
+
+
+def expected(scores, names, k):
+    """The top k computed from scratch, the way the leaderboard must rank."""
+    ranked = sorted(scores, key=lambda player_id: (-scores[player_id], player_id))
+    return tuple((i, names[i], scores[i]) for i in ranked[:k])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_ranking_matches_a_full_sort_after_every_change(seed):
+    rng = random.Random(seed)
+    k = rng.randint(1, 6)
+    leaderboard = Leaderboard(k)
+    scores, names = {}, {}
+    for _ in range(2000):
+        action = rng.random()
+        player_id = rng.randrange(20)
+        if action < 0.7:
+            # Scores go up and down, with many ties on the few values used
+            scores[player_id] = rng.randrange(10)
+            names[player_id] = f"p{player_id}"
+            leaderboard.update(player_id, names[player_id], scores[player_id])
+        elif action < 0.95:
+            scores.pop(player_id, None)
+            names.pop(player_id, None)
+            leaderboard.remove(player_id)
+        else:
+            scores.clear()
+            names.clear()
+            leaderboard.clear()
+        assert leaderboard.entries() == expected(scores, names, k)
+    assert leaderboard.top_score() == max(scores.values(), default=0)
+
+
+def test_entries_are_cached_until_the_ranking_changes():
+    leaderboard = Leaderboard(2)
+    leaderboard.update(1, "a", 5)
+    leaderboard.update(2, "b", 3)
+    entries = leaderboard.entries()
+    # A player outside the top k does not change what clients see
+    leaderboard.update(3, "c", 1)
+    assert leaderboard.entries() is entries
+    leaderboard.update(3, "c", 4)
+    assert leaderboard.entries() == ((1, "a", 5), (3, "c", 4))
@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+import pytest
+
+from common.movement import (
+    MAX_TICK_SCALE,
+    clamp_to_world,
+    integrate,
+    player_speeds,
+    tick_scale,
+)
+from common.player import PlayerManager
+from common.settings import load_settings
+
+
+@pytest.fixture
+def manager():
+    return PlayerManager(load_settings())
+
+
+def test_player_speeds_shrink_with_score_down_to_the_minimum():
+    speeds = player_speeds([0, 14, 1000], start_velocity=2, min_velocity=0.6)
+    assert speeds.tolist() == pytest.approx([2, 1, 0.6])
+
+
+def test_integrate_follows_directions_and_stops_on_targets():
+    moved = integrate(
+        [(100, 100), (100, 100), (100, 100)],
+        [(3, 4), (101, 100), (0, 0)],
+        np.array([False, True, False]),
+        np.array([5.0, 2.0, 5.0]),
+        np.full(3, 6.0),
+        800,
+        600,
+    )
+    np.testing.assert_allclose(moved, [[103, 104], [101, 100], [100, 100]])
+
+
+def test_clamp_to_world_keeps_circles_inside_and_centres_huge_ones():
+    clamped = clamp_to_world(
+        [(-50, 700), (1e30, 300), (10, 10)], [6, 6, 1000], 800, 600
+    )
+    assert clamped.tolist() == [[6, 594], [794, 300], [400, 300]]
+
+
+@pytest.mark.parametrize(
+    "dt, expected", [(0.001, 1.0), (0.0005, 0.5), (-1.0, 0.0), (10.0, MAX_TICK_SCALE)]
+)
+def test_tick_scale_measures_ticks_at_the_nominal_rate(dt, expected):
+    assert tick_scale(dt, 1000) == pytest.approx(expected)
+
+
+def test_distance_per_second_does_not_depend_on_the_tick_rate(manager):
+    covered = []
+    for ticks, dt in ((1000, 0.001), (250, 0.004)):
+        player_id = len(covered)
+        manager.add(player_id, "runner")
+        player = manager.get(player_id)
+        player.position.x, player.position.y = 10, 300
+        manager.queue_intent(player_id, False, 1, 0)
+        manager.apply_moves()
+        player.position.x = 10
+        for _ in range(ticks // 10):
+            manager.integrate_movement(tick_scale(dt, 1000))
+        covered.append(player.position.x - 10)
+        manager.remove(player_id)
+    assert covered[0] == pytest.approx(covered[1])
+
+
+def test_moves_are_clamped_to_the_world(manager):
+    manager.add(0, "mover")
+    manager.handle_move_command(f"move {10**30} -5", 0)
+    manager.apply_moves()
+    player = manager.get(0)
+    radius = player.get_radius()
+    assert (player.position.x, player.position.y) == (800 - radius, radius)
+
+
+def test_oversized_moves_are_dropped(manager):
+    manager.add(0, "mover")
+    player = manager.get(0)
+    start = (player.position.x, player.position.y)
+    manager.handle_move_command(f"move {10**400} 5", 0)
+    manager.apply_moves()
+    assert (player.position.x, player.position.y) == start
+
+
+@pytest.mark.parametrize("command", ["dir nan 1", "target inf 0", "dir 1 -inf"])
+def test_non_finite_intents_are_rejected(manager, command):
+    manager.add(0, "mover")
+    manager.handle_intent_command(command, 0)
+    manager.apply_moves()
+    assert manager.get(0).intent is None
+    assert not any(map(math.isnan, manager.get_positions_and_radii()[0].ravel()))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from common.observation import (
+    BIGGER,
+    CHANNELS,
+    FOOD,
+    SMALLER,
+    WALLS,
+    RasterEncoder,
+)
+
+
+def reference_encode(
+    encoder, agent_xy, agent_radii, food_xy, player_xy, player_radii, own
+):
+    """Renders the observations one agent and one entity at a time."""
+    size = encoder.resolution
+    half = encoder.view / 2
+    grid = np.zeros((len(agent_xy), CHANNELS, size, size), dtype=np.float32)
+
+    def cell(agent, point):
+        col, row = (
+            min(
+                max(int((point[axis] - agent[axis] + half) // encoder.cell), 0),
+                size - 1,
+            )
+            for axis in (0, 1)
+        )
+        return row, col
+
+    for n, agent in enumerate(agent_xy):
+        for point in food_xy:
+            if abs(point[0] - agent[0]) <= half and abs(point[1] - agent[1]) <= half:
+                grid[(n, FOOD) + cell(agent, point)] += 1
+        for k, point in enumerate(player_xy):
+            if k == own[n] or player_radii[k] == agent_radii[n]:
+                continue
+            if abs(point[0] - agent[0]) <= half and abs(point[1] - agent[1]) <= half:
+                channel = BIGGER if player_radii[k] > agent_radii[n] else SMALLER
+                grid[(n, channel) + cell(agent, point)] += 1
+        for row in range(size):
+            for col in range(size):
+                x = agent[0] - half + (col + 0.5) * encoder.cell
+                y = agent[1] - half + (row + 0.5) * encoder.cell
+                grid[n, WALLS, row, col] = not (
+                    0 <= x <= encoder.width and 0 <= y <= encoder.height
+                )
+    return grid
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_encode_matches_a_reference_loop(seed):
+    rng = np.random.default_rng(seed)
+    encoder = RasterEncoder(800, 600, resolution=8, view=200)
+    player_xy = rng.uniform(-20, 820, (25, 2))
+    player_radii = rng.choice([6.0, 10.0, 20.0], 25)
+    food_xy = rng.uniform(0, 800, (300, 2))
+    own = np.array([0, 5, 9, 24])
+
+    grid = encoder.encode(
+        player_xy[own], player_radii[own], food_xy, player_xy, player_radii, own
+    )
+    expected = reference_encode(
+        encoder,
+        player_xy[own],
+        player_radii[own],
+        food_xy,
+        player_xy,
+        player_radii,
+        own,
+    )
+    assert grid.shape == (len(own),) + encoder.shape
+    assert grid.dtype == np.float32
+    np.testing.assert_array_equal(grid, expected)
+
+
+def test_agents_do_not_see_themselves_or_equals():
+    encoder = RasterEncoder(800, 600, resolution=4, view=100)
+    grid = encoder.encode(
+        [(400, 300)], [10], [], [(400, 300), (410, 300)], [10, 10], own=[0]
+    )
+    assert not grid[0, BIGGER].any() and not grid[0, SMALLER].any()
+
+
+def test_empty_world_only_has_walls():
+    encoder = RasterEncoder(800, 600, resolution=4, view=100)
+    grid = encoder.encode([(0, 0)], [6], [], [], [])
+    assert not grid[0, :WALLS].any()
+    # The top left quarter of the view around the corner lies outside the world
+    assert grid[0, WALLS].tolist() == [
+        [1, 1, 1, 1],
+        [1, 1, 1, 1],
+        [1, 1, 0, 0],
+        [1, 1, 0, 0],
+    ]
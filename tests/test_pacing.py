@@ -0,0 +1,45 @@
+import socket
+import struct
+import sys
+
+import pytest
+
+from common import pacing
+from common.pacing import set_send_timeout
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.options = {}
+
+    def setsockopt(self, level, option, value):
+        self.options[(level, option)] = value
+
+
+def send_timeout(seconds):
+    sock = RecordingSocket()
+    set_send_timeout(sock, seconds)
+    return sock.options[(socket.SOL_SOCKET, socket.SO_SNDTIMEO)]
+
+
+def test_send_timeout_is_a_timeval_on_posix(monkeypatch):
+    monkeypatch.setattr(pacing.sys, "platform", "linux")
+    assert struct.unpack("ll", send_timeout(2.5)) == (2, 500_000)
+
+
+@pytest.mark.parametrize(
+    "seconds, milliseconds", [(5.0, 5000), (0.25, 250), (0.0001, 1), (0, 0)]
+)
+def test_send_timeout_is_milliseconds_on_windows(monkeypatch, seconds, milliseconds):
+    monkeypatch.setattr(pacing.sys, "platform", "win32")
+    assert struct.unpack("<I", send_timeout(seconds)) == (milliseconds,)
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="reads the option back as a timeval"
+)
+def test_send_timeout_applies_to_a_real_socket():
+    with socket.socket() as sock:
+        set_send_timeout(sock, 1.5)
+        value = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, 16)
+        assert struct.unpack("ll", value) == (1, 500_000)
@@ -0,0 +1,145 @@
+import socket
+
+import pytest
+
+from common.protocol import (
+    MAX_COORDINATE,
+    MAX_HANDSHAKE,
+    InputDecoder,
+    bounded_int,
+    coalesce,
+    frame,
+    is_valid,
+    parse_groups,
+    read_handshake,
+)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "get",
+        "move 10 20",
+        f"move 0 {MAX_COORDINATE}",
+        "dir 0.5 -1",
+        "target 3 4",
+        "ping x",
+        "ping x 1.5",
+        "encoding zlib",
+        "encoding auto 256",
+        "inputs 3 1 0 4 -1 0",
+        "register 2 seek",
+    ],
+)
+def test_valid_commands(command):
+    assert is_valid(command)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "",
+        "fly 1 2",
+        "get now",
+        "move 10",
+        "move 1.5 2",
+        "move -1 5",
+        f"move {MAX_COORDINATE + 1} 5",
+        f"move {10**400} 5",
+        "move inf 5",
+        "dir nan 0",
+        "target 1 inf",
+        "ping x -1",
+        "ping x nan",
+        "inputs 3 1",
+        "inputs 3 nan 0",
+        "unregister",
+    ],
+)
+def test_invalid_commands(command):
+    assert not is_valid(command)
+
+
+def test_moves_outside_the_world_are_rejected_when_it_is_known():
+    assert is_valid("move 800 600", (800, 600))
+    assert not is_valid("move 801 10", (800, 600))
+    assert not is_valid("move 10 601", (800, 600))
+
+
+def test_bounded_int_includes_both_ends():
+    convert = bounded_int(2, 4)
+    assert [convert(value) for value in ("2", "3", "4")] == [2, 3, 4]
+    for value in ("1", "5", "three"):
+        with pytest.raises(ValueError):
+            convert(value)
+
+
+def test_parse_groups_splits_whole_groups():
+    assert parse_groups("inputs 3 1 0 4 -1 0") == [(3, 1.0, 0.0), (4, -1.0, 0.0)]
+    with pytest.raises(ValueError):
+        parse_groups("inputs 3 1 0 4")
+
+
+def test_coalesce_keeps_only_the_last_movement():
+    commands = ["move 1 1", "get", "dir 1 0", "ping a", "target 5 5"]
+    assert coalesce(commands) == ["get", "ping a", "target 5 5"]
+
+
+def test_decoder_joins_split_frames_and_splits_joined_ones():
+    decoder = InputDecoder()
+    assert decoder.feed(b"move 1 ") == []
+    assert decoder.feed(b"2\nget\ndir 1") == ["move 1 2", "get"]
+    assert decoder.feed(b" 0\n") == ["dir 1 0"]
+    assert decoder.malformed == 0
+
+
+def test_decoder_counts_and_skips_malformed_frames():
+    decoder = InputDecoder(bounds=(800, 600))
+    commands = decoder.feed(b"get\n\xff\xfe\nmove 9999 1\nfly\n\nmove 5 5\n")
+    assert commands == ["get", "move 5 5"]
+    assert decoder.malformed == 3
+
+
+def test_decoder_drops_overlong_frames():
+    decoder = InputDecoder(max_frame=16)
+    assert decoder.feed(b"x" * 32) == []
+    assert decoder.malformed == 1
+    assert decoder.feed(b"x" * 32) == []
+    assert decoder.feed(b"x\n" + frame("get")) == ["get"]
+    assert decoder.malformed == 1
+
+
+def test_decoder_skips_the_rest_of_an_overlong_frame():
+    decoder = InputDecoder(max_frame=16)
+    assert decoder.feed(b"move " + b"1" * 32) == []
+    # The tail of the overlong frame is not parsed as a command of its own
+    assert decoder.feed(b"1" * 8 + b" 5\nget\n") == ["get"]
+    assert decoder.malformed == 1
+
+
+def test_decoder_rejects_overlong_frames_that_arrive_whole():
+    decoder = InputDecoder(max_frame=16)
+    assert decoder.feed(b"ping " + b"x" * 32 + b"\nget\n") == ["get"]
+    assert decoder.malformed == 1
+
+
+def test_handshake_is_read_whole_and_leaves_the_next_command():
+    server, client = socket.socketpair()
+    with server, client:
+        client.sendall(frame("spectator auto 512.5") + frame("get"))
+        assert read_handshake(server) == "spectator auto 512.5"
+        assert server.recv(16) == frame("get")
+
+
+def test_handshake_rejects_overlong_or_cut_off_names():
+    server, client = socket.socketpair()
+    with server, client:
+        client.sendall(b"x" * (MAX_HANDSHAKE + 1))
+        with pytest.raises(ValueError):
+            read_handshake(server)
+    server, client = socket.socketpair()
+    with server:
+        client.sendall(b"name")
+        client.close()
+        with pytest.raises(ValueError):
+            read_handshake(server)
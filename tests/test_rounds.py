@@ -0,0 +1,57 @@
+from common.player import PlayerManager
+from common.rounds import (
+    ENDED,
+    ROUND_ENDED,
+    ROUND_RESET,
+    ROUND_STARTED,
+    RUNNING,
+    WAITING,
+    RoundManager,
+)
+from common.settings import load_settings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_round_lifecycle_follows_the_clock():
+    clock = FakeClock()
+    rounds = RoundManager(round_time=10, intermission=2, win_score=0, clock=clock)
+    assert rounds.tick(0, None) is None and rounds.state == WAITING
+    assert rounds.tick(1, None) == ROUND_STARTED and rounds.state == RUNNING
+    clock.now = 10
+    assert rounds.tick(1, (1, "a", 5)) == ROUND_ENDED and rounds.state == ENDED
+    assert rounds.winner == (1, "a", 5)
+    clock.now = 12
+    assert rounds.tick(1, None) == ROUND_RESET
+    assert rounds.number == 2 and rounds.state == RUNNING
+
+
+def test_win_score_and_restart_end_the_round_early():
+    rounds = RoundManager(
+        round_time=10, intermission=2, win_score=50, clock=FakeClock()
+    )
+    rounds.tick(1, None)
+    assert rounds.tick(1, (1, "a", 50)) == ROUND_ENDED
+    rounds.request_restart()
+    assert rounds.tick(0, None) == ROUND_RESET and rounds.state == WAITING
+
+
+def test_reset_respawns_eaten_players_that_are_still_connected():
+    manager = PlayerManager(load_settings())
+    manager.add_many([(1, "eaten"), (2, "alive"), (3, "gone")])
+    colour = manager.get(1).colour
+    manager.add_score(2, 30)
+    manager.remove(1)
+    manager.disconnect(3)
+
+    manager.reset()
+    assert sorted(manager.players) == [1, 2]
+    assert manager.get(1).colour == colour
+    assert [player.score for player in manager.players.values()] == [0, 0]
+    assert {entry[0] for entry in manager.leaderboard.entries()} == {1, 2}
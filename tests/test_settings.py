@@ -0,0 +1,56 @@
+import dataclasses
+
+import pytest
+
+from common.settings import Settings, load_settings
+
+
+def test_defaults_compose_into_frozen_settings():
+    settings = load_settings()
+    assert isinstance(settings, Settings)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.width = 1
+
+
+def test_overrides_keep_their_yaml_types():
+    settings = load_settings(
+        ["server.port=6000", "server.send_timeout=2", "server.agents=seek:2,wander:1"]
+    )
+    assert settings.server.port == 6000
+    assert settings.server.send_timeout == 2.0
+    assert settings.server.agents == "seek:2,wander:1"
+
+
+def test_unknown_keys_fail_fast():
+    with pytest.raises(KeyError):
+        load_settings(["server.prot=6000"])
+    with pytest.raises(KeyError):
+        load_settings(["nope.port=6000"])
+
+
+@pytest.mark.parametrize(
+    "override",
+    [
+        "server.port",
+        "+server.port=6000",
+        "++server.port=6000",
+        "~server.port",
+        "server.port=${width}",
+        "server.agents=x${width}",
+        "server.port=choice(1,2)",
+        "server.port=range(1,5)",
+        "server.port=[1,2]",
+        "server.agents={a: 1}",
+        "server=fast",
+        "server..port=1",
+    ],
+)
+def test_unsupported_hydra_syntax_is_rejected(override):
+    with pytest.raises(ValueError):
+        load_settings([override])
+
+
+def test_interpolation_in_yaml_files_is_rejected(tmp_path):
+    (tmp_path / "config.yaml").write_text("width: ${height}\nheight: 600\n")
+    with pytest.raises(ValueError):
+        load_settings(config_dir=str(tmp_path))
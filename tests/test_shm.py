@@ -0,0 +1,106 @@
+import itertools
+import os
+from multiprocessing import resource_tracker
+
+import numpy as np
+import pytest
+
+from common.food import FoodCellManager
+from common.player import PlayerManager
+from common.settings import load_settings
+from common.shm import SEQUENCE, ShmWorldReader, ShmWorldWriter
+from common.snapshot import WorldSnapshot
+
+names = (f"evolario-test-{os.getpid()}-{i}" for i in itertools.count())
+
+
+class World:
+    """The managers of the server, publishing a snapshot per tick."""
+
+    def __init__(self):
+        cfg = load_settings()
+        self.p_manager = PlayerManager(cfg)
+        self.f_manager = FoodCellManager(cfg, self.p_manager)
+        self.tick = 0
+
+    def snapshot(self):
+        self.tick += 1
+        return WorldSnapshot(
+            self.tick,
+            self.f_manager.food_cells,
+            self.p_manager.snapshot(),
+            {"leaderboard": self.p_manager.leaderboard.entries()},
+        )
+
+
+@pytest.fixture
+def ring():
+    """Opens a writer and a reader on a fresh ring, and a world to publish."""
+    writer = ShmWorldWriter(next(names), slots=3, food_capacity=64, player_capacity=8)
+    reader = ShmWorldReader(writer.name)
+    # Before Python 3.13 the reader stops tracking the block, which in the
+    # writer's own process would leave the writer's unlink untracked
+    resource_tracker.register(writer.memory._name, "shared_memory")
+    yield World(), writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_reader_gets_the_latest_frame(ring):
+    world, writer, reader = ring
+    assert reader.latest() is None
+    world.p_manager.add_many([(1, "a"), (2, "b")])
+    world.f_manager.create_food(20)
+    for _ in range(5):
+        snapshot = world.snapshot()
+        writer.publish(snapshot)
+
+    frame = reader.latest(copy=True)
+    assert frame.version == 5 and reader.version == 5
+    assert frame.valid()
+    cells = snapshot.food_cells
+    np.testing.assert_array_equal(frame.food_xy, [(cell.x, cell.y) for cell in cells])
+    np.testing.assert_array_equal(frame.food_colour, [cell.colour for cell in cells])
+    players = list(snapshot.players.values())
+    np.testing.assert_array_equal(frame.player_id, [1, 2])
+    np.testing.assert_allclose(
+        frame.player_xy, [(p.position.x, p.position.y) for p in players]
+    )
+    np.testing.assert_array_equal(frame.player_score, [p.score for p in players])
+    assert frame.meta["names"] == {1: "a", 2: "b"}
+    assert frame.meta["leaderboard"] == snapshot.meta["leaderboard"]
+    assert reader.newer() is None
+
+
+def test_frames_are_invalid_once_the_writer_laps_them(ring):
+    world, writer, reader = ring
+    writer.publish(world.snapshot())
+    frame = reader.latest()
+    for _ in range(writer.slots):
+        writer.publish(world.snapshot())
+    assert not frame.valid()
+    assert reader.newer().version == 1 + writer.slots
+
+
+def test_a_slot_being_written_is_not_read(ring):
+    world, writer, reader = ring
+    writer.publish(world.snapshot())
+    fields = writer.views[1 % writer.slots]["fields"]
+    # An odd sequence number marks a slot the writer has not finished
+    fields[SEQUENCE] = 2 * 1 + 1
+    assert reader.latest() is None
+    fields[SEQUENCE] = 2 * 1 + 2
+    assert reader.latest().version == 1
+
+
+def test_food_beyond_the_capacity_is_left_out(ring):
+    world, writer, reader = ring
+    world.f_manager.create_food(writer.food_capacity + 10)
+    snapshot = world.snapshot()
+    writer.publish(snapshot)
+
+    frame = reader.latest()
+    assert len(frame.food_xy) == writer.food_capacity
+    kept = snapshot.food_cells[: writer.food_capacity]
+    np.testing.assert_array_equal(frame.food_xy, [(cell.x, cell.y) for cell in kept])
+    assert writer.truncated == 1
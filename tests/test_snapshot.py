@@ -0,0 +1,99 @@
+import threading
+
+import _pickle as pickle
+
+from common.food import FoodCellManager
+from common.player import PlayerManager
+from common.settings import load_settings
+from common.snapshot import SnapshotBuffer, WorldSnapshot
+from common.utilities import Position
+
+
+class World:
+    """The managers and publishing steps of the server, without its sockets."""
+
+    def __init__(self):
+        cfg = load_settings()
+        self.p_manager = PlayerManager(cfg)
+        self.f_manager = FoodCellManager(cfg, self.p_manager)
+        self.snapshots = SnapshotBuffer(depth=2)
+        self.tick = 0
+
+    def publish(self):
+        self.tick += 1
+        snapshot = WorldSnapshot(
+            self.tick,
+            self.f_manager.food_cells,
+            self.p_manager.snapshot(),
+            {"leaderboard": self.p_manager.leaderboard.entries()},
+        )
+        self.snapshots.publish(snapshot)
+        self.f_manager.pool.advance(snapshot)
+        return snapshot
+
+
+def contents(snapshot):
+    """Everything a client can read from a snapshot, as plain values."""
+    food = [(cell.x, cell.y, cell.colour) for cell in snapshot.food_cells]
+    players = {
+        player_id: (player.position.x, player.position.y, player.score, player.intent)
+        for player_id, player in snapshot.players.items()
+    }
+    return food, players, pickle.loads(pickle.dumps(snapshot.meta))
+
+
+def test_published_snapshot_is_unchanged_while_the_world_moves_on():
+    world = World()
+    world.p_manager.add_many([(1, "a"), (2, "b"), (3, "c")])
+    world.f_manager.create_food(50)
+    first = world.publish()
+    before = contents(first)
+    payload = first.payload()
+
+    for _ in range(5):
+        # Players move, score, get eaten and food is eaten and respawned
+        player = world.p_manager.get(1)
+        player.position.x += 7
+        player.position = Position(player.position.x, 3)
+        world.p_manager.add_score(2, 4)
+        world.p_manager.queue_intent(2, False, 1, 0)
+        world.p_manager.apply_moves()
+        world.p_manager.integrate_movement()
+        world.f_manager.remove_many(world.f_manager.food_cells[:10])
+        world.f_manager.create_food(10)
+        world.publish()
+    world.p_manager.remove(3)
+    world.f_manager.reset()
+    world.f_manager.create_food(50)
+    world.publish()
+
+    assert contents(first) == before
+    assert first.payload() is payload
+    assert pickle.loads(payload)[2] == before[2]
+
+
+def test_buffer_keeps_the_latest_snapshots():
+    buffer = SnapshotBuffer(depth=2)
+    assert buffer.latest().version == 0
+    published = [WorldSnapshot(version, [], {}) for version in range(1, 4)]
+    for snapshot in published:
+        buffer.publish(snapshot)
+        assert buffer.latest() is snapshot
+    assert list(buffer.snapshots) == published[1:]
+
+
+def test_readers_wake_up_for_newer_snapshots():
+    buffer = SnapshotBuffer()
+    seen = []
+    reader = threading.Thread(
+        target=lambda: seen.append(buffer.wait_for_newer(0, timeout=5).version)
+    )
+    reader.start()
+    buffer.publish(WorldSnapshot(1, [], {}))
+    reader.join(5)
+    assert seen == [1]
+
+
+def test_waiting_gives_up_after_the_timeout():
+    buffer = SnapshotBuffer()
+    assert buffer.wait_for_newer(0, timeout=0.01).version == 0
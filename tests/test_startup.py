@@ -0,0 +1,6 @@
+from benchmarks.bench_startup import HEAVY_MODULES, REPORT, TRAINER_CASE, run_case
+
+
+def test_headless_training_does_not_load_pygame():
+    report = run_case(TRAINER_CASE + REPORT.format(heavy=HEAVY_MODULES))
+    assert "pygame" not in report["loaded"]
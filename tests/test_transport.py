@@ -0,0 +1,127 @@
+import importlib.util
+import os
+import socket
+import types
+
+import pytest
+
+from common.settings import ROOT, load_settings
+from common.transport import UdpChannel, UdpSession, decode_datagram, encode_datagram
+
+
+def test_datagrams_round_trip():
+    data = encode_datagram(42, 7, "inputs 1 0.5 -1 2 0 0")
+    assert decode_datagram(data) == (42, 7, "inputs 1 0.5 -1 2 0 0")
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"get", b"1 2", b"x 1 dir 0 0", b"1 y dir 0 0", b"1 2 \xff"]
+)
+def test_malformed_datagrams_are_rejected(data):
+    with pytest.raises(ValueError):
+        decode_datagram(data)
+
+
+def test_session_accepts_only_newer_sequence_numbers():
+    session = UdpSession(player_id=1)
+    assert [session.accept(sequence) for sequence in (1, 2, 5)] == [True] * 3
+    # Late, replayed and zero sequence numbers never override a newer input
+    assert [session.accept(sequence) for sequence in (4, 5, 0)] == [False] * 3
+    assert session.accept(6)
+    assert (session.received, session.stale, session.last_sequence) == (4, 3, 6)
+
+
+def test_sessions_get_distinct_tokens():
+    tokens = {UdpSession().token for _ in range(100)}
+    assert len(tokens) == 100
+    assert all(0 <= token < 1 << 63 for token in tokens)
+
+
+class Recorder:
+    """A player manager that records the inputs the server applies."""
+
+    def __init__(self):
+        self.applied = []
+
+    def handle_move_command(self, command, player_id):
+        self.applied.append((player_id, command))
+
+    def handle_intent_command(self, command, player_id):
+        self.applied.append((player_id, command))
+
+    def queue_intent(self, player_id, is_target, x, y):
+        self.applied.append((player_id, x, y))
+
+
+@pytest.fixture(scope="module")
+def receive_datagrams():
+    # server.py is shadowed by the server package, so it is loaded from its path
+    spec = importlib.util.spec_from_file_location(
+        "server_main", os.path.join(ROOT, "server.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.Server.receive_datagrams
+
+
+def serve(receive_datagrams, sessions, datagrams):
+    """Sends datagrams to a UDP socket and runs the server's receive loop over them."""
+    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp_socket.bind(("127.0.0.1", 0))
+    # The loop ends on the timeout once every datagram was read
+    udp_socket.settimeout(0.2)
+    server = types.SimpleNamespace(
+        cfg=load_settings(),
+        udp_socket=udp_socket,
+        udp_sessions={session.token: session for session in sessions},
+        p_manager=Recorder(),
+    )
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    with udp_socket, sender:
+        for data in datagrams:
+            sender.sendto(data, udp_socket.getsockname())
+        receive_datagrams(server)
+    return server.p_manager.applied
+
+
+def test_server_applies_only_newer_datagrams_of_known_sessions(receive_datagrams):
+    player = UdpSession(player_id=1)
+    applied = serve(
+        receive_datagrams,
+        [player],
+        [
+            encode_datagram(player.token, 1, "dir 1 0"),
+            encode_datagram(player.token, 3, "dir 0 1"),
+            encode_datagram(player.token, 2, "dir -1 0"),
+            encode_datagram(player.token, 3, "dir 0 1"),
+            encode_datagram(player.token + 1, 4, "dir 1 1"),
+            encode_datagram(player.token, 4, "restart"),
+            encode_datagram(player.token, 5, "dir nan 0"),
+            b"not a datagram",
+        ],
+    )
+    assert applied == [(1, "dir 1 0"), (1, "dir 0 1")]
+    assert (player.received, player.stale, player.malformed) == (2, 2, 2)
+
+
+def test_batch_sessions_only_steer_their_own_bots(receive_datagrams):
+    batch = UdpSession(owned={10, 11})
+    applied = serve(
+        receive_datagrams,
+        [batch],
+        [encode_datagram(batch.token, 1, "inputs 10 1 0 12 0 1 11 0 -1")],
+    )
+    assert applied == [(10, 1.0, 0.0), (11, 0.0, -1.0)]
+
+
+def test_channel_numbers_its_datagrams():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(1)
+    channel = UdpChannel(receiver.getsockname(), 42)
+    with receiver:
+        channel.send("dir 1 0")
+        channel.send("dir 0 1")
+        received = [decode_datagram(receiver.recv(1024)) for _ in range(2)]
+    channel.close()
+    assert received == [(42, 1, "dir 1 0"), (42, 2, "dir 0 1")]
@@ -1,17 +1,17 @@
 import contextlib
 
-import hydra
-from omegaconf import DictConfig
-
 with contextlib.redirect_stdout(None):
     import pygame
 
 import os
+import sys
 import traceback
 
 from client.client import Client
+from common.draw import draw_grid, draw_score, draw_scores, time_font
 from common.food import FoodCellManager
 from common.player import PlayerManager
+from common.settings import DEFAULT_CACHE, Settings, load_settings
 
 pygame.font.init()
 # Set window to center of screen
@@ -24,12 +24,7 @@ PLAYER_RADIUS = 20
 START_VEL = 3
 FOOD_RADIUS = 5
 
-TRANSPARENCY = 50
-GRIDLINE_THICKNESS = 2
-GRIDLINE_SPACING = 40
 SCREEN = None
-TIME_FONT = pygame.font.SysFont(None, 24)
-SCORE_FONT = pygame.font.SysFont(None, 22)
 
 # Make window start in center of screen
 os.environ["SDL_VIDEO_CENTERED"] = "1"
@@ -53,64 +48,35 @@ def convert_time(t):
     return str(minutes) + ":" + str(seconds)
 
 
-def draw_score(SCREEN, score):
+def draw_round(SCREEN, cfg, round_info):
+    """
+    draws the round number and the time left in it
+
+    :param round_info: the round section of the server snapshot
+    :return: None
+    """
+    if round_info["state"] == "waiting":
+        label = "Starting Soon"
+    elif round_info["state"] == "ended":
+        winner = round_info["winner"]
+        label = f"{winner[1]} wins!" if winner else "Round over"
+    else:
+        label = convert_time(round_info["remaining"])
+    text = time_font().render(f"Round {round_info['number']}  {label}", 1, (0, 0, 0))
+    SCREEN.blit(text, ((cfg.width - text.get_width()) / 2, 10))
+
+
+def draw_waiting(SCREEN, cfg):
     """
-    draws each frame
+    draws a notice while the player is out of the world, e.g. after being eaten
+
     :return: None
     """
+    text = time_font().render("Waiting to respawn...", 1, (0, 0, 0))
+    SCREEN.blit(text, ((cfg.width - text.get_width()) / 2, cfg.height / 2))
+
 
-    # draw score
-    text = TIME_FONT.render("Score: " + str(round(score)), 1, (0, 0, 0))
-    SCREEN.blit(text, (10, 15 + text.get_height()))
-
-
-def draw_scores(SCREEN, cfg, player_manager):
-    players = player_manager.get_all()
-
-    # Sort players by score in descending order
-    sorted_players = sorted(
-        players.values(), key=lambda player: player.score, reverse=True
-    )
-
-    # Define the title text
-    title_text = TIME_FONT.render("Scoreboard", 1, (0, 0, 0))
-    title_x = cfg.width - title_text.get_width() - 10
-    SCREEN.blit(title_text, (title_x, 5))
-
-    # Determine how many players to display (up to 3)
-    max_players_to_display = min(len(sorted_players), 3)
-
-    # Render and display the player scores
-    start_y = 25
-    for count, player in enumerate(sorted_players[:max_players_to_display]):
-        player_rank = count + 1
-        player_name = player.name
-        score_text = SCORE_FONT.render(f"{player_rank}. {player_name}", 1, (0, 0, 0))
-        text_x = title_x
-        text_y = start_y + (count * 25)
-        SCREEN.blit(score_text, (text_x, text_y))
-
-
-def draw_grid(SCREEN, cfg):
-    for i in range(0, cfg.height, GRIDLINE_SPACING):
-        horizontal_line = pygame.Surface((cfg.width, GRIDLINE_THICKNESS), pygame.SRCALPHA)
-        horizontal_line.fill(
-            (184, 184, 184, TRANSPARENCY)
-        )  # You can change the 100 depending on what transparency it is.
-        SCREEN.blit(horizontal_line, (0, i - 1))
-
-    for i in range(0, cfg.width, GRIDLINE_SPACING):
-        vertical_line = pygame.Surface(
-            (GRIDLINE_THICKNESS, cfg.height), pygame.SRCALPHA
-        )
-        vertical_line.fill(
-            (184, 184, 184, TRANSPARENCY)
-        )  # You can change the 100 depending on what transparency it is.
-        SCREEN.blit(vertical_line, (i - 1, 0))
-
-
-@hydra.main(version_base=None, config_path="config", config_name="config")
-def main(cfg: DictConfig):
+def main(cfg: Settings):
     """
     function for running the game,
     includes the main loop of the game
@@ -131,7 +97,7 @@ def main(cfg: DictConfig):
     _id = client.connect(player_name)
     response = client.send("get")
     try:
-        food_manager.food_cells, player_manager.players = response
+        food_manager.food_cells, player_manager.players, meta = response
         print("[INFO]\tClient-side connected to server")
     except Exception:
         print("Error: Unexpected response from client.send('get')")
@@ -140,27 +106,21 @@ def main(cfg: DictConfig):
     font = pygame.font.Font(None, 36)
     run = True
     while run:
-        player = player_manager.get(_id)
+        # The player is missing from the world once eaten, until it respawns
+        player = player_manager.players.get(_id)
         # limit the game to 30 frames per second
         clock.tick_busy_loop(cfg.fps)
 
-        # Calculate velocity based on score
-        vel = max(START_VEL - round(player.score / 14), 1)
-        player.update_speed(vel)
-
-        # move player
-        player.move()
-
-        # create data to send to server
-        data = "move " + str(player.get_x()) + " " + str(player.get_y())
-
-        # Send new data to server
-        client.send(data)
+        # Send the direction of the key presses, the server moves the player
+        if player is not None:
+            dx, dy = player.get_direction()
+            data = f"dir {dx} {dy}"
+        else:
+            data = "get"
 
-        data = "get"
         # Get current information from server
         response = client.send(data)
-        food_manager.food_cells, player_manager.players = response
+        food_manager.food_cells, player_manager.players, meta = response
 
         for event in pygame.event.get():
             # if user hits red x button close window
@@ -178,8 +138,12 @@ def main(cfg: DictConfig):
         draw_grid(SCREEN, cfg)
         food_manager.draw(SCREEN)
         player_manager.draw(SCREEN)
-        draw_score(SCREEN, player.score)
-        draw_scores(SCREEN, cfg, player_manager)
+        if player is not None:
+            draw_score(SCREEN, player.score)
+        else:
+            draw_waiting(SCREEN, cfg)
+        draw_scores(SCREEN, cfg, meta["leaderboard"])
+        draw_round(SCREEN, cfg, meta["round"])
         fps = font.render(f"FPS: {clock.get_fps():.0f}", True, (0, 0, 0))
         fps = SCREEN.blit(fps, (10, 10))
         pygame.display.flip()
@@ -190,4 +154,5 @@ def main(cfg: DictConfig):
 
 
 if __name__ == "__main__":
-    main()
+    # Command line arguments are dotted overrides, e.g. fps=60
+    main(load_settings(sys.argv[1:], cache_path=DEFAULT_CACHE))